@@ -6,27 +6,35 @@ from pathlib import Path
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
+import threading
 from mcp.server.fastmcp import FastMCP
-from pymongo import MongoClient
 from typing import List, Dict, Any
-from setting import Settings
+from setting import get_settings
+from llms.admission import AdmissionRejected
+from metrics import MONGO_FIND_SECONDS
 
 
 # 1️⃣ Tạo server
 server = FastMCP("demo-mcp")
 
-# Load settings
-settings = Settings.load_settings()
+# Import module này không mở kết nối hay load model nào:
+# MongoDB được kết nối ở lần dùng đầu, models được preload bởi MCP/startup.py hoặc readiness.warm_up()
+_mongo_db = None
+_mongo_lock = threading.Lock()
 
-# connect to MongoDB (example, adjust as needed)
-mongo_client = MongoClient(settings.DATABASE_HOST)
-db = mongo_client[settings.DATABASE_NAME]
 
-# 🚀 Preload models để tăng tốc độ response
-print("🚀 Initializing models...")
-from tool.model_manager import model_manager
-model_manager.preload_models()
-print("✅ Models preloaded successfully!")
+def get_db():
+    """MongoDB database (kết nối lazy ở lần gọi đầu tiên)"""
+    global _mongo_db
+    if _mongo_db is None:
+        with _mongo_lock:
+            if _mongo_db is None:
+                from pymongo import MongoClient
+
+                settings = get_settings()
+                mongo_client = MongoClient(settings.DATABASE_HOST)
+                _mongo_db = mongo_client[settings.DATABASE_NAME]
+    return _mongo_db
 
 # 2️⃣ Định nghĩa tool
 @server.tool()
@@ -43,8 +51,9 @@ def find_documents(collection: str, query: Dict[str, Any] = {}) -> List[Dict[str
         collection: name of the collection on mongoDB
         query: fillter query (vd: {"name": "Alice"})
     """
-    col = db[collection]
-    docs = list(col.find(query))
+    col = get_db()[collection]
+    with MONGO_FIND_SECONDS.time(collection=collection):
+        docs = list(col.find(query))
     
     for d in docs:
         d["_id"] = str(d["_id"])
@@ -62,8 +71,9 @@ def extract_features_from_question(query: str, prompt_type: str) -> Dict[str, An
         dict: các đặc trưng đã trích xuất
     """
     from tool.extract_feature_question_about_jd import ExtractFeatureQuestion
+    from llms.llm_manager import llm_manager
     extractor = ExtractFeatureQuestion(
-        model_name=os.getenv("OLLAMA_MODEL", "hf.co/Cactus-Compute/Qwen3-1.7B-Instruct-GGUF:Q4_K_M"),
+        model_name=llm_manager.get_task_model("extraction"),
         validate_response=["title", "skills", "company", "location", "experience"]
     )
     features = extractor.extract(query, prompt_type)
@@ -142,13 +152,8 @@ def get_reflection(history: List[Dict[str, str]]) -> str:
     from tool.reflection import Reflection
     from llms.llm_manager import llm_manager
     
-    # Sử dụng LLM Manager thay vì tạo instance mới
-    default_url = "http://host.docker.internal:11434" if os.getenv("DOCKER_ENV") == "true" else "http://localhost:11434"
-    ollama_url = os.getenv("OLLAMA_URL", default_url)
-    ollama_model = os.getenv("OLLAMA_MODEL", "hf.co/Cactus-Compute/Qwen3-1.7B-Instruct-GGUF:Q4_K_M")
-    
-    # Reuse existing LLM instance từ manager
-    llm = llm_manager.get_ollama_client(base_url=ollama_url, model_name=ollama_model)
+    # Reuse existing LLM instance từ manager (model của bước "reflection")
+    llm = llm_manager.get_client_for_task("reflection")
     reflection = Reflection(llm=llm)
     
     try:
@@ -157,10 +162,79 @@ def get_reflection(history: List[Dict[str, str]]) -> str:
                 improved_answer = improved_answer.split("</think>")[-1].strip()
         print("Reflection completed.", {"improved_answer": improved_answer})
         return improved_answer
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"❌ Error in reflection process: {str(e)}")
         return "Error in reflection process."
     
+@server.tool()
+def get_reflection_and_intent(history: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Viết lại câu hỏi cuối của user và phân loại intent trong MỘT lần gọi LLM
+    Args:
+        history: lịch sử hội thoại
+    Returns:
+        dict: {"query": câu hỏi độc lập, "intent": intent hoặc None nếu LLM trả về không hợp lệ}
+    """
+    from tool.reflection import Reflection
+    from llms.llm_manager import llm_manager
+
+    # Một lần gọi cho cả viết lại + phân loại → dùng model của bước "reflection"
+    llm = llm_manager.get_client_for_task("reflection")
+    reflection = Reflection(llm=llm)
+
+    try:
+        result = reflection.reflect_and_classify(history)
+        print("Reflection + classification completed.", result)
+        return result
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        print(f"❌ Error in reflection + classification process: {str(e)}")
+        last_user_msg = next((m.get("content", "") for m in reversed(history) if m.get("role") == "user"), "")
+        return {"query": last_user_msg, "intent": None}
+
+
+async def aget_reflection(history: List[Dict[str, str]]) -> str:
+    """Bản async của get_reflection (ASGI app): chờ Ollama trên event loop, không giữ worker thread"""
+    from tool.reflection import Reflection
+    from llms.async_ollama_llms import get_async_client
+    from llms.llm_manager import llm_manager
+
+    reflection = Reflection(llm=get_async_client(llm_manager.get_client_for_task("reflection")))
+    try:
+        improved_answer = await reflection.areflect(history)
+        if "<think>" in improved_answer:
+            improved_answer = improved_answer.split("</think>")[-1].strip()
+        print("Reflection completed.", {"improved_answer": improved_answer})
+        return improved_answer
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        print(f"❌ Error in reflection process: {str(e)}")
+        return "Error in reflection process."
+
+
+async def aget_reflection_and_intent(history: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Bản async của get_reflection_and_intent (ASGI app)"""
+    from tool.reflection import Reflection
+    from llms.async_ollama_llms import get_async_client
+    from llms.llm_manager import llm_manager
+
+    reflection = Reflection(llm=get_async_client(llm_manager.get_client_for_task("reflection")))
+    try:
+        result = await reflection.areflect_and_classify(history)
+        print("Reflection + classification completed.", result)
+        return result
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        print(f"❌ Error in reflection + classification process: {str(e)}")
+        last_user_msg = next((m.get("content", "") for m in reversed(history) if m.get("role") == "user"), "")
+        return {"query": last_user_msg, "intent": None}
+
+
 @server.tool()
 def search_similar_jobs(query_vector: List[float], top_k: int = 5):
     """
@@ -171,6 +245,7 @@ def search_similar_jobs(query_vector: List[float], top_k: int = 5):
     Returns:
         list: danh sách các JD tương tự
     """
+    settings = get_settings()
     URL_QDRANT = settings.URL_QDRANT
     API_KEY_QDRANT = settings.API_KEY_QDRANT
     from tool.database import QDrant
@@ -252,6 +327,7 @@ def upsert_companies_to_qdrant_optimized(limit: int = 100):
             return f"company_{record['ma_cong_ty']}"
         
         # Khởi tạo PostgreSQL client với Qdrant
+        settings = get_settings()
         pg_client = PostgreSQLClient(
             url=os.getenv("SUPABASE_URL"),
             key=os.getenv("SUPABASE_ANON_KEY"),
@@ -291,6 +367,7 @@ def search_similar_companies_optimized(query: str, top_k: int = 5):
     
     try:
         # Khởi tạo client với Qdrant
+        settings = get_settings()
         pg_client = PostgreSQLClient(
             url=os.getenv("SUPABASE_URL"),
             key=os.getenv("SUPABASE_ANON_KEY"),
@@ -10,43 +10,37 @@ from pathlib import Path
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from setting import Settings
+_import_started_at = time.perf_counter()
+from readiness import readiness, warm_up
+from setting import get_settings
 from tool.model_manager import model_manager
-from llms.ollama_llms import OllamaLLMs
+readiness.record_phase("import", time.perf_counter() - _import_started_at)
 
 def startup_optimization():
     """
     Thực hiện tối ưu hóa khi khởi động ứng dụng
+    (in bảng thời gian từng pha: import, settings, embedding_load, router_build, ollama_warmup)
     """
     print("🚀 Starting AI Agent Recruitment System...")
     
-    # Load settings
-    settings = Settings.load_settings()
-    print("✅ Settings loaded")
+    settings = get_settings()
     
     if settings.ENABLE_MODEL_PRELOAD:
         print("🔥 Preloading models...")
+        readiness.require("embedding", "router", "ollama")
         start_time = time.time()
         
-        # Preload embedding model và semantic router
-        model_manager.preload_models()
-        
-        # Preload và warm-up Ollama model
-        try:
-            ollama_model = OllamaLLMs(
-                base_url=settings.OLLAMA_BASE_URL,
-                model_name=settings.RAG_MODEL_ID.split("/")[-1].split(":")[0]  # Extract model name
-            )
-            # Set keep-alive để model không bị unload
-            ollama_model.keep_alive(settings.MODEL_KEEP_ALIVE)
-            print(f"✅ Ollama model warmed up: {settings.RAG_MODEL_ID}")
-        except Exception as e:
-            print(f"⚠️ Ollama warm-up failed: {e}")
+        # Preload embedding model, semantic routers và warm-up các Ollama model (residency manager giữ chúng trong memory)
+        default_url = "http://host.docker.internal:11434" if os.getenv("DOCKER_ENV") == "true" else settings.OLLAMA_BASE_URL
+        warm_up(
+            ollama_url=os.getenv("OLLAMA_URL", default_url),
+            model_name=os.getenv("OLLAMA_MODEL", "hf.co/Cactus-Compute/Qwen3-1.7B-Instruct-GGUF:Q4_K_M")
+        )
         
         elapsed_time = time.time() - start_time
         print(f"✅ All models preloaded in {elapsed_time:.2f} seconds")
     
-    print("🎯 System ready for optimal performance!")
+    print("🎯 System ready for optimal performance!" if readiness.is_ready() else "⚠️ System started with some components not ready")
     
     # In thông tin cache
     cache_info = model_manager.get_cache_info()
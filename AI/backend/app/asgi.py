@@ -0,0 +1,197 @@
+"""
+ASGI entry point cho AI Recruitment System
+
+/api/chat và /api/chat/stream chạy async (ChatbotOllama.achat / achat_stream qua AsyncOllamaLLMs):
+mỗi request chờ Ollama trên event loop thay vì giữ một worker thread. Các route còn lại
+được chuyển cho Flask app (main.app) qua WSGI adapter, session cookie dùng chung với Flask.
+
+Chạy:
+    uvicorn asgi:app --app-dir backend/app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextlib
+import json
+import uuid
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+import main
+from llms.admission import AdmissionRejected
+from llms.async_ollama_llms import close_async_ollama_clients
+from llms.residency import peek_residency_manager
+
+
+def _load_session(request: Request) -> tuple:
+    """
+    Đọc session_id từ cookie session của Flask (cùng secret key và serializer)
+
+    Returns:
+        (session_id, cookie mới cần set hoặc None nếu session đã tồn tại)
+    """
+    flask_app = main.app
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    cookie_name = flask_app.config["SESSION_COOKIE_NAME"]
+
+    data = {}
+    cookie = request.cookies.get(cookie_name)
+    if cookie and serializer is not None:
+        try:
+            data = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+        except Exception:
+            data = {}
+
+    if data.get("session_id"):
+        return data["session_id"], None
+
+    data["session_id"] = str(uuid.uuid4())
+    data["created_at"] = datetime.now().isoformat()
+    return data["session_id"], serializer.dumps(data) if serializer is not None else None
+
+
+def _with_session_cookie(response, cookie):
+    if cookie is not None:
+        response.set_cookie(
+            main.app.config["SESSION_COOKIE_NAME"],
+            cookie,
+            httponly=True,
+            path="/",
+            samesite=main.app.config.get("SESSION_COOKIE_SAMESITE") or "lax"
+        )
+    return response
+
+
+def _overloaded(error: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        main.overloaded_body(error),
+        status_code=error.status_code,
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+async def _read_message(request: Request):
+    try:
+        data = await request.json()
+    except (json.JSONDecodeError, ValueError):
+        data = None
+    if not isinstance(data, dict) or "message" not in data:
+        return None
+    return data["message"]
+
+
+async def chat(request: Request):
+    """Bản async của POST /api/chat"""
+    user_message = await _read_message(request)
+    if user_message is None:
+        return JSONResponse({"error": "Message is required"}, status_code=400)
+
+    session_id, cookie = _load_session(request)
+    bot = await asyncio.to_thread(main.get_user_chatbot, session_id)
+    if bot is None:
+        return JSONResponse({
+            "error": "Chatbot service is not available. Please ensure Ollama is running.",
+            "status": "service_unavailable"
+        }, status_code=503)
+
+    try:
+        bot.async_client.check_admission()
+        response = await bot.achat(user_message)
+    except AdmissionRejected as overloaded:
+        main.logger.warning(f"Chat rejected by admission control: {overloaded}")
+        return _with_session_cookie(_overloaded(overloaded), cookie)
+    except Exception as llm_error:
+        main.logger.error(f"Chatbot error: {llm_error}")
+        return _with_session_cookie(JSONResponse({
+            "error": f"Chatbot processing error: {str(llm_error)}",
+            "status": "processing_error"
+        }, status_code=500), cookie)
+
+    main.get_session_store().record_usage(session_id)
+    return _with_session_cookie(JSONResponse({
+        "response": response,
+        "session_id": session_id,
+        "prompt_tokens": bot.last_prompt_tokens,
+        "status": "success"
+    }), cookie)
+
+
+async def chat_stream(request: Request):
+    """Bản async của POST /api/chat/stream (Server-Sent Events)"""
+    user_message = await _read_message(request)
+    if user_message is None:
+        return JSONResponse({"error": "Message is required"}, status_code=400)
+
+    session_id, cookie = _load_session(request)
+    bot = await asyncio.to_thread(main.get_user_chatbot, session_id)
+    if bot is None:
+        return JSONResponse({
+            "error": "Chatbot service is not available. Please ensure Ollama is running.",
+            "status": "service_unavailable"
+        }, status_code=503)
+
+    # Từ chối ngay (trước khi mở stream) nếu hàng đợi LLM đã đầy hoặc circuit breaker đang mở
+    try:
+        bot.async_client.check_admission()
+    except AdmissionRejected as overloaded:
+        return _with_session_cookie(_overloaded(overloaded), cookie)
+
+    async def generate():
+        try:
+            async for chunk in bot.achat_stream(user_message):
+                yield main.format_sse("token", {"delta": chunk})
+
+            yield main.format_sse("done", {
+                "session_id": session_id,
+                "intent": bot.last_intent,
+                "prompt_tokens": bot.last_prompt_tokens,
+                "status": "success"
+            })
+
+        except AdmissionRejected as overloaded:
+            yield main.format_sse("error", main.overloaded_body(overloaded))
+        except Exception as e:
+            main.logger.error(f"Chat stream error: {e}")
+            yield main.format_sse("error", {
+                "error": str(e),
+                "status": "error"
+            })
+
+        main.get_session_store().record_usage(session_id)
+
+    return _with_session_cookie(StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    ), cookie)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    # Warm-up của process worker (không chạy lúc import main)
+    main.ensure_background_warmup()
+    yield
+    residency = peek_residency_manager()
+    if residency is not None:
+        residency.stop()
+    await close_async_ollama_clients()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/chat", chat, methods=["POST"]),
+        Route("/api/chat/stream", chat_stream, methods=["POST"]),
+        Mount("/", app=WSGIMiddleware(main.app)),
+    ],
+    lifespan=lifespan
+)
@@ -1,45 +1,115 @@
 
+import asyncio
+import itertools
 import os
+import threading
+import time
 import logging
-from typing import List, Dict, Union, Callable, Any, Optional
+from typing import List, Dict, Union, Callable, Any, Optional, Iterator, AsyncIterator
 from .base import BaseChatbot
+from .history import ConversationHistory, is_summary_message, make_llm_summarizer
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
-from llms.llm_manager import llm_manager
+from llms.llm_manager import llm_manager, default_ollama_url
 from llms.tools import list_available_tools
-from MCP.server import server, intent_classification, enhance_question, get_reflection
-from prompt.promt_config import PromptConfig
+from llms.think_filter import ThinkTagFilter
+from llms.admission import AdmissionRejected
+from llms.async_ollama_llms import get_async_client
+from llms.profiles import match_label, get_generation_profiles
+from llms.token_budget import estimate_message_tokens
+from MCP.server import (
+    server, intent_classification, enhance_question, get_reflection, get_reflection_and_intent,
+    aget_reflection, aget_reflection_and_intent
+)
+from setting import get_settings
+from metrics import llm_prompt, CHAT_STAGE_SECONDS, CHAT_FIRST_TOKEN_SECONDS, CHAT_PROMPT_TOKENS
+from tool.intent_classifier import get_intent_classifier
+from tool.response_cache import get_response_cache
+from prompt.promt_config import PromptConfig, CHAT_INTENTS
 from tool.extract_feature_question_about_jd import ExtractFeatureQuestion
 
 class ChatbotOllama(BaseChatbot):
+    # Các đối tượng không giữ state của phiên chat → dùng chung cho mọi session,
+    # mỗi instance ChatbotOllama chỉ còn giữ lịch sử hội thoại và state
+    _shared_lock = threading.Lock()
+    _shared_prompt_config = None
+    _shared_feature_extractors: Dict[str, ExtractFeatureQuestion] = {}
+
+    @classmethod
+    def shared_prompt_config(cls) -> PromptConfig:
+        if cls._shared_prompt_config is None:
+            with cls._shared_lock:
+                if cls._shared_prompt_config is None:
+                    cls._shared_prompt_config = PromptConfig()
+        return cls._shared_prompt_config
+
+    @classmethod
+    def shared_feature_extractor(cls, model_name: str) -> ExtractFeatureQuestion:
+        if model_name not in cls._shared_feature_extractors:
+            with cls._shared_lock:
+                if model_name not in cls._shared_feature_extractors:
+                    cls._shared_feature_extractors[model_name] = ExtractFeatureQuestion(model_name=model_name)
+        return cls._shared_feature_extractors[model_name]
+
     def __init__(self, model_name: str = "", **kwargs):
         super().__init__(model_name=model_name, **kwargs)
         
-        default_url = "http://host.docker.internal:11434" if os.getenv("DOCKER_ENV") == "true" else "http://localhost:11434"
-        ollama_url = os.getenv("OLLAMA_URL", default_url)
-        ollama_model = os.getenv("OLLAMA_MODEL", "")
+        ollama_url = default_ollama_url()
+        task_models = llm_manager.get_task_models()
         
-        logging.info(f"Initializing Ollama client with URL: {ollama_url}, Model: {ollama_model}")
+        logging.info(f"Initializing Ollama client with URL: {ollama_url}, Models: {task_models}")
         
-        # Sử dụng LLM Manager để tránh tạo multiple instances
-        self.client = llm_manager.get_ollama_client(
-            base_url=ollama_url,
-            model_name=ollama_model
-        )
+        # Sử dụng LLM Manager để tránh tạo multiple instances; mỗi bước dùng model của nó (LLM_TASK_MODELS):
+        # self.client sinh câu trả lời cho user, classification_client chỉ phân loại intent
+        self.client = llm_manager.get_client_for_task("answer", base_url=ollama_url)
+        self.classification_client = llm_manager.get_client_for_task("classification", base_url=ollama_url)
         
-        # Initialize the feature extractor (chỉ tạo khi cần)
-        self._feature_extractor = None
-        self._ollama_model = ollama_model
+        # Feature extractor dùng chung, chỉ tạo khi cần
+        self._extraction_model = task_models["extraction"]
         
-        # Initialize prompt config
-        self.prompt_config = PromptConfig()
+        # Prompt config dùng chung cho mọi session
+        self.prompt_config = self.shared_prompt_config()
+
+        # Intent của lượt chat gần nhất (để API trả về cho client)
+        self.last_intent = None
+        self.last_intent_tier = None
+
+        # Gộp reflection + phân loại intent thành 1 lần gọi LLM (tắt để dùng luồng 2 lần gọi cũ)
+        settings = get_settings()
+        self.combined_understanding = kwargs.get(
+            "combined_understanding",
+            settings.COMBINED_REFLECTION_CLASSIFICATION
+        )
+
+        # Lịch sử trong prompt: N lượt gần nhất + rolling summary (tóm tắt bằng model của bước reflection)
+        summarize = None
+        if settings.HISTORY_SUMMARY_ENABLED:
+            summarize = make_llm_summarizer(llm_manager.get_client_for_task("reflection", base_url=ollama_url), self.prompt_config)
+        self.history = ConversationHistory(
+            self.backend,
+            self.session_id,
+            keep_turns=settings.HISTORY_KEEP_TURNS,
+            batch_turns=settings.HISTORY_SUMMARY_BATCH_TURNS,
+            summarize=summarize,
+            chars_per_token=settings.HISTORY_CHARS_PER_TOKEN
+        )
+        self.prompt_reserve_tokens = settings.HISTORY_PROMPT_RESERVE_TOKENS
+
+        # Số token (ước lượng) của các prompt được lắp trong lượt chat gần nhất: history, answer
+        self.last_prompt_tokens: Dict[str, int] = {}
     
+    @property
+    def async_client(self):
+        """
+        Async counterpart của self.client (dùng bởi achat/achat_stream trong ASGI app); với backend pool,
+        backend được chọn cho từng request (cân bằng tải, bỏ qua backend bị loại)
+        """
+        return get_async_client(self.client)
+
     @property
     def feature_extractor(self):
-        """Lazy loading cho feature extractor"""
-        if self._feature_extractor is None:
-            self._feature_extractor = ExtractFeatureQuestion(model_name=self._ollama_model)
-        return self._feature_extractor
+        """Lazy loading cho feature extractor (dùng chung giữa các session)"""
+        return self.shared_feature_extractor(self._extraction_model)
     
     def _strip_think(self, text: str) -> str:
         """Remove <think>...</think> sections and trim whitespace."""
@@ -52,111 +122,411 @@ class ChatbotOllama(BaseChatbot):
 
     def add_assistant_message(self, message: str):  # override to clean
         super().add_assistant_message(self._strip_think(message))
-    
+        # Lượt chat đã xong: gộp các lượt vừa ra khỏi cửa sổ vào tóm tắt (nền, không chặn câu trả lời)
+        self.history.schedule_fold()
 
-    def chat(self, message: str, include_history: bool = True) -> str:
+    def _record_prompt_tokens(self, part: str, messages: List[Dict[str, str]]):
+        tokens = estimate_message_tokens(messages, self.history.chars_per_token)
+        self.last_prompt_tokens[part] = tokens
+        CHAT_PROMPT_TOKENS.observe(tokens, part=part)
+
+    def _prepare_messages(self, message: str, include_history: bool) -> List[Dict[str, str]]:
+        """
+        Thêm tin nhắn user vào lịch sử và chuẩn bị messages cho Ollama: tóm tắt + các lượt gần nhất
+        vừa ngân sách token của profile answer (không copy toàn bộ lịch sử)
+        """
         self.add_user_message(message)
-        
-        # Prepare messages for Ollama API
+        self.last_prompt_tokens = {}
+
         if include_history:
-            messages = self.conversation_history.copy()
+            budget = get_generation_profiles().prompt_budget("answer", self.prompt_reserve_tokens)
+            messages = self.history.view(budget)
         else:
             messages = [{"role": "user", "content": message}]
-        
-        try:
-            
+        self._record_prompt_tokens("history", messages)
+        return messages
 
-            summarise_convervation = get_reflection(messages)
-            classification_prompt = self.prompt_config.get_prompt("classification_chat_intent", user_input=summarise_convervation)
-            intent = self._strip_think(self.client.generate_content([{"role": "user", "content": classification_prompt}]))
-            print(f"Intent classified as: {intent}")
-            
-            if intent == "intent_chitchat":
-                chitchat_prompt = self.prompt_config.get_prompt("intent_chitchat", user_input=summarise_convervation)
-                assistant_response = self._strip_think(self.client.generate_content([{"role": "user", "content": chitchat_prompt}]))
-                self.add_assistant_message(assistant_response)
-                return assistant_response
-                
-            elif intent == "intent_incomplete_recruitment_question":
-                incomplete_prompt = self.prompt_config.get_prompt("recruitment_incomplete", user_input=summarise_convervation)
-                assistant_response = self._strip_think(self.client.generate_content([{"role": "user", "content": incomplete_prompt}]))
-                self.add_assistant_message(assistant_response)
-                return assistant_response
-                
-            elif intent == "intent_jd":
-                try:
-                    # Extract job features from the user's message
+    def _classify_with_llm(self, query: str) -> str:
+        """Phân loại intent bằng prompt classification_chat_intent (output luôn là một intent hợp lệ)"""
+        classification_messages = self.prompt_config.get_messages("classification_chat_intent", user_input=query)
+        with llm_prompt("classification_chat_intent"):
+            output = self.classification_client.generate_chat(classification_messages, profile="classification")
+        return match_label(output, CHAT_INTENTS, fallback="intent_chitchat")
+
+    async def _aclassify_with_llm(self, query: str) -> str:
+        """Bản async của _classify_with_llm (chờ Ollama trên event loop)"""
+        classification_messages = self.prompt_config.get_messages("classification_chat_intent", user_input=query)
+        with llm_prompt("classification_chat_intent"):
+            output = await get_async_client(self.classification_client).generate_chat(
+                classification_messages, profile="classification"
+            )
+        return match_label(output, CHAT_INTENTS, fallback="intent_chitchat")
+
+    @staticmethod
+    def _standalone_query(messages: List[Dict[str, str]]) -> Optional[str]:
+        """Trả về câu hỏi nếu đây là lượt đầu tiên (câu hỏi đã độc lập, không cần reflection)"""
+        user_messages = [m for m in messages if m.get("role") == "user"]
+        has_assistant = any(m.get("role") == "assistant" or is_summary_message(m) for m in messages)
+        if len(user_messages) == 1 and not has_assistant:
+            return user_messages[0].get("content", "")
+        return None
+
+    def _understand(self, messages: List[Dict[str, str]]) -> tuple:
+        """Viết lại câu hỏi thành câu độc lập và phân loại intent"""
+        start_time = time.time()
+        classifier = get_intent_classifier()
+
+        intent = None
+        tier = "llm"
+
+        # Fast path: lượt đầu tiên đã là câu độc lập → thử router trước, không cần gọi LLM
+        summarise_convervation = self._standalone_query(messages)
+        with CHAT_STAGE_SECONDS.time(stage="router"):
+            routed = classifier.route(summarise_convervation) if summarise_convervation else None
+
+        if routed is not None:
+            intent, tier = routed[0], "router"
+
+        elif self.combined_understanding:
+            # 1 lần gọi LLM trả về cả câu hỏi độc lập lẫn intent
+            llm_start = time.perf_counter()
+            with CHAT_STAGE_SECONDS.time(stage="reflection_classification"):
+                result = get_reflection_and_intent(messages)
+            summarise_convervation = result["query"]
+            intent = result["intent"]
+            if intent is not None:
+                classifier.record_llm(time.perf_counter() - llm_start)
+
+        else:
+            with CHAT_STAGE_SECONDS.time(stage="reflection"):
+                summarise_convervation = get_reflection(messages)
+            with CHAT_STAGE_SECONDS.time(stage="classification"):
+                intent, tier = classifier.classify(summarise_convervation, self._classify_with_llm)
+
+        if intent is None:
+            # Fallback khi output gộp không có intent hợp lệ
+            with CHAT_STAGE_SECONDS.time(stage="classification"):
+                intent = classifier.classify_with_llm(summarise_convervation, self._classify_with_llm)
+
+        mode = "combined" if self.combined_understanding else "two_call"
+        print(f"Intent classified as: {intent} ({mode}, tier={tier}, {time.time() - start_time:.2f}s)")
+        self.last_intent = intent
+        self.last_intent_tier = tier
+        return summarise_convervation, intent
+
+    async def _aunderstand(self, messages: List[Dict[str, str]]) -> tuple:
+        """
+        Bản async của _understand: các lời gọi LLM (reflection, phân loại) chờ trên event loop qua
+        AsyncOllamaLLMs, chỉ router (embedding, vài ms) chạy trong thread pool
+        """
+        start_time = time.time()
+        classifier = get_intent_classifier()
+
+        intent = None
+        tier = "llm"
+
+        summarise_convervation = self._standalone_query(messages)
+        with CHAT_STAGE_SECONDS.time(stage="router"):
+            routed = await asyncio.to_thread(classifier.route, summarise_convervation) if summarise_convervation else None
+
+        if routed is not None:
+            intent, tier = routed[0], "router"
+
+        elif self.combined_understanding:
+            llm_start = time.perf_counter()
+            with CHAT_STAGE_SECONDS.time(stage="reflection_classification"):
+                result = await aget_reflection_and_intent(messages)
+            summarise_convervation = result["query"]
+            intent = result["intent"]
+            if intent is not None:
+                classifier.record_llm(time.perf_counter() - llm_start)
+
+        else:
+            with CHAT_STAGE_SECONDS.time(stage="reflection"):
+                summarise_convervation = await aget_reflection(messages)
+            with CHAT_STAGE_SECONDS.time(stage="classification"):
+                intent, tier = await classifier.aclassify(summarise_convervation, self._aclassify_with_llm)
+
+        if intent is None:
+            with CHAT_STAGE_SECONDS.time(stage="classification"):
+                intent = await classifier.aclassify_with_llm(summarise_convervation, self._aclassify_with_llm)
+
+        mode = "combined" if self.combined_understanding else "two_call"
+        print(f"Intent classified as: {intent} ({mode}, tier={tier}, {time.time() - start_time:.2f}s)")
+        self.last_intent = intent
+        self.last_intent_tier = tier
+        return summarise_convervation, intent
+
+    def _plan_response(self, intent: str, query: str, messages: List[Dict[str, str]]) -> Union[str, List[Dict[str, str]]]:
+        """
+        Quyết định cách trả lời cho intent
+
+        Returns:
+            str nếu câu trả lời cố định, hoặc list messages cần gửi cho LLM để sinh câu trả lời
+        """
+        if intent == "intent_chitchat":
+            return self.prompt_config.get_messages("intent_chitchat", user_input=query)
+
+        elif intent == "intent_incomplete_recruitment_question":
+            return self.prompt_config.get_messages("recruitment_incomplete", user_input=query)
+
+        elif intent == "intent_jd":
+            try:
+                # Extract job features from the user's message
+                with CHAT_STAGE_SECONDS.time(stage="feature_extraction"):
                     extracted_features = self.feature_extractor.extract(
-                        query=summarise_convervation,
+                        query=query,
                         prompt_type="extract_features_question_about_job"
                     )
-                    
-                    if extracted_features:
-                        # Process the extracted features and generate response
-                        features_text = self._format_extracted_features(extracted_features)
-                        assistant_response = f"Tôi đã hiểu yêu cầu của bạn:\n{features_text}\n\nTôi sẽ tìm kiếm các công việc phù hợp cho bạn."
-                        self.add_assistant_message(assistant_response)
-                        return assistant_response
-                    else:
-                        # Fallback if no features extracted
-                        incomplete_prompt = self.prompt_config.get_prompt("recruitment_incomplete", user_input=summarise_convervation)
-                        assistant_response = self._strip_think(self.client.generate_content([{"role": "user", "content": incomplete_prompt}]))
-                        self.add_assistant_message(assistant_response)
-                        return assistant_response
-                        
-                except Exception as extraction_error:
-                    logging.error(f"Error in feature extraction: {str(extraction_error)}")
-                    # Fallback to normal generation
-                    assistant_response = self._strip_think(self.client.generate_content(messages))
-                    self.add_assistant_message(assistant_response)
-                    return assistant_response
-
-            elif intent == "intent_review_cv":
-                # Handle CV review requests
-                assistant_response = "Để review CV của bạn, hãy upload file CV hoặc paste nội dung CV vào chat. Tôi sẽ phân tích và đưa ra những lời khuyên cụ thể."
-                self.add_assistant_message(self._strip_think(assistant_response))
-                return assistant_response
-                
-            elif intent == "intent_suggest_job":
-                # Handle job suggestion requests based on CV
-                assistant_response = "Để gợi ý công việc phù hợp, tôi cần thông tin về CV của bạn. Hãy chia sẻ CV hoặc mô tả kỹ năng, kinh nghiệm của bạn."
-                self.add_assistant_message(self._strip_think(assistant_response))
-                return assistant_response
-                
-            elif intent == "intent_candidate":
-                # Handle candidate search requests (for employers)
-                assistant_response = "Tôi sẽ giúp bạn tìm kiếm ứng viên phù hợp. Hãy mô tả rõ yêu cầu vị trí công việc, kỹ năng cần thiết và kinh nghiệm mong muốn."
-                self.add_assistant_message(self._strip_think(assistant_response))
-                return assistant_response
-                
-            elif intent == "intent_company_info":
-                # Handle company information requests
-                assistant_response = "Bạn muốn tìm hiểu thông tin về công ty nào? Hãy cho tôi biết tên công ty và tôi sẽ cung cấp thông tin chi tiết."
-                self.add_assistant_message(self._strip_think(assistant_response))
-                return assistant_response
-                
-            elif intent == "intent_guide":
-                # Handle website usage guide requests
-                assistant_response = "Tôi có thể hướng dẫn bạn sử dụng website tuyển dụng. Bạn cần hỗ trợ về vấn đề gì? (Đăng ký tài khoản, tìm kiếm việc làm, đăng tin tuyển dụng, etc.)"
-                self.add_assistant_message(self._strip_think(assistant_response))
-                return assistant_response
-                
-            elif intent == "intent_feedback":
-                # Handle feedback collection
-                assistant_response = "Cảm ơn bạn muốn đóng góp ý kiến! Hãy chia sẻ phản hồi của bạn về trải nghiệm sử dụng website và dịch vụ của chúng tôi."
-                self.add_assistant_message(self._strip_think(assistant_response))
-                return assistant_response
-            
-            # Default fallback
-            assistant_response = self._strip_think(self.client.generate_content(messages))
+                return self._plan_job_search(query, extracted_features)
+
+            except Exception as extraction_error:
+                logging.error(f"Error in feature extraction: {str(extraction_error)}")
+                # Fallback to normal generation
+                return messages
+
+        elif intent == "intent_review_cv":
+            # Handle CV review requests
+            return "Để review CV của bạn, hãy upload file CV hoặc paste nội dung CV vào chat. Tôi sẽ phân tích và đưa ra những lời khuyên cụ thể."
+
+        elif intent == "intent_suggest_job":
+            # Handle job suggestion requests based on CV
+            return "Để gợi ý công việc phù hợp, tôi cần thông tin về CV của bạn. Hãy chia sẻ CV hoặc mô tả kỹ năng, kinh nghiệm của bạn."
+
+        elif intent == "intent_candidate":
+            # Handle candidate search requests (for employers)
+            return "Tôi sẽ giúp bạn tìm kiếm ứng viên phù hợp. Hãy mô tả rõ yêu cầu vị trí công việc, kỹ năng cần thiết và kinh nghiệm mong muốn."
+
+        elif intent == "intent_company_info":
+            # Handle company information requests
+            return "Bạn muốn tìm hiểu thông tin về công ty nào? Hãy cho tôi biết tên công ty và tôi sẽ cung cấp thông tin chi tiết."
+
+        elif intent == "intent_guide":
+            # Handle website usage guide requests
+            return "Tôi có thể hướng dẫn bạn sử dụng website tuyển dụng. Bạn cần hỗ trợ về vấn đề gì? (Đăng ký tài khoản, tìm kiếm việc làm, đăng tin tuyển dụng, etc.)"
+
+        elif intent == "intent_feedback":
+            # Handle feedback collection
+            return "Cảm ơn bạn muốn đóng góp ý kiến! Hãy chia sẻ phản hồi của bạn về trải nghiệm sử dụng website và dịch vụ của chúng tôi."
+
+        # Default fallback
+        return messages
+
+    def _plan_job_search(self, query: str, extracted_features: dict) -> Union[str, List[Dict[str, str]]]:
+        if extracted_features:
+            # Process the extracted features and generate response
+            features_text = self._format_extracted_features(extracted_features)
+            return f"Tôi đã hiểu yêu cầu của bạn:\n{features_text}\n\nTôi sẽ tìm kiếm các công việc phù hợp cho bạn."
+
+        # Fallback if no features extracted
+        return self.prompt_config.get_messages("recruitment_incomplete", user_input=query)
+
+    async def _aplan_response(self, intent: str, query: str, messages: List[Dict[str, str]]) -> Union[str, List[Dict[str, str]]]:
+        """Bản async của _plan_response: trích xuất đặc trưng cho intent_jd chờ Ollama trên event loop"""
+        if intent != "intent_jd":
+            return self._plan_response(intent, query, messages)
+
+        try:
+            with CHAT_STAGE_SECONDS.time(stage="feature_extraction"):
+                extracted_features = await self.feature_extractor.aextract(
+                    query=query,
+                    prompt_type="extract_features_question_about_job"
+                )
+            return self._plan_job_search(query, extracted_features)
+        except Exception as extraction_error:
+            logging.error(f"Error in feature extraction: {str(extraction_error)}")
+            return messages
+
+    def chat(self, message: str, include_history: bool = True) -> str:
+        with CHAT_STAGE_SECONDS.time(stage="total"):
+            return self._chat(message, include_history)
+
+    def _chat(self, message: str, include_history: bool) -> str:
+        messages = self._prepare_messages(message, include_history)
+
+        try:
+            summarise_convervation, intent = self._understand(messages)
+            response_cache = get_response_cache()
+            cached_response = response_cache.get(summarise_convervation, intent)
+            if cached_response is not None:
+                self.add_assistant_message(cached_response)
+                return cached_response
+
+            plan = self._plan_response(intent, summarise_convervation, messages)
+
+            if isinstance(plan, str):
+                assistant_response = self._strip_think(plan)
+            else:
+                self._record_prompt_tokens("answer", plan)
+                with CHAT_STAGE_SECONDS.time(stage="generation"), llm_prompt("response"):
+                    assistant_response = self._strip_think(self.client.generate_chat(plan, profile="answer"))
+                response_cache.put(summarise_convervation, intent, assistant_response)
+
             self.add_assistant_message(assistant_response)
             return assistant_response
-            
+
+        except AdmissionRejected:
+            # Backend quá tải: để API trả 429/503 + Retry-After thay vì một câu trả lời lỗi
+            raise
         except Exception as e:
             error_msg = f"Error communicating with Ollama: {str(e)}"
             self.add_assistant_message(error_msg)
             return error_msg
 
+    def chat_stream(self, message: str, include_history: bool = True) -> Iterator[str]:
+        """
+        Giống chat() nhưng yield câu trả lời theo từng chunk.
+
+        Reflection và phân loại intent vẫn chạy như cũ; chỉ bước sinh câu trả lời
+        được stream, với block <think> được lọc ngay trong lúc stream.
+        """
+        started_at = time.perf_counter()
+        messages = self._prepare_messages(message, include_history)
+        parts = []
+
+        try:
+            summarise_convervation, intent = self._understand(messages)
+            response_cache = get_response_cache()
+            cached_response = response_cache.get(summarise_convervation, intent)
+            if cached_response is not None:
+                plan = cached_response
+            else:
+                plan = self._plan_response(intent, summarise_convervation, messages)
+
+            if isinstance(plan, str):
+                parts.append(plan)
+                CHAT_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started_at)
+                yield plan
+            else:
+                generation_start = time.perf_counter()
+                think_filter = ThinkTagFilter()
+                self._record_prompt_tokens("answer", plan)
+                with llm_prompt("response"):
+                    stream = self.client.generate_chat_stream(plan, profile="answer")
+                    # Tên prompt được đọc khi generator bắt đầu chạy, trước khi rời khỏi block
+                    first_chunk = next(stream, None)
+                chunks = [] if first_chunk is None else [first_chunk]
+                for chunk in itertools.chain(chunks, stream):
+                    visible = think_filter.feed(chunk)
+                    if visible:
+                        if not parts:
+                            CHAT_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started_at)
+                        parts.append(visible)
+                        yield visible
+                tail = think_filter.flush()
+                if tail:
+                    parts.append(tail)
+                    yield tail
+                CHAT_STAGE_SECONDS.observe(time.perf_counter() - generation_start, stage="generation")
+                response_cache.put(summarise_convervation, intent, "".join(parts))
+
+            self.add_assistant_message("".join(parts))
+            CHAT_STAGE_SECONDS.observe(time.perf_counter() - started_at, stage="total")
+
+        except AdmissionRejected:
+            if parts:
+                self.add_assistant_message("".join(parts))
+            raise
+        except Exception as e:
+            error_msg = f"Error communicating with Ollama: {str(e)}"
+            self.add_assistant_message("".join(parts) or error_msg)
+            yield error_msg
+
+    async def _aprepare(self, message: str, include_history: bool) -> tuple:
+        """
+        Các bước trước generation của achat / achat_stream
+
+        Reflection, phân loại intent và trích xuất đặc trưng chờ Ollama trên event loop (không giữ thread);
+        response cache được tra trước, chỉ lập kế hoạch trả lời (có thể gọi LLM) khi cache miss.
+
+        Returns:
+            (câu hỏi độc lập, intent, câu trả lời đã cache hoặc plan của _plan_response)
+        """
+        messages = await asyncio.to_thread(self._prepare_messages, message, include_history)
+        summarise_convervation, intent = await self._aunderstand(messages)
+
+        cached_response = await asyncio.to_thread(get_response_cache().get, summarise_convervation, intent)
+        if cached_response is not None:
+            return summarise_convervation, intent, cached_response
+        plan = await self._aplan_response(intent, summarise_convervation, messages)
+        return summarise_convervation, intent, plan
+
+    async def achat(self, message: str, include_history: bool = True) -> str:
+        """
+        Bản async của chat(): bước sinh câu trả lời (bước dài nhất) chờ Ollama trên event loop
+        qua AsyncOllamaLLMs thay vì giữ một worker thread trong suốt thời gian generation
+        """
+        with CHAT_STAGE_SECONDS.time(stage="total"):
+            try:
+                summarise_convervation, intent, plan = await self._aprepare(message, include_history)
+
+                if isinstance(plan, str):
+                    assistant_response = self._strip_think(plan)
+                else:
+                    self._record_prompt_tokens("answer", plan)
+                    with CHAT_STAGE_SECONDS.time(stage="generation"), llm_prompt("response"):
+                        assistant_response = self._strip_think(
+                            await self.async_client.generate_chat(plan, profile="answer")
+                        )
+                    await asyncio.to_thread(get_response_cache().put, summarise_convervation, intent, assistant_response)
+
+                await asyncio.to_thread(self.add_assistant_message, assistant_response)
+                return assistant_response
+
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                error_msg = f"Error communicating with Ollama: {str(e)}"
+                await asyncio.to_thread(self.add_assistant_message, error_msg)
+                return error_msg
+
+    async def achat_stream(self, message: str, include_history: bool = True) -> AsyncIterator[str]:
+        """Bản async của chat_stream(): yield từng chunk câu trả lời (đã lọc <think>)"""
+        started_at = time.perf_counter()
+        parts = []
+
+        try:
+            summarise_convervation, intent, plan = await self._aprepare(message, include_history)
+
+            if isinstance(plan, str):
+                parts.append(plan)
+                CHAT_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started_at)
+                yield plan
+            else:
+                generation_start = time.perf_counter()
+                think_filter = ThinkTagFilter()
+                self._record_prompt_tokens("answer", plan)
+                with llm_prompt("response"):
+                    stream = self.async_client.generate_chat_stream(plan, profile="answer")
+                    # Tên prompt được đọc khi generator bắt đầu chạy, trước khi rời khỏi block
+                    first_chunk = await anext(stream, None)
+                while first_chunk is not None:
+                    visible = think_filter.feed(first_chunk)
+                    if visible:
+                        if not parts:
+                            CHAT_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started_at)
+                        parts.append(visible)
+                        yield visible
+                    first_chunk = await anext(stream, None)
+                tail = think_filter.flush()
+                if tail:
+                    parts.append(tail)
+                    yield tail
+                CHAT_STAGE_SECONDS.observe(time.perf_counter() - generation_start, stage="generation")
+                await asyncio.to_thread(get_response_cache().put, summarise_convervation, intent, "".join(parts))
+
+            await asyncio.to_thread(self.add_assistant_message, "".join(parts))
+            CHAT_STAGE_SECONDS.observe(time.perf_counter() - started_at, stage="total")
+
+        except AdmissionRejected:
+            if parts:
+                await asyncio.to_thread(self.add_assistant_message, "".join(parts))
+            raise
+        except Exception as e:
+            error_msg = f"Error communicating with Ollama: {str(e)}"
+            await asyncio.to_thread(self.add_assistant_message, "".join(parts) or error_msg)
+            yield error_msg
+
     def _format_extracted_features(self, features: dict) -> str:
         """Format extracted features for user display"""
         formatted_parts = []
@@ -183,7 +553,7 @@ class ChatbotOllama(BaseChatbot):
 
     def classify_intent(self, message: str) -> str:
         """
-        Classify the intent of a user message using the LLM
+        Classify the intent of a user message (SemanticRouter fast path, LLM on low confidence)
         
         Args:
             message: The user message to classify
@@ -192,11 +562,10 @@ class ChatbotOllama(BaseChatbot):
             The classified intent as a string
         """
         try:
-            # Use the LLM to classify the intent
-            classification_prompt = self.prompt_config.get_prompt("classification_chat_intent", user_input=message)
-            intent = self._strip_think(self.client.generate_content([{"role": "user", "content": classification_prompt}]))
+            # Router trước, chỉ gọi LLM khi router không đủ tự tin
+            intent, _ = get_intent_classifier().classify(message, self._classify_with_llm)
             return intent.strip()
         except Exception as e:
             logging.error(f"Error in intent classification: {str(e)}")
             # Return a default intent in case of error
-            return "intent_chitchat"
\ No newline at end of file
+            return "intent_chitchat"
@@ -1,32 +1,100 @@
 
+import threading
+import uuid
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
+
+from .conversation_backend import ConversationBackend, InMemoryConversationBackend
+
+
+def _content_bytes(message: Optional[Dict[str, Any]]) -> int:
+    return len(str((message or {}).get("content", "")).encode("utf-8"))
 
 
 class BaseChatbot(ABC):
-    def __init__(self, model_name: str = None, **kwargs):
+    def __init__(self, model_name: str = None, session_id: str = None, backend: ConversationBackend = None, **kwargs):
+        """
+        Args:
+            model_name: tên model
+            session_id: id của phiên chat (mặc định: id ngẫu nhiên)
+            backend: nơi lưu lịch sử/state/context (mặc định: trong bộ nhớ của instance này)
+        """
         self.model_name = model_name
-        self.conversation_history = []
-        self.conversation_state = "idle"  # idle, waiting_for_location, waiting_for_skills, etc.
-        self.recruitment_context = {}  # Store recruitment-related information
+        self.session_id = session_id or str(uuid.uuid4())
+        self.backend = backend or InMemoryConversationBackend()
+        # Bytes lịch sử của session, cập nhật theo từng tin nhắn thêm/bớt (None = chưa đọc từ backend)
+        self._history_bytes: Optional[int] = None
+        self._history_bytes_lock = threading.Lock()
+
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        return self.backend.get_history(self.session_id)
+
+    @property
+    def conversation_state(self) -> str:
+        """idle, waiting_for_location, waiting_for_skills, etc."""
+        return self.backend.get_state(self.session_id)
+
+    @conversation_state.setter
+    def conversation_state(self, state: str):
+        self.backend.set_state(self.session_id, state)
+
+    @property
+    def recruitment_context(self) -> Dict[str, Any]:
+        """Store recruitment-related information (gán lại cả dict để lưu thay đổi)"""
+        return self.backend.get_context(self.session_id)
+
+    @recruitment_context.setter
+    def recruitment_context(self, context: Dict[str, Any]):
+        self.backend.set_context(self.session_id, context)
     
+    def _append(self, role: str, message: str):
+        self.backend.append(self.session_id, role, message)
+        self._add_history_bytes(_content_bytes({"content": message}))
+
+    def _add_history_bytes(self, size: int):
+        with self._history_bytes_lock:
+            if self._history_bytes is not None:
+                self._history_bytes = max(0, self._history_bytes + size)
+
+    def history_size(self) -> int:
+        """
+        Bytes (UTF-8) nội dung lịch sử: đọc backend một lần, sau đó cộng dồn theo các tin nhắn
+        thêm/bớt qua chatbot này (không đọc và copy lại toàn bộ lịch sử mỗi lượt)
+        """
+        with self._history_bytes_lock:
+            if self._history_bytes is not None:
+                return self._history_bytes
+        size = sum(_content_bytes(message) for message in self.get_history())
+        with self._history_bytes_lock:
+            if self._history_bytes is None:
+                self._history_bytes = size
+            return self._history_bytes
+
     def add_system_message(self, message: str):
-        self.conversation_history.append({"role": "system", "content": message})
+        self._append("system", message)
         
     def add_user_message(self, message: str):
-        self.conversation_history.append({"role": "user", "content": message})
+        self._append("user", message)
     
     def add_assistant_message(self, message: str):
-        self.conversation_history.append({"role": "assistant", "content": message})
+        self._append("assistant", message)
+
+    def drop_oldest_message(self) -> Optional[Dict[str, str]]:
+        """Xóa tin nhắn cũ nhất (giữ system message và tin nhắn cuối), dùng khi cắt lịch sử"""
+        removed = self.backend.drop_oldest(self.session_id)
+        if removed is not None:
+            self._add_history_bytes(-_content_bytes(removed))
+        return removed
         
     @abstractmethod
     def classify_intent(self, message: str) -> str:
         pass
     
     def clear_history(self):
-        self.conversation_history = []
-        self.conversation_state = "idle"
-        self.recruitment_context = {}
+        self.backend.clear(self.session_id)
+        with self._history_bytes_lock:
+            self._history_bytes = 0
     
     def clear_conversation_state(self):
         """Clear conversation state while keeping history"""
@@ -0,0 +1,398 @@
+"""
+Backend lưu trạng thái hội thoại (lịch sử, conversation_state, recruitment_context, tóm tắt lịch sử) cho BaseChatbot
+
+- InMemoryConversationBackend: dữ liệu nằm trong process (mặc định, như trước đây)
+- SQLiteConversationBackend: file SQLite (WAL) dùng chung giữa nhiều gunicorn worker,
+  giữ được hội thoại qua restart
+
+Mọi ghi đều là append một lượt chat (không ghi lại toàn bộ lịch sử). Interface được thiết kế để
+một store kiểu Redis có thể implement sau: append ~ RPUSH, get_history ~ LRANGE từ seq đã biết,
+context/state/summary ~ HSET/HGET, clear ~ DEL + tăng generation.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ConversationBackend(ABC):
+    """Interface lưu trạng thái hội thoại theo session_id"""
+
+    @abstractmethod
+    def append(self, session_id: str, role: str, content: str):
+        """Thêm một tin nhắn vào cuối lịch sử"""
+
+    @abstractmethod
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        """Toàn bộ lịch sử theo thứ tự [{role, content}, ...] (bản sao, sửa không ảnh hưởng store)"""
+
+    def get_history_since(self, session_id: str, start: int) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        """
+        (các system message, các tin nhắn không phải system từ vị trí start trở đi) - bản sao
+
+        Dùng để chỉ đọc phần lịch sử chưa được tóm tắt; mặc định suy ra từ get_history (backend
+        có thể override để không copy toàn bộ lịch sử).
+        """
+        history = self.get_history(session_id)
+        system = [m for m in history if m.get("role") == "system"]
+        turns = [m for m in history if m.get("role") != "system"]
+        return system, turns[start:]
+
+    @abstractmethod
+    def drop_oldest(self, session_id: str, keep_roles=("system",)) -> Optional[Dict[str, str]]:
+        """Xóa tin nhắn cũ nhất (bỏ qua các role trong keep_roles và tin nhắn cuối), trả về tin nhắn đã xóa"""
+
+    @abstractmethod
+    def clear(self, session_id: str):
+        """Xóa lịch sử, state và context của session"""
+
+    @abstractmethod
+    def get_state(self, session_id: str) -> str:
+        pass
+
+    @abstractmethod
+    def set_state(self, session_id: str, state: str):
+        pass
+
+    @abstractmethod
+    def get_context(self, session_id: str) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def set_context(self, session_id: str, context: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def get_summary(self, session_id: str) -> Dict[str, Any]:
+        """Trạng thái rolling summary của ConversationHistory ({} nếu chưa có)"""
+
+    @abstractmethod
+    def set_summary(self, session_id: str, summary: Dict[str, Any]):
+        pass
+
+    def evict(self, session_id: str):
+        """
+        Session bị bỏ khỏi bộ nhớ của process (hết TTL / vượt giới hạn).
+        Backend trong process xóa dữ liệu; backend dùng chung chỉ bỏ cache cục bộ.
+        """
+
+
+class InMemoryConversationBackend(ConversationBackend):
+    """Lưu trong dict của process (không dùng chung giữa các worker)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histories: Dict[str, List[Dict[str, str]]] = {}
+        # Các tin nhắn không phải system của từng session (cùng object với _histories) cho get_history_since
+        self._turns: Dict[str, List[Dict[str, str]]] = {}
+        self._states: Dict[str, str] = {}
+        self._contexts: Dict[str, Dict[str, Any]] = {}
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+
+    def append(self, session_id: str, role: str, content: str):
+        message = {"role": role, "content": content}
+        with self._lock:
+            self._histories.setdefault(session_id, []).append(message)
+            if role != "system":
+                self._turns.setdefault(session_id, []).append(message)
+
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        with self._lock:
+            return [dict(message) for message in self._histories.get(session_id, [])]
+
+    def get_history_since(self, session_id: str, start: int) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        with self._lock:
+            history = self._histories.get(session_id, [])
+            turns = self._turns.get(session_id, [])
+            # System message hiếm và thường nằm đầu lịch sử: chỉ quét khi có
+            system = [dict(m) for m in history if m["role"] == "system"] if len(turns) != len(history) else []
+            return system, [dict(message) for message in turns[start:]]
+
+    def drop_oldest(self, session_id: str, keep_roles=("system",)) -> Optional[Dict[str, str]]:
+        with self._lock:
+            history = self._histories.get(session_id, [])
+            for index, message in enumerate(history[:-1]):
+                if message["role"] not in keep_roles:
+                    removed = history.pop(index)
+                    turns = self._turns.get(session_id, [])
+                    for turn_index, turn in enumerate(turns):
+                        if turn is removed:
+                            del turns[turn_index]
+                            break
+                    return removed
+        return None
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._histories.pop(session_id, None)
+            self._turns.pop(session_id, None)
+            self._states.pop(session_id, None)
+            self._contexts.pop(session_id, None)
+            self._summaries.pop(session_id, None)
+
+    def get_state(self, session_id: str) -> str:
+        with self._lock:
+            return self._states.get(session_id, "idle")
+
+    def set_state(self, session_id: str, state: str):
+        with self._lock:
+            self._states[session_id] = state
+
+    def get_context(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._contexts.get(session_id, {}))
+
+    def set_context(self, session_id: str, context: Dict[str, Any]):
+        with self._lock:
+            self._contexts[session_id] = dict(context)
+
+    def get_summary(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._summaries.get(session_id, {}))
+
+    def set_summary(self, session_id: str, summary: Dict[str, Any]):
+        with self._lock:
+            self._summaries[session_id] = dict(summary)
+
+    def evict(self, session_id: str):
+        self.clear(session_id)
+
+
+class SQLiteConversationBackend(ConversationBackend):
+    """
+    Lưu hội thoại trong SQLite (WAL) để nhiều worker process cùng phục vụ một hội thoại.
+
+    - turns(session_id, seq, role, content): mỗi lượt chat là một dòng, append bằng INSERT
+    - sessions(session_id, generation, state, context, summary): generation tăng khi xóa/cắt lịch sử
+    - Mỗi process cache lịch sử gần đây; lần đọc sau chỉ lấy các dòng có seq lớn hơn seq đã biết,
+      đọc lại toàn bộ khi generation thay đổi (worker khác vừa xóa/cắt lịch sử)
+    """
+
+    def __init__(self, path: str, max_cached_sessions: int = 1024):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_cached_sessions = max_cached_sessions
+
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        # session_id -> {"generation", "last_seq", "messages", "system", "turns"}
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        conn = self._connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL DEFAULT 'idle',
+                context TEXT NOT NULL DEFAULT '{}',
+                summary TEXT NOT NULL DEFAULT '{}',
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS turns (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+        """)
+        # File tạo từ phiên bản trước chưa có cột summary
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "summary" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN summary TEXT NOT NULL DEFAULT '{}'")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Một connection cho mỗi thread, tạo lại sau fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, sql_statements):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in sql_statements:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _touch_session(session_id: str, bump_generation: bool = False):
+        if bump_generation:
+            return (
+                "INSERT INTO sessions (session_id, generation, updated_at) VALUES (?, 1, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET generation = generation + 1, updated_at = excluded.updated_at",
+                (session_id, time.time())
+            )
+        return (
+            "INSERT INTO sessions (session_id, updated_at) VALUES (?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (session_id, time.time())
+        )
+
+    def append(self, session_id: str, role: str, content: str):
+        self._write([
+            self._touch_session(session_id),
+            (
+                "INSERT INTO turns (session_id, seq, role, content, created_at) "
+                "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ? FROM turns WHERE session_id = ?",
+                (session_id, role, content, time.time(), session_id)
+            ),
+        ])
+
+    def _refresh(self, session_id: str) -> Dict[str, Any]:
+        """
+        Entry cache của session cập nhật tới lượt mới nhất: chỉ đọc các dòng có seq lớn hơn seq đã biết
+        và nối vào entry (không copy lại lịch sử); đọc lại toàn bộ khi generation thay đổi.
+        Entry chỉ được đọc / sửa khi giữ _cache_lock.
+        """
+        conn = self._connection()
+        with self._cache_lock:
+            cached = self._cache.get(session_id)
+            known = (cached["generation"], cached["last_seq"]) if cached is not None else (None, 0)
+
+        while True:
+            # Đọc generation và các lượt mới trong cùng một read transaction (snapshot nhất quán)
+            conn.execute("BEGIN")
+            try:
+                row = conn.execute("SELECT generation FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                generation = row[0] if row else 0
+                since = known[1] if known[0] == generation else 0
+                rows = conn.execute(
+                    "SELECT seq, role, content FROM turns WHERE session_id = ? AND seq > ? ORDER BY seq",
+                    (session_id, since)
+                ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+
+            with self._cache_lock:
+                cached = self._cache.get(session_id)
+                if cached is None or cached["generation"] != generation or cached["last_seq"] < since:
+                    if since:
+                        # Entry bị bỏ khỏi cache trong lúc đọc: các dòng vừa đọc chỉ là phần cuối, đọc lại toàn bộ
+                        known = (None, 0)
+                        continue
+                    cached = {"generation": generation, "last_seq": 0, "messages": [], "system": [], "turns": []}
+
+                for seq, role, content in rows:
+                    if seq <= cached["last_seq"]:
+                        continue  # thread khác đã thêm lượt này vào entry
+                    message = {"role": role, "content": content}
+                    cached["messages"].append(message)
+                    (cached["system"] if role == "system" else cached["turns"]).append(message)
+                    cached["last_seq"] = seq
+
+                self._cache[session_id] = cached
+                self._cache.move_to_end(session_id)
+                while len(self._cache) > self.max_cached_sessions:
+                    self._cache.popitem(last=False)
+                return cached
+
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        cached = self._refresh(session_id)
+        with self._cache_lock:
+            return [dict(message) for message in cached["messages"]]
+
+    def get_history_since(self, session_id: str, start: int) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        cached = self._refresh(session_id)
+        with self._cache_lock:
+            return [dict(m) for m in cached["system"]], [dict(m) for m in cached["turns"][start:]]
+
+    def drop_oldest(self, session_id: str, keep_roles=("system",)) -> Optional[Dict[str, str]]:
+        conn = self._connection()
+        placeholders = ",".join("?" * len(keep_roles)) or "''"
+        row = conn.execute(
+            f"SELECT seq, role, content FROM turns WHERE session_id = ? AND role NOT IN ({placeholders}) "
+            "AND seq < (SELECT MAX(seq) FROM turns WHERE session_id = ?) ORDER BY seq LIMIT 1",
+            (session_id, *keep_roles, session_id)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self._write([
+            ("DELETE FROM turns WHERE session_id = ? AND seq = ?", (session_id, row[0])),
+            self._touch_session(session_id, bump_generation=True),
+        ])
+        return {"role": row[1], "content": row[2]}
+
+    def clear(self, session_id: str):
+        self._write([
+            ("DELETE FROM turns WHERE session_id = ?", (session_id,)),
+            self._touch_session(session_id, bump_generation=True),
+            ("UPDATE sessions SET state = 'idle', context = '{}', summary = '{}' WHERE session_id = ?", (session_id,)),
+        ])
+        self.evict(session_id)
+
+    def get_state(self, session_id: str) -> str:
+        row = self._connection().execute("SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else "idle"
+
+    def set_state(self, session_id: str, state: str):
+        self._write([
+            self._touch_session(session_id),
+            ("UPDATE sessions SET state = ? WHERE session_id = ?", (state, session_id)),
+        ])
+
+    def get_context(self, session_id: str) -> Dict[str, Any]:
+        row = self._connection().execute("SELECT context FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set_context(self, session_id: str, context: Dict[str, Any]):
+        self._write([
+            self._touch_session(session_id),
+            ("UPDATE sessions SET context = ? WHERE session_id = ?", (json.dumps(context, ensure_ascii=False), session_id)),
+        ])
+
+    def get_summary(self, session_id: str) -> Dict[str, Any]:
+        row = self._connection().execute("SELECT summary FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set_summary(self, session_id: str, summary: Dict[str, Any]):
+        self._write([
+            self._touch_session(session_id),
+            ("UPDATE sessions SET summary = ? WHERE session_id = ?", (json.dumps(summary, ensure_ascii=False), session_id)),
+        ])
+
+    def evict(self, session_id: str):
+        # Dữ liệu vẫn nằm trong SQLite, chỉ bỏ cache cục bộ của process
+        with self._cache_lock:
+            self._cache.pop(session_id, None)
+
+
+_conversation_backend = None
+_conversation_backend_lock = threading.Lock()
+
+
+def get_conversation_backend() -> ConversationBackend:
+    """
+    Backend dùng chung trong process, chọn theo CONVERSATION_BACKEND ("memory" | "sqlite")
+    """
+    global _conversation_backend
+    if _conversation_backend is None:
+        with _conversation_backend_lock:
+            if _conversation_backend is None:
+                from setting import get_settings
+
+                settings = get_settings()
+                if settings.CONVERSATION_BACKEND == "sqlite":
+                    _conversation_backend = SQLiteConversationBackend(settings.CONVERSATION_DB_PATH)
+                elif settings.CONVERSATION_BACKEND == "memory":
+                    _conversation_backend = InMemoryConversationBackend()
+                else:
+                    raise ValueError(f"Unknown CONVERSATION_BACKEND '{settings.CONVERSATION_BACKEND}', expected 'memory' or 'sqlite'")
+    return _conversation_backend
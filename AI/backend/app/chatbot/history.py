@@ -0,0 +1,199 @@
+"""
+Lịch sử hội thoại đưa vào prompt: N lượt gần nhất giữ nguyên văn + một bản tóm tắt cuốn chiếu (rolling summary)
+của các lượt cũ hơn, lắp theo ngân sách token (num_ctx của profile) thay vì copy toàn bộ lịch sử mỗi lượt
+
+Bản tóm tắt được cập nhật tăng dần: mỗi lần chỉ gộp các tin nhắn vừa bị đẩy ra khỏi cửa sổ N lượt
+(tóm tắt cũ + các lượt mới → tóm tắt mới), không tóm tắt lại toàn bộ lịch sử. Trạng thái
+{"text", "covered", "anchor", "folded"} lưu trong ConversationBackend (get_summary / set_summary).
+"""
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from llms.token_budget import CHARS_PER_TOKEN, estimate_tokens, fit_messages
+from metrics import CHAT_HISTORY_SUMMARIES, llm_prompt
+
+from .conversation_backend import ConversationBackend
+
+SUMMARY_PREFIX = "Tóm tắt các lượt hội thoại trước:"
+
+# summarize(tóm tắt hiện tại, các tin nhắn mới bị đẩy khỏi cửa sổ) -> tóm tắt mới
+Summarizer = Callable[[str, List[Dict[str, str]]], str]
+
+
+def is_summary_message(message: Dict[str, str]) -> bool:
+    return message.get("role") == "system" and (message.get("content") or "").startswith(SUMMARY_PREFIX)
+
+
+def format_transcript(messages: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{m.get('role', '')}: {m.get('content') or ''}" for m in messages)
+
+
+def _fingerprint(message: Dict[str, str]) -> str:
+    payload = f"{message.get('role', '')}\x00{message.get('content') or ''}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def make_llm_summarizer(llm, prompt_config) -> Summarizer:
+    """Summarizer gọi LLM với prompt conversation_summary, profile "summary" (output ngắn, tất định)"""
+    def summarize(previous: str, messages: List[Dict[str, str]]) -> str:
+        prompt = prompt_config.get_messages(
+            "conversation_summary",
+            summary=previous or "(chưa có)",
+            new_turns=format_transcript(messages)
+        )
+        with llm_prompt("conversation_summary"):
+            output = llm.generate_chat(prompt, profile="summary")
+        return re.sub(r"<think>.*?</think>", "", output or "", flags=re.DOTALL | re.IGNORECASE).strip()
+    return summarize
+
+
+# Gộp tóm tắt chạy nền sau khi trả lời xong (không nằm trên đường đi của request);
+# mỗi session tối đa một lần gộp đang chạy
+_summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+_folding: set = set()
+_folding_lock = threading.Lock()
+
+
+class ConversationHistory:
+    """
+    Góc nhìn có giới hạn token lên lịch sử của một session
+
+    - view(budget): system messages + tóm tắt + các tin nhắn chưa được tóm tắt (cắt theo budget, giữ tin mới nhất)
+    - fold(): gộp các tin nhắn đã ra khỏi cửa sổ keep_turns lượt và chưa được tóm tắt vào bản tóm tắt
+    - schedule_fold(): fold() trên thread nền khi đã có đủ batch_turns lượt chờ tóm tắt
+
+    Khi session store cắt lịch sử (drop_oldest), vị trí đã tóm tắt được tìm lại theo anchor
+    (fingerprint của tin nhắn cuối cùng đã được tóm tắt).
+    """
+
+    def __init__(
+        self,
+        backend: ConversationBackend,
+        session_id: str,
+        keep_turns: int = 4,
+        batch_turns: int = 2,
+        summarize: Optional[Summarizer] = None,
+        chars_per_token: float = CHARS_PER_TOKEN
+    ):
+        self.backend = backend
+        self.session_id = session_id
+        self.keep_turns = max(1, keep_turns)
+        self.batch_turns = max(1, batch_turns)
+        self.summarize = summarize
+        self.chars_per_token = chars_per_token
+
+    def _split(self) -> Tuple[List[Dict[str, str]], Dict[str, Any], int, List[Dict[str, str]], List[Dict[str, str]]]:
+        """
+        Chỉ đọc lịch sử từ tin nhắn cuối đã được tóm tắt (anchor, vị trí covered lưu trong trạng thái summary)
+        trở đi: chi phí mỗi lượt theo số tin nhắn chưa tóm tắt, không theo độ dài cả hội thoại.
+        Đọc lại toàn bộ khi anchor không còn ở vị trí đó (session store đã cắt lịch sử).
+
+        Returns:
+            (system messages, trạng thái summary, số tin nhắn đã tóm tắt,
+             tin nhắn chờ tóm tắt (ngoài cửa sổ), cửa sổ keep_turns lượt gần nhất)
+        """
+        state = self.backend.get_summary(self.session_id)
+        covered, anchor = state.get("covered", 0), state.get("anchor")
+
+        if covered and anchor:
+            system, tail = self.backend.get_history_since(self.session_id, covered - 1)
+            if tail and _fingerprint(tail[0]) == anchor:
+                window_start = self._window_start(tail)
+                # Cửa sổ phải nằm hoàn toàn sau anchor, nếu không thì tính lại trên toàn bộ lịch sử
+                if window_start is not None and window_start >= 1:
+                    return system, state, covered, tail[1:window_start], tail[window_start:]
+
+        system, turns = self.backend.get_history_since(self.session_id, 0)
+        window_start = self._window_start(turns) or 0
+        covered = min(self._resolve_covered(turns, state), window_start)
+        return system, state, covered, turns[covered:window_start], turns[window_start:]
+
+    def _window_start(self, turns: List[Dict[str, str]]) -> Optional[int]:
+        """Cửa sổ bắt đầu từ tin nhắn user thứ keep_turns tính từ cuối (None nếu chưa đủ keep_turns lượt)"""
+        user_positions = [i for i, m in enumerate(turns) if m.get("role") == "user"]
+        return user_positions[-self.keep_turns] if len(user_positions) >= self.keep_turns else None
+
+    @staticmethod
+    def _resolve_covered(turns: List[Dict[str, str]], state: Dict[str, Any]) -> int:
+        covered, anchor = state.get("covered", 0), state.get("anchor")
+        if not covered or not anchor:
+            return 0
+        if covered <= len(turns) and _fingerprint(turns[covered - 1]) == anchor:
+            return covered
+        # Lịch sử bị cắt từ đầu: anchor lùi về trước; anchor bị cắt luôn thì mọi tin nhắn còn lại đều chưa tóm tắt
+        for index in range(min(covered, len(turns)) - 1, -1, -1):
+            if _fingerprint(turns[index]) == anchor:
+                return index + 1
+        return 0
+
+    def view(self, budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """Messages đưa vào prompt: [system..., tóm tắt?, tin nhắn chưa tóm tắt gần nhất vừa budget]"""
+        system, state, _, pending, window = self._split()
+        head = list(system)
+        if state.get("text"):
+            head.append({"role": "system", "content": f"{SUMMARY_PREFIX}\n{state['text']}"})
+        return fit_messages(head + pending + window, budget, pinned=len(head), chars_per_token=self.chars_per_token)
+
+    def pending_turns(self) -> int:
+        """Số lượt (tin nhắn user) đã ra khỏi cửa sổ nhưng chưa được tóm tắt"""
+        _, _, _, pending, _ = self._split()
+        return sum(1 for m in pending if m.get("role") == "user")
+
+    def fold(self) -> bool:
+        """Gộp các tin nhắn chờ tóm tắt vào bản tóm tắt (một lần gọi summarizer), True nếu có cập nhật"""
+        if self.summarize is None:
+            return False
+        _, state, covered, pending, _ = self._split()
+        if not pending:
+            return False
+
+        try:
+            text = self.summarize(state.get("text", ""), pending)
+        except Exception as e:
+            CHAT_HISTORY_SUMMARIES.inc(status="error")
+            print(f"⚠️ History summary failed for session {self.session_id}: {e}")
+            return False
+        if not text:
+            CHAT_HISTORY_SUMMARIES.inc(status="empty")
+            return False
+
+        self.backend.set_summary(self.session_id, {
+            "text": text,
+            "covered": covered + len(pending),
+            "anchor": _fingerprint(pending[-1]),
+            "folded": state.get("folded", 0) + len(pending),
+        })
+        CHAT_HISTORY_SUMMARIES.inc(status="ok")
+        return True
+
+    def schedule_fold(self) -> bool:
+        """Chạy fold() nền nếu đủ batch_turns lượt chờ tóm tắt và session chưa có lần gộp nào đang chạy"""
+        if self.summarize is None or self.pending_turns() < self.batch_turns:
+            return False
+        with _folding_lock:
+            if self.session_id in _folding:
+                return False
+            _folding.add(self.session_id)
+
+        def run():
+            try:
+                self.fold()
+            finally:
+                with _folding_lock:
+                    _folding.discard(self.session_id)
+
+        _summary_pool.submit(run)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        _, state, _, pending, window = self._split()
+        return {
+            "keep_turns": self.keep_turns,
+            "summary_tokens": estimate_tokens(state.get("text"), self.chars_per_token),
+            "summarized_messages": state.get("folded", 0),
+            "pending_messages": len(pending),
+            "window_messages": len(window),
+        }
@@ -1,9 +1,11 @@
 """
 Simple Flask app for AI Recruitment System
 """
-from flask import Flask, jsonify, request, render_template, send_from_directory, session
+from flask import Flask, jsonify, request, render_template, send_from_directory, session, Response, stream_with_context
 import os
+import json
 import sys
+import threading
 import time
 import uuid
 from datetime import datetime
@@ -12,9 +14,21 @@ from datetime import datetime
 backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, backend_path)
 
+_import_started_at = time.perf_counter()
+from readiness import readiness, warm_up
 from llms.ollama_llms import OllamaLLMs
 from chatbot.ChatbotOllama import ChatbotOllama
+from chatbot.conversation_backend import get_conversation_backend
+from llms.admission import AdmissionRejected, get_admission_stats
+from llms.singleflight import get_singleflight
+from llms.profiles import get_generation_profiles
+from llms.transport import get_transport_stats
+from llms.tool_executor import get_tool_executor
+from session_store import SessionStore
+from metrics import metrics
+from setting import get_settings
 import logging
+readiness.record_phase("import", time.perf_counter() - _import_started_at)
 
 # Determine template folder path based on environment
 if os.getenv("DOCKER_ENV") == "true":
@@ -31,53 +45,149 @@ app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize LLM client using LLM Manager
-def initialize_llm_client():
-    try:
-        # Import LLM Manager
-        sys.path.insert(0, backend_path)
-        from llms.llm_manager import llm_manager
-        
-        # For Docker containers, use host.docker.internal to reach host machine
-        default_url = "http://host.docker.internal:11434" if os.getenv("DOCKER_ENV") == "true" else "http://localhost:11434"
-        ollama_url = os.getenv("OLLAMA_URL", default_url)
-        model_name = os.getenv("OLLAMA_MODEL", "hf.co/unsloth/Qwen3-4B-Instruct-2507-GGUF:Q4_K_M")
-        
-        logger.info(f"Initializing Ollama client with URL: {ollama_url}, Model: {model_name}")
-        
-        # Setup environment for ChatbotOllama
-        os.environ["OLLAMA_URL"] = ollama_url
-        os.environ["OLLAMA_MODEL"] = model_name
-        
-        # Use LLM Manager để tránh multiple instances
-        client = llm_manager.get_ollama_client(
-            base_url=ollama_url,
-            model_name=model_name
-        )
-        
-        # Simple connection test without generating content
-        import requests
-        response = requests.get(f"{ollama_url}/api/version", timeout=5)
-        if response.status_code == 200:
-            logger.info("Ollama server is accessible")
-            return client
-        else:
-            logger.warning(f"Ollama server returned status {response.status_code}")
-            return client  # Still return client, let individual requests handle errors
-        
-    except Exception as e:
-        logger.warning(f"Failed to verify Ollama connection: {e}")
-        # Fallback to direct creation if manager fails
-        from llms.ollama_llms import OllamaLLMs
-        return OllamaLLMs(
-            base_url=os.getenv("OLLAMA_URL", "http://localhost:11434"),
-            model_name=os.getenv("OLLAMA_MODEL", "hf.co/unsloth/Qwen3-4B-Instruct-2507-GGUF:Q4_K_M")
+# For Docker containers, use host.docker.internal to reach host machine
+default_url = "http://host.docker.internal:11434" if os.getenv("DOCKER_ENV") == "true" else "http://localhost:11434"
+OLLAMA_URL = os.getenv("OLLAMA_URL", default_url)
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "hf.co/unsloth/Qwen3-4B-Instruct-2507-GGUF:Q4_K_M")
+
+# Setup environment for ChatbotOllama
+os.environ["OLLAMA_URL"] = OLLAMA_URL
+os.environ["OLLAMA_MODEL"] = OLLAMA_MODEL
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """
+    LLM client dùng chung (tạo lazy ở lần dùng đầu, không gọi mạng khi import).
+    Kết nối tới Ollama được kiểm tra bởi /api/health/ollama và bước warm-up.
+    """
+    global _llm_client
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                try:
+                    from llms.llm_manager import llm_manager
+
+                    logger.info(f"Initializing Ollama client with URL: {OLLAMA_URL}, Model: {OLLAMA_MODEL}")
+                    # Use LLM Manager để tránh multiple instances
+                    _llm_client = llm_manager.get_ollama_client(base_url=OLLAMA_URL, model_name=OLLAMA_MODEL)
+                except Exception as e:
+                    logger.warning(f"Failed to create Ollama client via manager: {e}")
+                    _llm_client = OllamaLLMs(base_url=OLLAMA_URL, model_name=OLLAMA_MODEL)
+    return _llm_client
+
+
+_warmup_thread = None
+_warmup_pid = None
+_warmup_lock = threading.Lock()
+
+
+def start_background_warmup():
+    """
+    Warm-up embedding, routers và Ollama model trong thread nền;
+    /health/ready trả về 503 cho tới khi các thành phần sẵn sàng.
+
+    Chạy một lần mỗi process và không chạy lúc import (gunicorn --preload fork worker sau khi import app,
+    torch / thread khởi tạo trong master không dùng được trong worker): được gọi từ request đầu tiên
+    của process (before_request), lifespan của ASGI app hoặc __main__.
+    """
+    global _warmup_thread, _warmup_pid
+    with _warmup_lock:
+        if _warmup_thread is not None and _warmup_pid == os.getpid():
+            return _warmup_thread
+
+        readiness.require("embedding", "router", "ollama")
+        _warmup_thread = threading.Thread(
+            target=warm_up,
+            kwargs={"ollama_url": OLLAMA_URL, "model_name": OLLAMA_MODEL},
+            name="startup-warmup",
+            daemon=True
         )
+        _warmup_pid = os.getpid()
+        _warmup_thread.start()
+        return _warmup_thread
+
+
+def ensure_background_warmup():
+    """Warm-up của process hiện tại nếu ENABLE_MODEL_PRELOAD (không làm gì nếu đã chạy trong process này)"""
+    if get_settings().ENABLE_MODEL_PRELOAD:
+        start_background_warmup()
+
+
+@app.before_request
+def _ensure_warmup_in_worker():
+    # Request đầu tiên của mỗi process (kể cả probe /health/ready) khởi động warm-up
+    if _warmup_pid != os.getpid():
+        ensure_background_warmup()
+
+
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """
+    Chatbot của từng user session (giới hạn số session / bytes lịch sử, TTL, reaper chạy nền), tạo lazy
+    ở lần dùng đầu: import app không mở file SQLite hay khởi động reaper thread.
+    Lịch sử hội thoại nằm trong conversation backend (memory hoặc SQLite dùng chung giữa các worker)
+    """
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                settings = get_settings()
+                conversation_backend = get_conversation_backend()
+                _session_store = SessionStore(
+                    factory=lambda session_id: ChatbotOllama(session_id=session_id, backend=conversation_backend),
+                    on_evict=lambda session_id, chatbot: conversation_backend.evict(session_id),
+                    max_sessions=settings.SESSION_MAX_COUNT,
+                    max_history_bytes=settings.SESSION_MAX_HISTORY_BYTES,
+                    ttl_seconds=settings.SESSION_TTL_SECONDS,
+                    reap_interval_seconds=settings.SESSION_REAP_INTERVAL_SECONDS
+                )
+    return _session_store
+
+LLM_IN_FLIGHT = metrics.gauge("llm_in_flight", "Số lời gọi LLM đang chạy trên từng backend")
+LLM_QUEUE_DEPTH = metrics.gauge("llm_queue_depth", "Số lời gọi LLM đang chờ slot trên từng backend")
+LLM_REJECTED = metrics.gauge("llm_admission_rejected", "Số lời gọi LLM bị admission control từ chối (tích lũy)")
+LLM_HTTP_POOL_ACTIVE = metrics.gauge("llm_http_pool_active", "Số connection HTTP tới Ollama đang được dùng trên từng backend")
+LLM_HTTP_POOL_UTILIZATION = metrics.gauge("llm_http_pool_utilization", "Tỉ lệ connection đang dùng / kích thước pool")
+LLM_CIRCUIT_OPEN = metrics.gauge("llm_circuit_open", "1 nếu circuit breaker của backend đang mở (fail fast)")
+SESSIONS_LIVE = metrics.gauge("chatbot_sessions", "Số session chat đang giữ trong process")
+SESSIONS_HISTORY_BYTES = metrics.gauge("chatbot_session_history_bytes", "Tổng bytes lịch sử hội thoại đang giữ")
+EMBEDDING_CACHE_HIT_RATE = metrics.gauge("embedding_cache_hit_rate", "Hit rate của embedding cache (LRU + đĩa)")
+PROCESS_READY = metrics.gauge("process_ready", "1 nếu mọi thành phần bắt buộc đã sẵn sàng")
+
+
+def collect_runtime_gauges():
+    """Cập nhật các gauge lấy từ admission controller, session store, embedding cache, readiness (lúc scrape)"""
+    for backend, stats in get_admission_stats().items():
+        LLM_IN_FLIGHT.set(stats["in_flight"], backend=backend)
+        LLM_QUEUE_DEPTH.set(stats["queue_depth"], backend=backend)
+        for reason, count in stats["rejected"].items():
+            LLM_REJECTED.set(count, backend=backend, reason=reason)
+
+    for backend, stats in get_transport_stats().items():
+        LLM_HTTP_POOL_ACTIVE.set(stats["active"], backend=backend)
+        LLM_HTTP_POOL_UTILIZATION.set(stats["utilization"], backend=backend)
+        LLM_CIRCUIT_OPEN.set(1 if stats["breaker"]["state"] == "open" else 0, backend=backend)
+
+    store_stats = get_session_store().get_stats()
+    SESSIONS_LIVE.set(store_stats["live_sessions"])
+    SESSIONS_HISTORY_BYTES.set(store_stats["history_bytes"])
+
+    from llms.llm_manager import llm_manager
+    for name, stats in llm_manager.get_embedding_cache_stats().items():
+        if isinstance(stats, dict) and "hit_rate" in stats:
+            EMBEDDING_CACHE_HIT_RATE.set(stats["hit_rate"], model=name)
+
+    PROCESS_READY.set(1 if readiness.is_ready() else 0)
+
+
+metrics.add_collector(collect_runtime_gauges)
 
-llm_client = initialize_llm_client()
-
-# Dictionary to store chatbot instances for each user session
-user_chatbots = {}
 
 def get_session_id():
     """Get or create session ID for current user"""
@@ -88,43 +198,15 @@ def get_session_id():
 
 def get_user_chatbot(session_id):
     """Get or create chatbot instance for specific user session"""
-    if session_id not in user_chatbots:
-        try:
-            chatbot = ChatbotOllama()
-            # chatbot.add_system_message(
-            #     "Bạn là một trợ lý thân thiện trong lĩnh vực tuyển dụng. "
-            #     "Hãy giúp đỡ ứng viên về việc làm, phỏng vấn và tư vấn nghề nghiệp. "
-            #     "Trả lời ngắn gọn và hữu ích."s
-            # )
-            user_chatbots[session_id] = {
-                'chatbot': chatbot,
-                'created_at': datetime.now(),
-                'last_activity': datetime.now()
-            }
-            logger.info(f"Created new chatbot for session: {session_id}")
-        except Exception as e:
-            logger.error(f"Failed to create chatbot for session {session_id}: {e}")
-            return None
-    
-    # Update last activity
-    user_chatbots[session_id]['last_activity'] = datetime.now()
-    return user_chatbots[session_id]['chatbot']
+    try:
+        return get_session_store().get_or_create(session_id)
+    except Exception as e:
+        logger.error(f"Failed to create chatbot for session {session_id}: {e}")
+        return None
 
 def cleanup_inactive_sessions():
-    """Remove inactive user sessions (older than 1 hour)"""
-    current_time = datetime.now()
-    inactive_sessions = []
-    
-    for session_id, data in user_chatbots.items():
-        time_diff = current_time - data['last_activity']
-        if time_diff.total_seconds() > 3600:  # 1 hour
-            inactive_sessions.append(session_id)
-    
-    for session_id in inactive_sessions:
-        del user_chatbots[session_id]
-        logger.info(f"Cleaned up inactive session: {session_id}")
-    
-    return len(inactive_sessions)
+    """Remove inactive user sessions (older than SESSION_TTL_SECONDS)"""
+    return get_session_store().reap()
 
 
 @app.route('/')
@@ -135,14 +217,31 @@ def index():
 
 @app.route('/health')
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness) kèm trạng thái readiness và thời gian khởi động"""
     return jsonify({
         "status": "healthy",
         "service": "AI Recruitment Agent",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "readiness": readiness.snapshot()
     })
 
 
+@app.route('/health/ready')
+def readiness_check():
+    """Readiness endpoint: 503 cho tới khi các model bắt buộc đã được load"""
+    snapshot = readiness.snapshot()
+    return jsonify({
+        "status": "ready" if snapshot["ready"] else "starting",
+        **snapshot
+    }), 200 if snapshot["ready"] else 503
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Metrics của process theo Prometheus text format (latency từng bước pipeline, LLM, embedding, DB)"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Chat endpoint for recruitment conversations using ChatbotOllama"""
@@ -165,6 +264,9 @@ def chat():
             }), 503
         
         try:
+            # Từ chối ngay nếu hàng đợi LLM đã đầy hoặc circuit breaker của Ollama đang mở
+            bot.client.check_admission()
+
             # Generate response using chatbot
             response = bot.chat(user_message)
             
@@ -172,16 +274,19 @@ def chat():
             if "<think>" in response:
                 response = response.split("</think>")[-1].strip()
             
-            # Cleanup inactive sessions periodically
-            if len(user_chatbots) > 10:  # Only cleanup when we have many sessions
-                cleanup_inactive_sessions()
+            # Cập nhật bytes lịch sử của session (áp giới hạn bộ nhớ)
+            get_session_store().record_usage(session_id)
             
             return jsonify({
                 "response": response,
                 "session_id": session_id,
+                "prompt_tokens": bot.last_prompt_tokens,
                 "status": "success"
             })
             
+        except AdmissionRejected as overloaded:
+            logger.warning(f"Chat rejected by admission control: {overloaded}")
+            return overloaded_response(overloaded)
         except Exception as llm_error:
             logger.error(f"Chatbot error: {llm_error}")
             
@@ -207,6 +312,93 @@ def chat():
         }), 500
 
 
+def overloaded_body(error: AdmissionRejected) -> dict:
+    """Body trả về khi admission control / circuit breaker từ chối request (dùng chung cho JSON, SSE và ASGI app)"""
+    if error.reason == "circuit_open":
+        message = "Dịch vụ LLM tạm thời không khả dụng, vui lòng thử lại sau."
+    else:
+        message = "Hệ thống đang quá tải, vui lòng thử lại sau."
+    return {
+        "error": message,
+        "status": "overloaded",
+        "reason": error.reason,
+        "retry_after": error.retry_after
+    }
+
+
+def overloaded_response(error: AdmissionRejected):
+    """429 (hàng đợi đầy) / 503 (chờ quá lâu, circuit breaker đang mở) kèm header Retry-After"""
+    response = jsonify(overloaded_body(error))
+    response.status_code = error.status_code
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Format một Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming chat endpoint (Server-Sent Events) - gửi từng token ngay khi Ollama sinh ra"""
+    data = request.get_json(silent=True)
+
+    if not data or 'message' not in data:
+        return jsonify({"error": "Message is required"}), 400
+
+    user_message = data['message']
+
+    # Get user's session and chatbot
+    session_id = get_session_id()
+    bot = get_user_chatbot(session_id)
+
+    if bot is None:
+        return jsonify({
+            "error": "Chatbot service is not available. Please ensure Ollama is running.",
+            "status": "service_unavailable"
+        }), 503
+
+    # Từ chối ngay (trước khi mở stream) nếu hàng đợi LLM đã đầy hoặc circuit breaker đang mở
+    try:
+        bot.client.check_admission()
+    except AdmissionRejected as overloaded:
+        return overloaded_response(overloaded)
+
+    def generate():
+        try:
+            for chunk in bot.chat_stream(user_message):
+                yield format_sse("token", {"delta": chunk})
+
+            yield format_sse("done", {
+                "session_id": session_id,
+                "intent": bot.last_intent,
+                "prompt_tokens": bot.last_prompt_tokens,
+                "status": "success"
+            })
+
+        except AdmissionRejected as overloaded:
+            yield format_sse("error", overloaded_body(overloaded))
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield format_sse("error", {
+                "error": str(e),
+                "status": "error"
+            })
+
+        # Cập nhật bytes lịch sử của session (áp giới hạn bộ nhớ)
+        get_session_store().record_usage(session_id)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Tắt buffering của nginx để token tới client ngay
+        }
+    )
+
+
 @app.route('/api/chat/history', methods=['GET'])
 def get_chat_history():
     """Get conversation history for current user session"""
@@ -256,6 +448,7 @@ def clear_chat_history():
             "Hãy giúp đỡ ứng viên về việc làm, phỏng vấn và tư vấn nghề nghiệp. "
             "Trả lời ngắn gọn và hữu ích."
         )
+        get_session_store().record_usage(session_id)
         
         return jsonify({
             "message": "Conversation history cleared",
@@ -279,18 +472,20 @@ def get_sessions_info():
         cleaned_up = cleanup_inactive_sessions()
         
         sessions_info = []
-        for session_id, data in user_chatbots.items():
-            history_length = len(data['chatbot'].get_history())
+        for session_id, data in get_session_store().items():
+            history_length = len(data.chatbot.get_history())
             sessions_info.append({
                 "session_id": session_id[:8] + "...",  # Truncate for privacy
-                "created_at": data['created_at'].isoformat(),
-                "last_activity": data['last_activity'].isoformat(),
-                "history_length": history_length
+                "created_at": data.created_at.isoformat(),
+                "last_activity": data.last_activity.isoformat(),
+                "history_length": history_length,
+                "history_bytes": data.history_bytes
             })
         
         return jsonify({
-            "active_sessions": len(user_chatbots),
+            "active_sessions": len(get_session_store()),
             "cleaned_up_sessions": cleaned_up,
+            "session_store": get_session_store().get_stats(),
             "sessions": sessions_info,
             "status": "success"
         })
@@ -309,15 +504,16 @@ def get_current_session_info():
     try:
         session_id = get_session_id()
         
-        if session_id in user_chatbots:
-            data = user_chatbots[session_id]
-            history_length = len(data['chatbot'].get_history())
+        data = get_session_store().get(session_id)
+        if data is not None:
+            history_length = len(data.chatbot.get_history())
             
             return jsonify({
                 "session_id": session_id,
-                "created_at": data['created_at'].isoformat(),
-                "last_activity": data['last_activity'].isoformat(),
+                "created_at": data.created_at.isoformat(),
+                "last_activity": data.last_activity.isoformat(),
                 "history_length": history_length,
+                "history_bytes": data.history_bytes,
                 "status": "active"
             })
         else:
@@ -340,7 +536,7 @@ def list_models():
     """List available models"""
     try:
         import requests
-        ollama_url = llm_client.base_url
+        ollama_url = get_llm_client().base_url
         
         # Check if Ollama is accessible
         response = requests.get(f"{ollama_url}/api/version", timeout=5)
@@ -360,8 +556,8 @@ def list_models():
             available_models = ["Unable to fetch models"]
         
         return jsonify({
-            "current_model": llm_client.model_name,
-            "base_url": llm_client.base_url,
+            "current_model": get_llm_client().model_name,
+            "base_url": get_llm_client().base_url,
             "status": "available",
             "available_models": available_models,
             "ollama_version": response.json()
@@ -371,8 +567,8 @@ def list_models():
         return jsonify({
             "error": f"Failed to check Ollama service: {str(e)}",
             "status": "service_check_failed",
-            "current_model": getattr(llm_client, 'model_name', 'unknown'),
-            "base_url": getattr(llm_client, 'base_url', 'unknown')
+            "current_model": getattr(get_llm_client(), 'model_name', 'unknown'),
+            "base_url": getattr(get_llm_client(), 'base_url', 'unknown')
         }), 503
 
 
@@ -381,7 +577,7 @@ def ollama_health():
     """Check Ollama service health"""
     try:
         import requests
-        ollama_url = llm_client.base_url
+        ollama_url = get_llm_client().base_url
         
         # Test basic connectivity
         start_time = time.time()
@@ -399,7 +595,7 @@ def ollama_health():
         # Test model availability
         try:
             test_prompt = [{"role": "user", "content": "Hello"}]
-            llm_response = llm_client.generate_content(test_prompt)
+            llm_response = get_llm_client().generate_content(test_prompt)
             model_test_success = True
             model_error = None
         except Exception as e:
@@ -410,7 +606,7 @@ def ollama_health():
             "status": "healthy" if model_test_success else "degraded",
             "ollama_version": response.json(),
             "url": ollama_url,
-            "model": llm_client.model_name,
+            "model": get_llm_client().model_name,
             "response_time_seconds": response_time,
             "model_test_success": model_test_success,
             "model_error": model_error,
@@ -421,7 +617,7 @@ def ollama_health():
         return jsonify({
             "status": "unhealthy",
             "error": str(e),
-            "url": getattr(llm_client, 'base_url', 'unknown'),
+            "url": getattr(get_llm_client(), 'base_url', 'unknown'),
             "timestamp": time.time()
         }), 503
 
@@ -432,18 +628,26 @@ def cache_status():
     try:
         from llms.ollama_llms import OllamaLLMs
         from llms.llm_manager import llm_manager
+        from tool.response_cache import get_response_cache
+        from llms.call_cache import get_llm_call_cache
         
         cache_info = OllamaLLMs.get_cache_info()
+        llm_call_cache = get_llm_call_cache()
         manager_info = {
             "instance_count": llm_manager.get_instance_count(),
-            "instances": llm_manager.list_instances()
+            "instances": llm_manager.list_instances(),
+            "embedding_cache": llm_manager.get_embedding_cache_stats(),
+            "model_registry": llm_manager.get_registry_stats()
         }
         
         return jsonify({
             "status": "success",
             "ollama_cache": cache_info,
+            "response_cache": get_response_cache().get_stats(),
+            "llm_call_cache": llm_call_cache.get_stats() if llm_call_cache else {"enabled": False},
             "manager_cache": manager_info,
-            "active_sessions": len(user_chatbots),
+            "active_sessions": len(get_session_store()),
+            "session_store": get_session_store().get_stats(),
             "timestamp": time.time()
         })
         
@@ -455,6 +659,77 @@ def cache_status():
         }), 500
 
 
+@app.route('/api/llm/queue', methods=['GET'])
+def llm_queue_stats():
+    """
+    Admission control của từng Ollama backend (in-flight, queue depth, histogram thời gian chờ, số lần từ chối)
+    và số lời gọi được gộp bởi singleflight (thời gian generation tiết kiệm được),
+    HTTP transport (connection pool, retry, trạng thái circuit breaker), các generation profile,
+    model của từng bước pipeline đang áp dụng và cache kết quả tool calling
+    """
+    from llms.llm_manager import llm_manager
+    singleflight = get_singleflight()
+    return jsonify({
+        "status": "success",
+        "backends": get_admission_stats(),
+        "transports": get_transport_stats(),
+        "singleflight": singleflight.get_stats() if singleflight else {"enabled": False},
+        "profiles": get_generation_profiles().get_profiles(),
+        "task_models": llm_manager.get_task_models(),
+        "tools": get_tool_executor().get_stats(),
+        "timestamp": time.time()
+    })
+
+
+@app.route('/api/llm/residency', methods=['GET'])
+def llm_residency_stats():
+    """
+    Model nào đang nằm trong memory của từng Ollama backend (theo /api/ps), số lần warm-up / warm-up lại
+    sau khi bị unload và lần kiểm tra gần nhất của residency manager
+    """
+    from llms.residency import peek_residency_manager
+    manager = peek_residency_manager()
+    return jsonify({
+        "status": "success",
+        "residency": manager.get_stats() if manager is not None else {"enabled": False},
+        "timestamp": time.time()
+    })
+
+
+@app.route('/api/llm/backends', methods=['GET'])
+def llm_backend_stats():
+    """
+    Backend pool của từng model (khi OLLAMA_BACKENDS được cấu hình): load, latency EWMA, lỗi,
+    trạng thái ejection / health check và các quyết định định tuyến gần nhất
+    """
+    from llms.llm_manager import llm_manager
+    return jsonify({
+        "status": "success",
+        "pools": llm_manager.get_backend_stats(),
+        "timestamp": time.time()
+    })
+
+
+@app.route('/api/intent/stats', methods=['GET'])
+def intent_stats():
+    """Thống kê cascading intent classifier: số lần router/LLM trả lời và latency từng tầng"""
+    try:
+        from tool.intent_classifier import get_intent_classifier
+
+        return jsonify({
+            "status": "success",
+            "intent_classifier": get_intent_classifier().get_stats(),
+            "timestamp": time.time()
+        })
+
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e),
+            "timestamp": time.time()
+        }), 500
+
+
 @app.route('/api/cache/clear', methods=['POST'])
 def clear_cache():
     """Clear all LLM caches"""
@@ -467,11 +742,22 @@ def clear_cache():
         
         # Clear manager cache  
         llm_manager.clear_cache()
+
+        # Clear cached chat responses
+        from tool.response_cache import get_response_cache
+        get_response_cache().clear()
+
+        # Invalidate memoized deterministic LLM calls (vd: sau khi sửa prompt template)
+        from llms.call_cache import get_llm_call_cache
+        from prompt.promt_config import PromptConfig
+        llm_call_cache = get_llm_call_cache()
+        if llm_call_cache is not None:
+            llm_call_cache.invalidate(PromptConfig.templates_version())
         
         # Optional: Clear user chatbots
         clear_sessions = request.json.get('clear_sessions', False) if request.json else False
         if clear_sessions:
-            user_chatbots.clear()
+            get_session_store().clear()
             logger.info("🧹 Cleared user chatbot sessions")
         
         return jsonify({
@@ -492,7 +778,9 @@ def clear_cache():
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('DEBUG', 'False').lower() == 'true'
-    
+
+    ensure_background_warmup()
+
     app.run(
         host='0.0.0.0',
         port=port,
@@ -0,0 +1,270 @@
+"""
+Session store có giới hạn cho các phiên chat: LRU + TTL, giới hạn số session và tổng bytes lịch sử
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def history_bytes(history: List[Dict[str, Any]]) -> int:
+    """Kích thước (UTF-8) nội dung lịch sử hội thoại"""
+    return sum(len(str(message.get("content", "")).encode("utf-8")) for message in history)
+
+
+class SessionEntry:
+    __slots__ = ("chatbot", "created_at", "last_activity", "last_seen", "history_bytes")
+
+    def __init__(self, chatbot: Any):
+        self.chatbot = chatbot
+        self.created_at = datetime.now()
+        self.last_activity = self.created_at
+        self.last_seen = time.monotonic()
+        self.history_bytes = 0
+
+
+class SessionStore:
+    """
+    Lưu chatbot của từng session với các giới hạn cứng:
+    - max_sessions: vượt thì evict session ít dùng nhất (LRU)
+    - max_history_bytes: tổng bytes lịch sử của mọi session; vượt thì evict LRU,
+      nếu chỉ còn session hiện tại thì cắt bớt các tin nhắn cũ nhất của nó
+    - ttl_seconds: session không hoạt động quá TTL bị xóa bởi reaper thread chạy nền
+      (không còn quét O(n) trong request của user)
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Any],
+        max_sessions: int = 1000,
+        max_history_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 3600,
+        reap_interval_seconds: float = 60,
+        on_evict: Optional[Callable[[str, Any], None]] = None
+    ):
+        """
+        Args:
+            factory: hàm tạo chatbot cho một session_id
+            on_evict: gọi khi session bị bỏ khỏi store (vd: giải phóng dữ liệu trong conversation backend)
+        """
+        self.factory = factory
+        self.on_evict = on_evict
+        self.max_sessions = max_sessions
+        self.max_history_bytes = max_history_bytes
+        self.ttl_seconds = ttl_seconds
+        self.reap_interval_seconds = reap_interval_seconds
+
+        self._sessions: "OrderedDict[str, SessionEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._create_locks: Dict[str, threading.Lock] = {}
+        self._reaper = None
+        self._stop_event = threading.Event()
+        self._evictions = {"ttl": 0, "capacity": 0, "bytes": 0, "trimmed_messages": 0}
+
+    # ------------------------------------------------------------------ access
+
+    def get_or_create(self, session_id: str) -> Any:
+        """Lấy chatbot của session (tạo mới nếu chưa có) và đánh dấu vừa hoạt động"""
+        self.start_reaper()
+
+        entry = self._touch(session_id)
+        if entry is not None:
+            return entry.chatbot
+
+        with self._lock:
+            create_lock = self._create_locks.setdefault(session_id, threading.Lock())
+
+        with create_lock:
+            entry = self._touch(session_id)
+            if entry is None:
+                # Tạo chatbot ngoài lock chung để không chặn các session khác
+                entry = SessionEntry(self.factory(session_id))
+                with self._lock:
+                    self._sessions[session_id] = entry
+                    self._evict_over_capacity(keep=session_id)
+                logger.info(f"Created new chatbot for session: {session_id}")
+
+        with self._lock:
+            self._create_locks.pop(session_id, None)
+        return entry.chatbot
+
+    def get(self, session_id: str) -> Optional[SessionEntry]:
+        """Xem session (không tạo mới, không đổi thứ tự LRU)"""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def _touch(self, session_id: str) -> Optional[SessionEntry]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions.move_to_end(session_id)
+                entry.last_activity = datetime.now()
+                entry.last_seen = time.monotonic()
+            return entry
+
+    def record_usage(self, session_id: str):
+        """
+        Cập nhật kích thước lịch sử của session sau mỗi lượt chat,
+        rồi áp giới hạn tổng bytes
+
+        Kích thước được lấy ngoài lock chung (chatbot cộng dồn theo từng tin nhắn, xem history_size),
+        lock chỉ giữ khi cập nhật tổng bytes và evict.
+        """
+        entry = self.get(session_id)
+        if entry is None:
+            return
+        size = self._history_size(entry.chatbot)
+        with self._lock:
+            if self._sessions.get(session_id) is not entry:
+                return
+            self._total_bytes += size - entry.history_bytes
+            entry.history_bytes = size
+            self._evict_over_bytes(keep=session_id)
+
+    @staticmethod
+    def _history_size(chatbot: Any) -> int:
+        if hasattr(chatbot, "history_size"):
+            return chatbot.history_size()
+        return history_bytes(chatbot.get_history())
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is None:
+                return False
+            self._total_bytes -= entry.history_bytes
+            self._release(session_id, entry)
+            return True
+
+    def clear(self):
+        with self._lock:
+            for session_id, entry in self._sessions.items():
+                self._release(session_id, entry)
+            self._sessions.clear()
+            self._total_bytes = 0
+
+    def items(self) -> List[Tuple[str, SessionEntry]]:
+        """Snapshot các session (để liệt kê mà không giữ lock)"""
+        with self._lock:
+            return list(self._sessions.items())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._sessions
+
+    # ---------------------------------------------------------------- eviction
+
+    def _release(self, session_id: str, entry: SessionEntry):
+        if self.on_evict is None:
+            return
+        try:
+            self.on_evict(session_id, entry.chatbot)
+        except Exception as e:
+            logger.error(f"Session eviction callback failed for {session_id}: {e}")
+
+    def _pop_oldest(self, keep: str, reason: str) -> bool:
+        for session_id, entry in self._sessions.items():
+            if session_id == keep:
+                continue
+            del self._sessions[session_id]
+            self._total_bytes -= entry.history_bytes
+            self._evictions[reason] += 1
+            self._release(session_id, entry)
+            logger.info(f"Evicted session ({reason}): {session_id}")
+            return True
+        return False
+
+    def _evict_over_capacity(self, keep: str):
+        while len(self._sessions) > self.max_sessions and self._pop_oldest(keep, "capacity"):
+            pass
+
+    def _evict_over_bytes(self, keep: str):
+        if not self.max_history_bytes:
+            return
+        while self._total_bytes > self.max_history_bytes and self._pop_oldest(keep, "bytes"):
+            pass
+        if self._total_bytes > self.max_history_bytes:
+            self._trim_history(keep)
+
+    def _trim_history(self, session_id: str):
+        """Chỉ còn session hiện tại mà vẫn vượt giới hạn: bỏ các tin nhắn cũ nhất (giữ system message)"""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return
+        while self._total_bytes > self.max_history_bytes:
+            removed = entry.chatbot.drop_oldest_message()
+            if removed is None:
+                break
+            size = len(str(removed.get("content", "")).encode("utf-8"))
+            entry.history_bytes -= size
+            self._total_bytes -= size
+            self._evictions["trimmed_messages"] += 1
+
+    def reap(self) -> int:
+        """Xóa các session không hoạt động quá TTL, trả về số session đã xóa"""
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            # OrderedDict theo thứ tự LRU → session cũ nhất nằm đầu, dừng ở session còn hạn đầu tiên
+            for session_id in list(self._sessions.keys()):
+                entry = self._sessions[session_id]
+                if now - entry.last_seen <= self.ttl_seconds:
+                    break
+                del self._sessions[session_id]
+                self._total_bytes -= entry.history_bytes
+                self._release(session_id, entry)
+                removed += 1
+            self._evictions["ttl"] += removed
+        if removed:
+            logger.info(f"Reaped {removed} inactive sessions")
+        return removed
+
+    # ------------------------------------------------------------------ reaper
+
+    def start_reaper(self):
+        """Khởi động reaper thread (một lần, lazy ở request đầu tiên)"""
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._stop_event.clear()
+            self._reaper = threading.Thread(target=self._reap_loop, name="session-reaper", daemon=True)
+            self._reaper.start()
+
+    def stop_reaper(self):
+        self._stop_event.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+
+    def _reap_loop(self):
+        while not self._stop_event.wait(self.reap_interval_seconds):
+            try:
+                self.reap()
+            except Exception as e:
+                logger.error(f"Session reaper error: {e}")
+
+    # ------------------------------------------------------------------ gauges
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Gauges: số session đang sống, bytes lịch sử đang giữ, số lần evict"""
+        with self._lock:
+            return {
+                "live_sessions": len(self._sessions),
+                "history_bytes": self._total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_history_bytes": self.max_history_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": dict(self._evictions),
+                "reaper_running": self._reaper is not None and self._reaper.is_alive(),
+            }
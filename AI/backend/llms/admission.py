@@ -0,0 +1,274 @@
+"""
+Admission control cho các lời gọi LLM: giới hạn concurrency theo backend + hàng đợi có giới hạn
+"""
+import asyncio
+import bisect
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+# Priority của request hiện tại (số nhỏ = ưu tiên cao). Chat của user dùng mặc định,
+# các job nền (indexing, warm-up) nên chạy trong admission_priority(PRIORITY_BACKGROUND)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+_current_priority = contextvars.ContextVar("llm_admission_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def admission_priority(priority: int):
+    """Đặt priority cho các lời gọi LLM trong block này"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """
+    LLM backend đang quá tải, request bị từ chối ngay thay vì xếp hàng vô hạn
+
+    Attributes:
+        reason: "queue_full" (→ HTTP 429) hoặc "timeout" (→ HTTP 503)
+        retry_after: số giây gợi ý client thử lại (header Retry-After)
+    """
+
+    def __init__(self, reason: str, retry_after: int, backend: str = ""):
+        self.reason = reason
+        self.retry_after = retry_after
+        self.backend = backend
+        super().__init__(f"LLM backend {backend} overloaded ({reason}), retry after {retry_after}s")
+
+    @property
+    def status_code(self) -> int:
+        return 429 if self.reason == "queue_full" else 503
+
+
+class _Waiter:
+    """Request đang chờ slot: thread chờ trên event, coroutine chờ trên future của event loop"""
+    __slots__ = ("event", "loop", "future", "granted", "enqueued_at")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.event = threading.Event()
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+        self.enqueued_at = time.perf_counter()
+
+    def grant(self):
+        self.granted = True
+        if self.future is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+class AdmissionController:
+    """
+    Semaphore có hàng đợi ưu tiên (FIFO trong cùng priority):
+    - tối đa max_concurrency request chạy cùng lúc trên backend
+    - tối đa max_queue request chờ; hàng đợi đầy → AdmissionRejected("queue_full")
+    - chờ quá max_wait_seconds → AdmissionRejected("timeout")
+
+    Thống kê: queue depth, in-flight, histogram thời gian chờ, số lần bị từ chối.
+    """
+
+    WAIT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, name: str, max_concurrency: int = 4, max_queue: int = 32, max_wait_seconds: float = 30.0):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_seconds = max_wait_seconds
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queue = []  # heap (priority, sequence, waiter)
+        self._sequence = itertools.count()
+
+        self._wait_histogram = [0] * (len(self.WAIT_BUCKETS_MS) + 1)
+        self._wait_sum_seconds = 0.0
+        self._admitted = 0
+        self._rejected = {"queue_full": 0, "timeout": 0}
+        self._service_seconds_ewma = 1.0
+
+    # ----------------------------------------------------------- acquire/release
+
+    def _retry_after(self) -> int:
+        """Ước lượng thời gian tới khi có slot trống: (queue / concurrency + 1) * thời gian xử lý trung bình"""
+        waves = len(self._queue) / self.max_concurrency + 1
+        return max(1, int(round(waves * self._service_seconds_ewma)))
+
+    def check(self):
+        """Từ chối ngay nếu hàng đợi đã đầy (dùng trước khi mở stream response)"""
+        with self._lock:
+            if self._in_flight >= self.max_concurrency and len(self._queue) >= self.max_queue:
+                self._rejected["queue_full"] += 1
+                raise AdmissionRejected("queue_full", self._retry_after(), self.name)
+
+    def _enqueue(self, priority: Optional[int], loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Waiter]:
+        """Lấy slot ngay (trả về None) hoặc xếp vào hàng đợi (trả về waiter)"""
+        if priority is None:
+            priority = _current_priority.get()
+
+        with self._lock:
+            if self._in_flight < self.max_concurrency and not self._queue:
+                self._in_flight += 1
+                self._record_wait(0.0)
+                return None
+
+            if len(self._queue) >= self.max_queue:
+                self._rejected["queue_full"] += 1
+                raise AdmissionRejected("queue_full", self._retry_after(), self.name)
+
+            waiter = _Waiter(loop)
+            heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+            return waiter
+
+    def _finish_wait(self, waiter: _Waiter):
+        with self._lock:
+            if waiter.granted:
+                self._record_wait(time.perf_counter() - waiter.enqueued_at)
+                return
+            # Hết thời gian chờ: rút khỏi hàng đợi
+            self._withdraw(waiter)
+            self._rejected["timeout"] += 1
+            raise AdmissionRejected("timeout", self._retry_after(), self.name)
+
+    def _withdraw(self, waiter: _Waiter):
+        self._queue = [item for item in self._queue if item[2] is not waiter]
+        heapq.heapify(self._queue)
+
+    def acquire(self, priority: Optional[int] = None):
+        waiter = self._enqueue(priority)
+        if waiter is None:
+            return
+        waiter.event.wait(self.max_wait_seconds)
+        self._finish_wait(waiter)
+
+    async def acquire_async(self, priority: Optional[int] = None):
+        """Giống acquire() nhưng chờ slot trên event loop (không chiếm thread)"""
+        waiter = self._enqueue(priority, asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Request bị hủy khi đang chờ: trả lại slot nếu vừa được cấp, không thì rút khỏi hàng đợi
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._withdraw(waiter)
+            if granted:
+                self.release()
+            raise
+        self._finish_wait(waiter)
+
+    def release(self, service_seconds: Optional[float] = None):
+        with self._lock:
+            if service_seconds is not None:
+                self._service_seconds_ewma = 0.8 * self._service_seconds_ewma + 0.2 * service_seconds
+            if self._queue:
+                # Chuyển slot trực tiếp cho request ưu tiên nhất đang chờ (in-flight giữ nguyên)
+                _, _, waiter = heapq.heappop(self._queue)
+                waiter.grant()
+            else:
+                self._in_flight -= 1
+
+    @contextmanager
+    def slot(self, priority: Optional[int] = None):
+        """
+        Ví dụ:
+            with controller.slot():
+                requests.post(...)
+        """
+        self.acquire(priority)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start_time)
+
+    @asynccontextmanager
+    async def slot_async(self, priority: Optional[int] = None):
+        """
+        Ví dụ:
+            async with controller.slot_async():
+                await http.post(...)
+        """
+        await self.acquire_async(priority)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start_time)
+
+    # ------------------------------------------------------------------- stats
+
+    def load(self) -> int:
+        """Số request đang chạy + đang chờ (dùng để cân bằng tải giữa các backend)"""
+        with self._lock:
+            return self._in_flight + len(self._queue)
+
+    def _record_wait(self, seconds: float):
+        self._admitted += 1
+        self._wait_sum_seconds += seconds
+        self._wait_histogram[bisect.bisect_left(self.WAIT_BUCKETS_MS, seconds * 1000)] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(list(self.WAIT_BUCKETS_MS) + ["+Inf"], self._wait_histogram):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                "backend": self.name,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "max_wait_seconds": self.max_wait_seconds,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._queue),
+                "admitted": self._admitted,
+                "rejected": dict(self._rejected),
+                "wait_seconds_sum": round(self._wait_sum_seconds, 4),
+                "wait_ms_buckets": buckets,
+                "avg_service_seconds": round(self._service_seconds_ewma, 3),
+            }
+
+
+_controllers: Dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_admission_controller(backend: str) -> AdmissionController:
+    """Admission controller dùng chung cho một backend (base_url)"""
+    if backend not in _controllers:
+        with _controllers_lock:
+            if backend not in _controllers:
+                from setting import get_settings
+
+                settings = get_settings()
+                _controllers[backend] = AdmissionController(
+                    backend,
+                    max_concurrency=settings.LLM_BACKEND_MAX_CONCURRENCY.get(backend, settings.LLM_MAX_CONCURRENCY),
+                    max_queue=settings.LLM_QUEUE_SIZE,
+                    max_wait_seconds=settings.LLM_QUEUE_MAX_WAIT_SECONDS
+                )
+    return _controllers[backend]
+
+
+def get_admission_stats() -> Dict[str, Any]:
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return {controller.name: controller.get_stats() for controller in controllers}
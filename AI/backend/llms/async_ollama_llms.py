@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+"""
+Ollama client bất đồng bộ (httpx.AsyncClient): cùng interface với OllamaLLMs nhưng các method là coroutine,
+một event loop giữ được hàng trăm lời gọi đang chờ Ollama mà không chiếm thread nào
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+import httpx
+
+from .admission import AdmissionRejected
+from .backend_pool import OllamaBackendPool
+from .call_cache import LLMCallCache
+from .ollama_llms import OllamaLLMs
+from metrics import current_prompt, LLM_QUEUE_WAIT_SECONDS
+
+
+class AsyncOllamaLLMs:
+    """
+    Async counterpart của OllamaLLMs
+
+    - generate_content / generate_chat / chat trả về str, generate_chat_stream là async iterator
+    - Dùng chung với OllamaLLMs cùng backend: admission controller, call cache, generation profile, metrics,
+      circuit breaker và cấu hình timeout / retry của transport
+    - Singleflight theo event loop: các coroutine cùng key chờ chung một Future thay vì gọi lại Ollama
+
+    Ví dụ:
+        llm = AsyncOllamaLLMs(base_url="http://localhost:11434", model_name="qwen3")
+        answer = await llm.generate_chat(messages, profile="answer")
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434", model_name: str = "llama2", timeout: Optional[float] = None):
+        # Client đồng bộ cùng backend: giữ state dùng chung (admission, cache, profile) và các helper
+        self.sync_client = OllamaLLMs(base_url=base_url, model_name=model_name)
+        self.base_url = self.sync_client.base_url
+        self.model_name = model_name
+        # Read timeout mặc định giống client đồng bộ (OLLAMA_TIMEOUT của transport); profile có timeout riêng thì ghi đè
+        self.timeout = timeout if timeout is not None else self.transport.read_timeout
+        self._http: Optional[httpx.AsyncClient] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def admission(self):
+        return self.sync_client.admission
+
+    @property
+    def call_cache(self):
+        return self.sync_client.call_cache
+
+    @property
+    def profiles(self):
+        return self.sync_client.profiles
+
+    @property
+    def transport(self):
+        return self.sync_client.transport
+
+    def _client(self) -> httpx.AsyncClient:
+        # Tạo lazy trong event loop đang chạy (AsyncClient gắn với loop tạo ra nó)
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=self.transport.connect_timeout),
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=32)
+            )
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    # ---------------------------------------------------------------- helpers
+
+    @asynccontextmanager
+    async def _admit(self):
+        """Slot của admission controller, chờ trên event loop"""
+        if self.admission is None:
+            yield
+            return
+        wait_start = time.perf_counter()
+        await self.admission.acquire_async()
+        LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - wait_start, model=self.model_name)
+        service_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.admission.release(time.perf_counter() - service_start)
+
+    def check_admission(self):
+        """Raise AdmissionRejected ngay nếu hàng đợi của backend đã đầy"""
+        self.sync_client.check_admission()
+
+    async def _memoize(
+        self,
+        endpoint: str,
+        messages: List[Dict[str, Any]],
+        options: Optional[Dict[str, Any]],
+        extra: Any,
+        call: Callable[[], Awaitable[str]]
+    ) -> str:
+        """Call cache (dùng chung với OllamaLLMs) + gộp các coroutine cùng key đang chạy"""
+        cache = self.call_cache
+        if cache is not None and not LLMCallCache.is_deterministic(options):
+            cache.record_skip(endpoint)
+            cache = None
+
+        key = LLMCallCache.make_key(self.model_name, endpoint, messages, options, extra)
+        if cache is not None:
+            cached = cache.get(key, endpoint)
+            if cached is not None:
+                return cached
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Tránh cảnh báo "exception was never retrieved" khi không có coroutine nào chờ chung
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if cache is not None:
+                cache.put(key, result)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _send(self, path: str, payload: Dict[str, Any], read_timeout: Optional[float], stream: bool = False) -> httpx.Response:
+        """
+        POST với cùng chính sách như OllamaTransport: circuit breaker dùng chung với client đồng bộ,
+        chỉ thử lại (backoff có jitter) khi chưa kết nối được, read timeout theo generation profile
+        """
+        transport = self.transport
+        transport.breaker.before_request()
+        timeout = httpx.Timeout(read_timeout or self.timeout, connect=transport.connect_timeout)
+        attempt = 0
+        while True:
+            try:
+                request = self._client().build_request("POST", path, json=payload, timeout=timeout)
+                resp = await self._client().send(request, stream=stream)
+                break
+            except httpx.TimeoutException as e:
+                if not isinstance(e, httpx.ConnectTimeout):
+                    transport.record_failure("timeout")
+                    raise
+                if attempt >= transport.retries:
+                    transport.record_failure("connection")
+                    raise
+            except httpx.ConnectError:
+                if attempt >= transport.retries:
+                    transport.record_failure("connection")
+                    raise
+            except httpx.HTTPError:
+                transport.record_failure("other")
+                raise
+            transport.record_retry()
+            await asyncio.sleep(transport.backoff(attempt))
+            attempt += 1
+        transport.breaker.record_success()
+        return resp
+
+    async def _post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        endpoint: str,
+        extract: Callable[[Dict[str, Any]], str],
+        read_timeout: Optional[float] = None
+    ) -> str:
+        started_at = time.perf_counter()
+        try:
+            async with self._admit():
+                resp = await self._send(path, payload, read_timeout)
+        except AdmissionRejected:
+            raise
+        except Exception:
+            self.sync_client._record_call(endpoint, started_at, status="error")
+            raise
+
+        if resp.status_code != 200:
+            self.sync_client._record_call(endpoint, started_at, status="error")
+            raise ValueError(f"Ollama request failed: {resp.status_code}, {resp.text}")
+
+        data = resp.json()
+        self.sync_client._record_call(endpoint, started_at, data)
+        return extract(data)
+
+    # -------------------------------------------------------------------- API
+
+    async def generate_content(
+        self,
+        prompt: List[Dict[str, str]],
+        format: Optional[Union[str, Dict[str, Any]]] = None,
+        options: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """/api/generate (prompt được gộp thành một chuỗi như OllamaLLMs.generate_content)"""
+        payload = {
+            "model": self.model_name,
+            "prompt": "\n".join([f"{p['role']}: {p['content']}" for p in prompt]),
+            "stream": False,
+        }
+        if format is not None:
+            payload["format"] = format
+        if options:
+            payload["options"] = options
+        return await self._memoize(
+            "generate", prompt, options, format,
+            lambda: self._post("/api/generate", payload, "generate", lambda data: data.get("response", ""))
+        )
+
+    async def generate_chat(
+        self,
+        messages: List[Dict[str, str]],
+        format: Optional[Union[str, Dict[str, Any]]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        profile: Optional[str] = None
+    ) -> str:
+        """/api/chat với messages giữ nguyên cấu trúc (xem OllamaLLMs.generate_chat)"""
+        options, think = self.profiles.resolve(profile, options)
+        payload = self.sync_client.chat_payload(messages, False, format, options, think)
+        read_timeout = self.profiles.timeout(profile)
+        return await self._memoize(
+            "chat", messages, options, {"format": format, "think": think},
+            lambda: self._post(
+                "/api/chat", payload, "chat", lambda data: (data.get("message") or {}).get("content", ""), read_timeout
+            )
+        )
+
+    async def chat(self, messages: List[Dict[str, str]], profile: Optional[str] = None, **options) -> str:
+        """Giống OllamaLLMs.chat: options={"temperature": 0}, format=..., think=..."""
+        return await self.generate_chat(
+            messages,
+            format=options.get("format"),
+            options=options.get("options"),
+            profile=profile
+        )
+
+    async def generate_chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]] = None,
+        profile: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream từng chunk text từ /api/chat"""
+        options, think = self.profiles.resolve(profile, options)
+        payload = self.sync_client.chat_payload(messages, True, options=options, think=think)
+
+        started_at = time.perf_counter()
+        prompt_name = current_prompt()
+        final_data, status = None, "error"
+        try:
+            async with self._admit():
+                resp = await self._send("/api/chat", payload, self.profiles.timeout(profile), stream=True)
+                try:
+                    if resp.status_code != 200:
+                        body = (await resp.aread()).decode("utf-8", errors="replace")
+                        raise ValueError(f"Ollama request failed: {resp.status_code}, {body}")
+
+                    async for line in resp.aiter_lines():
+                        if not line:
+                            continue
+                        data = json.loads(line)
+                        if data.get("error"):
+                            raise ValueError(f"Ollama stream failed: {data['error']}")
+                        chunk = (data.get("message") or {}).get("content", "")
+                        if chunk:
+                            yield chunk
+                        if data.get("done"):
+                            final_data = data
+                            break
+                    status = "ok"
+                except httpx.ReadTimeout:
+                    self.transport.record_failure("timeout")
+                    raise
+                finally:
+                    await resp.aclose()
+        finally:
+            self.sync_client._record_call("chat_stream", started_at, final_data, status=status, prompt=prompt_name)
+
+
+class AsyncOllamaBackendPool:
+    """
+    Async counterpart của OllamaBackendPool: mỗi lời gọi chọn backend qua pool đồng bộ (dùng chung load,
+    ejection, health check và thống kê định tuyến) rồi chờ AsyncOllamaLLMs của backend đó trên event loop
+
+    Chính sách thử lại giống pool đồng bộ: backend đầy hàng đợi → thử backend khác, lỗi → thử lại một lần
+    trên backend khác, stream chỉ thử lại khi chưa yield chunk nào.
+    """
+
+    def __init__(self, pool: OllamaBackendPool):
+        self.pool = pool
+        self.model_name = pool.model_name
+
+    @property
+    def base_url(self) -> str:
+        return self.pool.base_url
+
+    @property
+    def profiles(self):
+        return self.pool.profiles
+
+    def check_admission(self):
+        self.pool.check_admission()
+
+    async def _call(self, method: str, *args, **kwargs):
+        tried, errors, last_error = set(), 0, None
+        while errors < 2:
+            backend = self.pool._pick(tried)
+            if backend is None:
+                break
+            tried.add(backend.url)
+            started_at = time.perf_counter()
+            try:
+                result = await getattr(get_async_ollama_client(backend.url, self.model_name), method)(*args, **kwargs)
+            except AdmissionRejected as e:
+                self.pool._finish(backend, started_at, e)
+                last_error = e
+                continue
+            except Exception as e:
+                self.pool._finish(backend, started_at, e)
+                last_error = e
+                errors += 1
+                continue
+            self.pool._finish(backend, started_at)
+            return result
+        raise last_error if last_error is not None else RuntimeError("No Ollama backend available")
+
+    async def _call_stream(self, method: str, *args, **kwargs) -> AsyncIterator[str]:
+        tried, errors, last_error = set(), 0, None
+        while errors < 2:
+            backend = self.pool._pick(tried)
+            if backend is None:
+                break
+            tried.add(backend.url)
+            started_at = time.perf_counter()
+            yielded, error = False, None
+            try:
+                async for chunk in getattr(get_async_ollama_client(backend.url, self.model_name), method)(*args, **kwargs):
+                    yielded = True
+                    yield chunk
+                return
+            except Exception as e:
+                error = e
+                if yielded:
+                    raise
+                last_error = e
+                if not isinstance(e, AdmissionRejected):
+                    errors += 1
+            finally:
+                self.pool._finish(backend, started_at, error)
+        raise last_error if last_error is not None else RuntimeError("No Ollama backend available")
+
+    async def generate_content(self, prompt: List[Dict[str, str]], **kwargs) -> str:
+        return await self._call("generate_content", prompt, **kwargs)
+
+    async def generate_chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        return await self._call("generate_chat", messages, **kwargs)
+
+    async def chat(self, messages: List[Dict[str, str]], **options) -> str:
+        return await self._call("chat", messages, **options)
+
+    def generate_chat_stream(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        return self._call_stream("generate_chat_stream", messages, **kwargs)
+
+
+_async_clients: Dict[str, AsyncOllamaLLMs] = {}
+_async_pools: Dict[int, AsyncOllamaBackendPool] = {}
+_async_clients_lock = threading.Lock()
+
+
+def get_async_ollama_client(base_url: str, model_name: str) -> AsyncOllamaLLMs:
+    """AsyncOllamaLLMs dùng chung theo (base_url, model) trong process (chỉ dùng trong event loop của ASGI app)"""
+    key = f"{base_url}#{model_name}"
+    if key not in _async_clients:
+        with _async_clients_lock:
+            if key not in _async_clients:
+                _async_clients[key] = AsyncOllamaLLMs(base_url=base_url, model_name=model_name)
+    return _async_clients[key]
+
+
+def get_async_client(client) -> Union[AsyncOllamaLLMs, AsyncOllamaBackendPool]:
+    """
+    Async counterpart của một client từ llm_manager: OllamaBackendPool → AsyncOllamaBackendPool
+    (chọn backend cho từng request), OllamaLLMs → AsyncOllamaLLMs cùng backend/model
+    """
+    if isinstance(client, OllamaBackendPool):
+        key = id(client)
+        if key not in _async_pools:
+            with _async_clients_lock:
+                if key not in _async_pools:
+                    _async_pools[key] = AsyncOllamaBackendPool(client)
+        return _async_pools[key]
+    return get_async_ollama_client(client.base_url, client.model_name)
+
+
+async def close_async_ollama_clients():
+    """Đóng connection pool của mọi AsyncOllamaLLMs (gọi khi ASGI app shutdown)"""
+    for client in list(_async_clients.values()):
+        await client.aclose()
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Pool nhiều Ollama backend cho cùng một model: least outstanding requests, health check nền,
+tự loại backend lỗi và đưa lại sau một khoảng thời gian
+"""
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .admission import AdmissionRejected
+from .base import BaseLLM
+from .ollama_llms import OllamaLLMs
+from .transport import get_transport
+from metrics import metrics
+
+LLM_BACKEND_REQUESTS = metrics.counter(
+    "llm_backend_requests_total",
+    "Số lời gọi LLM được pool định tuyến tới từng backend theo kết quả (ok, error, rejected)"
+)
+LLM_BACKEND_REQUEST_SECONDS = metrics.histogram(
+    "llm_backend_request_seconds",
+    "Thời gian lời gọi LLM trên từng backend của pool"
+)
+LLM_BACKEND_EJECTIONS = metrics.counter(
+    "llm_backend_ejections_total",
+    "Số lần một backend bị tạm loại khỏi pool (lỗi liên tiếp hoặc health check thất bại)"
+)
+
+
+class _Backend:
+    __slots__ = (
+        "url", "client", "outstanding", "requests", "errors", "rejected", "consecutive_errors",
+        "ejected_until", "healthy", "latency_ewma", "picks", "last_error", "last_health_check"
+    )
+
+    def __init__(self, url: str, client: OllamaLLMs):
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.consecutive_errors = 0
+        self.ejected_until = 0.0
+        self.healthy = True
+        self.latency_ewma = None
+        self.picks = 0
+        self.last_error = None
+        self.last_health_check = None
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+    def load(self) -> float:
+        """Tỉ lệ request đang chạy + đang chờ trên concurrency của backend"""
+        admission = self.client.admission
+        if admission is None:
+            return float(self.outstanding)
+        return max(admission.load(), self.outstanding) / admission.max_concurrency
+
+
+class OllamaBackendPool(BaseLLM):
+    """
+    Client cùng interface với OllamaLLMs, phân phối lời gọi cho nhiều Ollama backend của cùng model
+
+    - Chọn backend available có load thấp nhất (request đang chạy + chờ / concurrency), hòa thì theo
+      latency EWMA (làm tròn 100ms) rồi round-robin
+    - Concurrency của từng backend do admission controller của backend đó giới hạn
+      (LLM_BACKEND_MAX_CONCURRENCY); backend đầy hàng đợi → thử backend kế tiếp
+    - eject_after_errors lỗi liên tiếp hoặc health check thất bại → loại khỏi pool eject_seconds giây;
+      hết thời gian backend nhận traffic trở lại, lỗi tiếp thì bị loại ngay
+    - Lời gọi lỗi được thử lại một lần trên backend khác (stream chỉ thử lại khi chưa yield chunk nào)
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        base_urls: List[str],
+        eject_after_errors: int = 3,
+        eject_seconds: float = 30.0,
+        health_interval: float = 10.0,
+        client_factory: Optional[Callable[[str, str], OllamaLLMs]] = None
+    ):
+        super().__init__(model_name=model_name)
+        if not base_urls:
+            raise ValueError("OllamaBackendPool needs at least one backend")
+        factory = client_factory or (lambda url, model: OllamaLLMs(base_url=url, model_name=model))
+
+        urls = list(dict.fromkeys(url.rstrip("/") for url in base_urls))
+        self.backends = [_Backend(url, factory(url, model_name)) for url in urls]
+        self.eject_after_errors = max(1, eject_after_errors)
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+        self._decisions = deque(maxlen=50)
+        self._stop = threading.Event()
+        self._health_thread = None
+        if health_interval > 0:
+            self._health_thread = threading.Thread(
+                target=self._health_loop,
+                name=f"ollama-health-{model_name}",
+                daemon=True
+            )
+            self._health_thread.start()
+
+    # ---------------------------------------------------------------- routing
+
+    def _pick(self, exclude: set) -> Optional[_Backend]:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [b for b in self.backends if b.url not in exclude and b.available(now)]
+            reason = "least_outstanding"
+            if not candidates:
+                # Mọi backend đều bị loại: vẫn thử backend sắp hết thời gian bị loại nhất thay vì từ chối ngay
+                candidates = sorted(
+                    (b for b in self.backends if b.url not in exclude),
+                    key=lambda b: b.ejected_until
+                )[:1]
+                reason = "all_ejected"
+            if not candidates:
+                return None
+
+            # Xoay danh sách để các backend hòa nhau được chọn lần lượt
+            offset = next(self._round_robin) % len(candidates)
+            candidates = candidates[offset:] + candidates[:offset]
+            loads = {b.url: b.load() for b in candidates}
+            # Latency chỉ phân định khi chênh lệch >= 100ms, còn lại round-robin
+            backend = min(
+                candidates,
+                key=lambda b: (loads[b.url], round(b.latency_ewma, 1) if b.latency_ewma is not None else 0.0)
+            )
+            backend.picks += 1
+            backend.outstanding += 1
+            self._decisions.append({
+                "at": time.time(),
+                "backend": backend.url,
+                "reason": reason,
+                "loads": {url: round(load, 3) for url, load in loads.items()},
+                "retry": bool(exclude),
+            })
+        return backend
+
+    def _finish(self, backend: _Backend, started_at: float, error: Optional[BaseException] = None):
+        elapsed = time.perf_counter() - started_at
+        with self._lock:
+            backend.outstanding -= 1
+            if isinstance(error, AdmissionRejected):
+                backend.rejected += 1
+                status = "rejected"
+            elif error is not None:
+                backend.requests += 1
+                backend.errors += 1
+                backend.consecutive_errors += 1
+                backend.last_error = str(error)
+                status = "error"
+                if backend.consecutive_errors >= self.eject_after_errors:
+                    self._eject(backend, f"{backend.consecutive_errors} consecutive errors")
+            else:
+                backend.requests += 1
+                backend.consecutive_errors = 0
+                backend.latency_ewma = elapsed if backend.latency_ewma is None else 0.8 * backend.latency_ewma + 0.2 * elapsed
+                status = "ok"
+        LLM_BACKEND_REQUESTS.inc(backend=backend.url, status=status)
+        if status != "rejected":
+            LLM_BACKEND_REQUEST_SECONDS.observe(elapsed, backend=backend.url)
+
+    def _eject(self, backend: _Backend, reason: str):
+        backend.ejected_until = time.monotonic() + self.eject_seconds
+        LLM_BACKEND_EJECTIONS.inc(backend=backend.url)
+        print(f"⚠️ Ejecting Ollama backend {backend.url} for {self.eject_seconds:.0f}s: {reason}")
+
+    def _call(self, method: str, *args, **kwargs):
+        tried, errors, last_error = set(), 0, None
+        while errors < 2:
+            backend = self._pick(tried)
+            if backend is None:
+                break
+            tried.add(backend.url)
+            started_at = time.perf_counter()
+            try:
+                result = getattr(backend.client, method)(*args, **kwargs)
+            except AdmissionRejected as e:
+                # Backend đầy hàng đợi: thử backend khác, không tính là lỗi
+                self._finish(backend, started_at, e)
+                last_error = e
+                continue
+            except Exception as e:
+                self._finish(backend, started_at, e)
+                last_error = e
+                errors += 1
+                continue
+            self._finish(backend, started_at)
+            return result
+        raise last_error if last_error is not None else RuntimeError("No Ollama backend available")
+
+    def _call_stream(self, method: str, *args, **kwargs) -> Iterator[str]:
+        tried, errors, last_error = set(), 0, None
+        while errors < 2:
+            backend = self._pick(tried)
+            if backend is None:
+                break
+            tried.add(backend.url)
+            started_at = time.perf_counter()
+            yielded, error = False, None
+            try:
+                for chunk in getattr(backend.client, method)(*args, **kwargs):
+                    yielded = True
+                    yield chunk
+                return
+            except Exception as e:
+                error = e
+                if yielded:
+                    raise
+                last_error = e
+                if not isinstance(e, AdmissionRejected):
+                    errors += 1
+            finally:
+                self._finish(backend, started_at, error)
+        raise last_error if last_error is not None else RuntimeError("No Ollama backend available")
+
+    # ------------------------------------------------------------ health check
+
+    def check_health(self):
+        """Gọi /api/version của từng backend; backend không trả lời bị loại khỏi pool"""
+        for backend in self.backends:
+            try:
+                ok = get_transport(backend.url).probe()
+                error = None if ok else "health check failed"
+            except Exception as e:
+                ok, error = False, str(e)
+            with self._lock:
+                backend.last_health_check = time.time()
+                if ok:
+                    if not backend.healthy:
+                        print(f"✅ Ollama backend {backend.url} is healthy again")
+                    backend.healthy = True
+                else:
+                    if backend.healthy:
+                        self._eject(backend, error or "health check failed")
+                    backend.healthy = False
+                    backend.last_error = error or backend.last_error
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                print(f"⚠️ Ollama health check failed: {e}")
+
+    def close(self):
+        self._stop.set()
+
+    # --------------------------------------------------------------- LLM API
+
+    @property
+    def base_url(self) -> str:
+        """Backend đang ít tải nhất (cho các client khác cần một URL cụ thể, vd: AsyncOllamaLLMs)"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [b for b in self.backends if b.available(now)] or self.backends
+            return min(candidates, key=lambda b: b.load()).url
+
+    @property
+    def profiles(self):
+        return self.backends[0].client.profiles
+
+    def generate_content(self, prompt: List[Dict[str, str]], **kwargs) -> str:
+        return self._call("generate_content", prompt, **kwargs)
+
+    def generate_content_stream(self, prompt: List[Dict[str, str]]) -> Iterator[str]:
+        return self._call_stream("generate_content_stream", prompt)
+
+    def generate_chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        return self._call("generate_chat", messages, **kwargs)
+
+    def generate_chat_stream(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        return self._call_stream("generate_chat_stream", messages, **kwargs)
+
+    def chat(self, messages: List[Dict[str, str]], **options) -> str:
+        return self._call("chat", messages, **options)
+
+    def chat_with_tools(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        return self._call("chat_with_tools", messages, **kwargs)
+
+    def chat_payload(self, *args, **kwargs) -> Dict[str, Any]:
+        return self.backends[0].client.chat_payload(*args, **kwargs)
+
+    def check_admission(self):
+        """Chỉ từ chối khi hàng đợi của mọi backend available đều đầy"""
+        now = time.monotonic()
+        last_error = None
+        for backend in [b for b in self.backends if b.available(now)] or self.backends:
+            try:
+                backend.client.check_admission()
+                return
+            except AdmissionRejected as e:
+                last_error = e
+        if last_error is not None:
+            raise last_error
+
+    def warm_up(self, force: bool = False, keep_alive: Optional[int] = None) -> bool:
+        return any([backend.client.warm_up(force=force, keep_alive=keep_alive) for backend in self.backends])
+
+    def keep_alive(self, duration: int = 300) -> bool:
+        return any([backend.client.keep_alive(duration) for backend in self.backends])
+
+    def is_warmed_up(self) -> bool:
+        return any(backend.client.is_warmed_up() for backend in self.backends)
+
+    def list_available_tools(self) -> List[str]:
+        return self.backends[0].client.list_available_tools()
+
+    # ------------------------------------------------------------------- stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            backends = {}
+            for b in self.backends:
+                admission = b.client.admission
+                backends[b.url] = {
+                    "available": b.available(now),
+                    "healthy": b.healthy,
+                    "ejected_for_seconds": round(max(0.0, b.ejected_until - now), 1),
+                    "outstanding": b.outstanding,
+                    "load": round(b.load(), 3),
+                    "max_concurrency": admission.max_concurrency if admission is not None else None,
+                    "picks": b.picks,
+                    "requests": b.requests,
+                    "errors": b.errors,
+                    "rejected": b.rejected,
+                    "consecutive_errors": b.consecutive_errors,
+                    "latency_ewma_ms": round(b.latency_ewma * 1000, 1) if b.latency_ewma is not None else None,
+                    "last_error": b.last_error,
+                    "last_health_check": b.last_health_check,
+                }
+            return {
+                "model": self.model_name,
+                "backends": backends,
+                "recent_decisions": list(self._decisions)[-20:],
+            }
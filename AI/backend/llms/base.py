@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import Any, Dict, List, Optional
 
 
 class BaseLLM(ABC):
@@ -20,3 +20,16 @@ class BaseLLM(ABC):
         return: output text
         """
         pass
+
+    def generate_chat(
+        self,
+        messages: List[Dict[str, str]],
+        format: Optional[Any] = None,
+        options: Optional[Dict[str, Any]] = None,
+        profile: Optional[str] = None
+    ) -> str:
+        """
+        Sinh output từ danh sách messages (system/user/assistant) giữ nguyên cấu trúc.
+        Mặc định dùng lại generate_content (bỏ qua format/options/profile); client hỗ trợ chat API nên override.
+        """
+        return self.generate_content(messages)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark model cho bước phân loại intent: latency và độ khớp nhãn của từng model trên cùng bộ câu hỏi,
+để chọn model rẻ nhất cho LLM_TASK_MODELS["classification"] mà không giảm độ chính xác
+
+Chạy (từ AI/backend):
+    python -m llms.benchmark --models hf.co/Cactus-Compute/Qwen3-1.7B-Instruct-GGUF:Q4_K_M hf.co/unsloth/Qwen3-4B-Instruct-2507-GGUF:Q4_K_M
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .llm_manager import default_ollama_url
+from .ollama_llms import OllamaLLMs
+from .profiles import match_label
+
+
+def _benchmark_client(base_url: str, model_name: str) -> OllamaLLMs:
+    """Client riêng không dùng call cache / singleflight (mỗi lời gọi phải thực sự chạy trên model)"""
+    client = OllamaLLMs(base_url=base_url, model_name=model_name)
+    client.call_cache = None
+    client.singleflight = None
+    return client
+
+
+def intent_samples(per_intent: Optional[int] = 5) -> List[Tuple[str, str]]:
+    """(nhãn đúng, câu hỏi) lấy từ samples của intent router"""
+    from tool.semantic_router.sample import Sample
+
+    return [
+        (intent, query)
+        for intent, samples in Sample.intent_routes().items()
+        for query in (samples[:per_intent] if per_intent else samples)
+    ]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def benchmark_classification(
+    models: Sequence[str],
+    samples: Sequence[Tuple[str, str]],
+    base_url: Optional[str] = None,
+    client_factory: Callable[[str, str], Any] = _benchmark_client,
+    warm_up: bool = True
+) -> Dict[str, Any]:
+    """
+    Chạy prompt classification_chat_intent (profile "classification") trên mọi model
+
+    Args:
+        models: các model cần so sánh, model đầu tiên là baseline để tính agreement
+        samples: [(nhãn đúng, câu hỏi)]
+        client_factory: (base_url, model) → client có generate_chat
+
+    Returns:
+        {"models": {model: {accuracy, agreement, latency_ms, errors, ...}}, "recommended": model}
+    """
+    from prompt.promt_config import PromptConfig, CHAT_INTENTS
+
+    base_url = base_url or default_ollama_url()
+    prompt_config = PromptConfig()
+    messages = [prompt_config.get_messages("classification_chat_intent", user_input=query) for _, query in samples]
+
+    predictions: Dict[str, List[Optional[str]]] = {}
+    report: Dict[str, Dict[str, Any]] = {}
+    for model in models:
+        client = client_factory(base_url, model)
+        if warm_up and hasattr(client, "warm_up"):
+            # Không tính thời gian load model vào latency
+            client.warm_up()
+
+        labels, latencies, errors = [], [], 0
+        for message in messages:
+            started_at = time.perf_counter()
+            try:
+                output = client.generate_chat(message, profile="classification")
+                labels.append(match_label(output, CHAT_INTENTS, fallback="intent_chitchat"))
+            except Exception as e:
+                print(f"⚠️ {model}: {e}")
+                labels.append(None)
+                errors += 1
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+        predictions[model] = labels
+        correct = sum(1 for (expected, _), label in zip(samples, labels) if label == expected)
+        report[model] = {
+            "samples": len(samples),
+            "accuracy": round(correct / len(samples), 4) if samples else 0.0,
+            "errors": errors,
+            "latency_ms": {
+                "mean": round(statistics.fmean(latencies), 1) if latencies else 0.0,
+                "p50": round(_percentile(latencies, 0.5), 1),
+                "p95": round(_percentile(latencies, 0.95), 1),
+            },
+        }
+
+    baseline = predictions.get(models[0], []) if models else []
+    for model in models:
+        agree = sum(1 for a, b in zip(predictions[model], baseline) if a is not None and a == b)
+        report[model]["agreement"] = round(agree / len(baseline), 4) if baseline else 0.0
+
+    return {"baseline": models[0] if models else None, "models": report, "recommended": recommend(report)}
+
+
+def recommend(report: Dict[str, Dict[str, Any]], tolerance: float = 0.02) -> Optional[str]:
+    """Model có p50 thấp nhất trong các model có accuracy không kém model tốt nhất quá tolerance"""
+    if not report:
+        return None
+    best_accuracy = max(stats["accuracy"] for stats in report.values())
+    candidates = [model for model, stats in report.items() if stats["accuracy"] >= best_accuracy - tolerance]
+    return min(candidates, key=lambda model: report[model]["latency_ms"]["p50"])
+
+
+def format_report(result: Dict[str, Any]) -> str:
+    lines = [f"{'model':<60} {'acc':>6} {'agree':>6} {'p50 ms':>9} {'p95 ms':>9} {'errors':>6}"]
+    for model, stats in result["models"].items():
+        lines.append(
+            f"{model:<60} {stats['accuracy']:>6.2%} {stats['agreement']:>6.2%} "
+            f"{stats['latency_ms']['p50']:>9.1f} {stats['latency_ms']['p95']:>9.1f} {stats['errors']:>6}"
+        )
+    lines.append(f"✅ Recommended for classification: {result['recommended']}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="So sánh latency / độ chính xác phân loại intent giữa các model Ollama")
+    parser.add_argument("--models", nargs="+", required=True, help="Các model cần so sánh (model đầu tiên là baseline)")
+    parser.add_argument("--base-url", default=None, help="Ollama URL (mặc định OLLAMA_URL)")
+    parser.add_argument("--per-intent", type=int, default=5, help="Số câu mỗi intent (0 = tất cả)")
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    args = parser.parse_args(argv)
+
+    result = benchmark_classification(args.models, intent_samples(args.per_intent or None), base_url=args.base_url)
+    print(json.dumps(result, ensure_ascii=False, indent=2) if args.json else format_report(result))
+    return result
+
+
+if __name__ == "__main__":
+    main()
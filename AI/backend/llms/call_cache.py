@@ -0,0 +1,265 @@
+"""
+Cache kết quả các lời gọi LLM có tính tất định (temperature = 0 hoặc có seed):
+LRU trong process giới hạn theo bytes + SQLite (WAL) tùy chọn để giữ qua restart và dùng chung giữa các worker
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from metrics import metrics
+
+# Options cho các prompt là hàm thuần của input (phân loại, trích xuất, reflection) → kết quả được cache
+DETERMINISTIC_OPTIONS = {"temperature": 0}
+
+LLM_CALL_CACHE_LOOKUPS = metrics.counter(
+    "llm_call_cache_lookups_total",
+    "Số lần tra cache lời gọi LLM theo endpoint và kết quả (hit, disk_hit, miss, skipped)"
+)
+
+
+class LLMCallCache:
+    """
+    Memoize generate_content / chat của OllamaLLMs
+
+    - Key: hash(model, endpoint, toàn bộ messages, options, format/tham số khác)
+    - Chỉ cache khi options tất định: temperature == 0 hoặc có seed
+    - Tầng 1: LRU trong process, giới hạn tổng bytes (key + value)
+    - Tầng 2 (tùy chọn): SQLite, giới hạn số dòng; bị xóa toàn bộ khi template_version thay đổi
+      (prompt template đổi → kết quả cũ không còn đúng)
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, db_path: str = "", max_disk_entries: int = 50000, template_version: str = ""):
+        """
+        Args:
+            max_bytes: giới hạn bytes của LRU trong process
+            db_path: file SQLite ("" = chỉ dùng LRU trong process)
+            max_disk_entries: số dòng tối đa giữ trong SQLite
+            template_version: hash của các prompt template hiện tại
+        """
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.template_version = template_version
+
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._puts_since_prune = 0
+        self._local = threading.local()
+        self.reset_stats()
+
+        if self.db_path:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = self._connection()
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS llm_calls (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS meta (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+            row = conn.execute("SELECT value FROM meta WHERE name = 'template_version'").fetchone()
+            if row is None or row[0] != self.template_version:
+                if row is not None:
+                    print(f"♻️ Prompt templates changed, invalidating persisted LLM call cache")
+                self._reset_disk()
+
+    # ---------------------------------------------------------------- helpers
+
+    @staticmethod
+    def is_deterministic(options: Optional[Dict[str, Any]]) -> bool:
+        """Ollama options cho kết quả lặp lại được: temperature = 0 hoặc có seed cố định"""
+        if not options:
+            return False
+        return options.get("temperature") == 0 or options.get("seed") is not None
+
+    @staticmethod
+    def make_key(model: str, endpoint: str, messages: List[Dict[str, Any]], options: Dict[str, Any], extra: Any = None) -> str:
+        payload = json.dumps(
+            {"model": model, "endpoint": endpoint, "messages": messages, "options": options, "extra": extra},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _size(key: str, value: str) -> int:
+        return len(key) + len(value.encode("utf-8"))
+
+    def _connection(self) -> sqlite3.Connection:
+        # Một connection cho mỗi thread, tạo lại sau fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _reset_disk(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM llm_calls")
+            conn.execute(
+                "INSERT INTO meta (name, value) VALUES ('template_version', ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                (self.template_version,)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ------------------------------------------------------------------ access
+
+    def get(self, key: str, endpoint: str = "") -> Optional[str]:
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self._stats["hits"] += 1
+        if value is not None:
+            LLM_CALL_CACHE_LOOKUPS.inc(endpoint=endpoint, result="hit")
+            return value
+
+        if self.db_path:
+            try:
+                row = self._connection().execute("SELECT value FROM llm_calls WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM call cache read failed: {e}")
+                row = None
+            if row is not None:
+                self._remember(key, row[0])
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                LLM_CALL_CACHE_LOOKUPS.inc(endpoint=endpoint, result="disk_hit")
+                return row[0]
+
+        with self._lock:
+            self._stats["misses"] += 1
+        LLM_CALL_CACHE_LOOKUPS.inc(endpoint=endpoint, result="miss")
+        return None
+
+    def put(self, key: str, value: str):
+        if not isinstance(value, str) or not value:
+            return
+        self._remember(key, value)
+
+        if self.db_path:
+            try:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO llm_calls (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, value, time.time())
+                )
+                self._prune_disk()
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM call cache write failed: {e}")
+
+    def record_skip(self, endpoint: str = ""):
+        """Lời gọi không tất định, không được cache"""
+        with self._lock:
+            self._stats["skipped"] += 1
+        LLM_CALL_CACHE_LOOKUPS.inc(endpoint=endpoint, result="skipped")
+
+    def _remember(self, key: str, value: str):
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._lru.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._size(key, previous)
+            self._lru[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._lru:
+                old_key, old_value = self._lru.popitem(last=False)
+                self._bytes -= self._size(old_key, old_value)
+                self._stats["evictions"] += 1
+
+    def _prune_disk(self):
+        # Dọn định kỳ (mỗi 100 lần ghi) thay vì đếm dòng ở mỗi lần ghi
+        with self._lock:
+            self._puts_since_prune += 1
+            if self._puts_since_prune < 100:
+                return
+            self._puts_since_prune = 0
+        self._connection().execute(
+            "DELETE FROM llm_calls WHERE key IN "
+            "(SELECT key FROM llm_calls ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def invalidate(self, template_version: Optional[str] = None):
+        """
+        Xóa toàn bộ cache (LRU + SQLite), vd: sau khi sửa prompt template
+
+        Args:
+            template_version: version mới của prompt template (giữ nguyên nếu None)
+        """
+        if template_version is not None:
+            self.template_version = template_version
+        with self._lock:
+            self._lru.clear()
+            self._bytes = 0
+        if self.db_path:
+            self._reset_disk()
+
+    # ------------------------------------------------------------------- stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "skipped": 0, "evictions": 0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._lru)
+            stats["bytes"] = self._bytes
+
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        stats.update({
+            "max_bytes": self.max_bytes,
+            "disk_enabled": bool(self.db_path),
+            "template_version": self.template_version,
+        })
+        return stats
+
+
+_llm_call_cache = None
+_llm_call_cache_lock = threading.Lock()
+
+
+def get_llm_call_cache() -> Optional[LLMCallCache]:
+    """
+    Cache dùng chung trong process, None nếu LLM_CALL_CACHE_ENABLED = False
+    """
+    global _llm_call_cache
+    if _llm_call_cache is None:
+        with _llm_call_cache_lock:
+            if _llm_call_cache is None:
+                from setting import get_settings
+                from prompt.promt_config import PromptConfig
+
+                settings = get_settings()
+                if not settings.LLM_CALL_CACHE_ENABLED:
+                    return None
+                _llm_call_cache = LLMCallCache(
+                    max_bytes=settings.LLM_CALL_CACHE_MAX_BYTES,
+                    db_path=settings.LLM_CALL_CACHE_DB_PATH,
+                    max_disk_entries=settings.LLM_CALL_CACHE_MAX_DISK_ENTRIES,
+                    template_version=PromptConfig.templates_version()
+                )
+    return _llm_call_cache
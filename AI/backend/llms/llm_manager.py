@@ -4,23 +4,35 @@ LLM Manager - Singleton pattern để quản lý các LLM instances
 """
 import os
 import logging
-from typing import Dict, Optional, Any
+import threading
+from typing import Dict, Optional, Any, Union
 from .ollama_llms import OllamaLLMs
+from .backend_pool import OllamaBackendPool
+from tool.embeddings.cache import CachedEmbedding
+from tool.embeddings.sentenceTransformer import SENTENCE_TRANSFORMERS_AVAILABLE
+from tool.model_registry import get_model_registry
 
-try:
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
-    SentenceTransformer = None
+
+_instances_lock = threading.Lock()
+
+# Các bước của pipeline chat có thể dùng model riêng (LLM_TASK_MODELS)
+LLM_TASKS = ("classification", "reflection", "extraction", "answer")
+
+
+def default_ollama_url() -> str:
+    default_url = "http://host.docker.internal:11434" if os.getenv("DOCKER_ENV") == "true" else "http://localhost:11434"
+    return os.getenv("OLLAMA_URL", default_url)
+
+
+def default_ollama_model() -> str:
+    return os.getenv("OLLAMA_MODEL", "hf.co/Cactus-Compute/Qwen3-1.7B-Instruct-GGUF:Q4_K_M")
 
 
 class LLMManager:
     """Singleton manager for LLM instances and embedding models"""
     
     _instance = None
-    _instances: Dict[str, OllamaLLMs] = {}
-    _embedding_models: Dict[str, Any] = {}  # Use Any instead of SentenceTransformer for type safety
+    _instances: Dict[str, Union[OllamaLLMs, OllamaBackendPool]] = {}
     
     def __new__(cls):
         if cls._instance is None:
@@ -36,7 +48,7 @@ class LLMManager:
     
     def get_ollama_client(self, 
                          base_url: Optional[str] = None, 
-                         model_name: Optional[str] = None) -> OllamaLLMs:
+                         model_name: Optional[str] = None) -> Union[OllamaLLMs, OllamaBackendPool]:
         """
         Get or create Ollama client instance
         
@@ -46,15 +58,20 @@ class LLMManager:
             
         Returns:
             OllamaLLMs: Cached or new instance
+            OllamaBackendPool: nếu OLLAMA_BACKENDS được cấu hình (pool gồm OLLAMA_BACKENDS + base_url)
         """
         # Use environment defaults if not provided
         if base_url is None:
-            default_url = "http://host.docker.internal:11434" if os.getenv("DOCKER_ENV") == "true" else "http://localhost:11434"
-            base_url = os.getenv("OLLAMA_URL", default_url)
+            base_url = default_ollama_url()
         
         if model_name is None:
-            model_name = os.getenv("OLLAMA_MODEL", "hf.co/Cactus-Compute/Qwen3-1.7B-Instruct-GGUF:Q4_K_M")
+            model_name = default_ollama_model()
         
+        from setting import get_settings
+        settings = get_settings()
+        if settings.OLLAMA_BACKENDS:
+            return self._get_backend_pool(settings, base_url, model_name)
+
         # Create instance key
         instance_key = f"{base_url}#{model_name}"
         
@@ -70,8 +87,54 @@ class LLMManager:
         
         return client
     
+    def get_task_model(self, task: str) -> str:
+        """
+        Model dùng cho một bước của pipeline (classification, reflection, extraction, answer):
+        LLM_TASK_MODELS[task] nếu có, ngược lại OLLAMA_MODEL
+        """
+        if task not in LLM_TASKS:
+            raise ValueError(f"Unknown LLM task: {task}")
+        from setting import get_settings
+        return get_settings().LLM_TASK_MODELS.get(task) or default_ollama_model()
+
+    def get_task_models(self) -> Dict[str, str]:
+        """Map bước → model đang áp dụng"""
+        return {task: self.get_task_model(task) for task in LLM_TASKS}
+
+    def get_client_for_task(self, task: str, base_url: Optional[str] = None) -> Union[OllamaLLMs, OllamaBackendPool]:
+        """Client (dùng chung, có backend pool nếu cấu hình) cho model của bước task"""
+        return self.get_ollama_client(base_url=base_url, model_name=self.get_task_model(task))
+
+    def _get_backend_pool(self, settings, base_url: str, model_name: str) -> OllamaBackendPool:
+        """Một pool cho mỗi model, dùng chung cho mọi caller"""
+        instance_key = f"pool#{model_name}"
+        if instance_key not in self._instances:
+            with _instances_lock:
+                if instance_key not in self._instances:
+                    backends = list(settings.OLLAMA_BACKENDS) + [base_url]
+                    self.logger.info(f"🔥 Creating Ollama backend pool for {model_name}: {backends}")
+                    self._instances[instance_key] = OllamaBackendPool(
+                        model_name=model_name,
+                        base_urls=backends,
+                        eject_after_errors=settings.LLM_BACKEND_EJECT_AFTER_ERRORS,
+                        eject_seconds=settings.LLM_BACKEND_EJECT_SECONDS,
+                        health_interval=settings.LLM_BACKEND_HEALTH_INTERVAL_SECONDS
+                    )
+        return self._instances[instance_key]
+
+    def get_backend_stats(self) -> Dict[str, Any]:
+        """Trạng thái các backend pool (load, latency, ejection, quyết định định tuyến gần nhất) theo model"""
+        return {
+            instance.model_name: instance.get_stats()
+            for instance in list(self._instances.values())
+            if isinstance(instance, OllamaBackendPool)
+        }
+
     def clear_cache(self):
         """Clear all cached instances"""
+        for instance in list(self._instances.values()):
+            if isinstance(instance, OllamaBackendPool):
+                instance.close()
         self._instances.clear()
         self.logger.info("🧹 Cleared all LLM instances cache")
     
@@ -86,58 +149,68 @@ class LLMManager:
     def get_embedding_model(self, model_name: str = 'all-MiniLM-L6-v2') -> Optional[Any]:
         """
         Get or create embedding model instance
+
+        Model được load qua ModelManager/model registry dùng chung nên không bị load
+        lần thứ hai nếu ModelManager đã load cùng model.
         
         Args:
             model_name: Name of the embedding model
             
         Returns:
-            SentenceTransformer: Cached or new embedding model instance
+            CachedEmbedding: embedding model dùng chung (có cache theo text)
         """
         if not SENTENCE_TRANSFORMERS_AVAILABLE:
             self.logger.error("❌ sentence-transformers not available. Please install: pip install sentence-transformers")
             return None
-        
-        # Return existing model if available
-        if model_name in self._embedding_models:
-            self.logger.info(f"♻️ Reusing existing embedding model: {model_name}")
-            return self._embedding_models[model_name]
-        
-        # Create new embedding model
+
+        from tool.model_manager import model_manager
+
         try:
-            self.logger.info(f"🔥 Loading new embedding model: {model_name}")
-            model = SentenceTransformer(model_name)
-            self._embedding_models[model_name] = model
-            self.logger.info(f"✅ Successfully loaded embedding model: {model_name}")
-            return model
+            return model_manager.get_embedding_model(model_name)
         except Exception as e:
             self.logger.error(f"❌ Failed to load embedding model {model_name}: {str(e)}")
             # Fallback to default model
+            fallback_model = 'all-MiniLM-L6-v2'
+            if fallback_model == model_name:
+                return None
             try:
-                fallback_model = 'all-MiniLM-L6-v2'
-                if fallback_model != model_name and fallback_model not in self._embedding_models:
-                    self.logger.info(f"🔄 Trying fallback model: {fallback_model}")
-                    model = SentenceTransformer(fallback_model)
-                    self._embedding_models[fallback_model] = model
-                    self.logger.info(f"✅ Successfully loaded fallback model: {fallback_model}")
-                    return model
-                elif fallback_model in self._embedding_models:
-                    return self._embedding_models[fallback_model]
+                self.logger.info(f"🔄 Trying fallback model: {fallback_model}")
+                return model_manager.get_embedding_model(fallback_model)
             except Exception as fallback_error:
                 self.logger.error(f"❌ Failed to load fallback model: {str(fallback_error)}")
             return None
-    
+
+    def _embedding_models(self) -> Dict[str, Any]:
+        registry = get_model_registry()
+        return {
+            key[len("embedding:"):]: registry.get(key)
+            for key in registry.keys(prefix="embedding:")
+        }
+
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """Hit rate của embedding cache theo từng model"""
+        return {
+            name: model.get_stats()
+            for name, model in self._embedding_models().items()
+            if isinstance(model, CachedEmbedding)
+        }
+
+    def get_registry_stats(self) -> Dict[str, Any]:
+        """Bộ nhớ chiếm dụng của các model trong registry dùng chung"""
+        return get_model_registry().get_stats()
+
     def clear_embedding_cache(self):
         """Clear all cached embedding models"""
-        self._embedding_models.clear()
+        get_model_registry().clear(prefix="embedding:")
         self.logger.info("🧹 Cleared all embedding models cache")
     
     def get_embedding_model_count(self) -> int:
         """Get number of cached embedding models"""
-        return len(self._embedding_models)
+        return len(self._embedding_models())
     
     def list_embedding_models(self) -> Dict[str, str]:
         """List all cached embedding models"""
-        return {name: str(model) for name, model in self._embedding_models.items()}
+        return {name: str(model) for name, model in self._embedding_models().items()}
 
 
 # Global instance
@@ -1,17 +1,43 @@
 # -*- coding: utf-8 -*-
 import ollama
-import requests
+from ollama._utils import convert_function_to_tool
 import json
 import logging
-from typing import List, Dict, Optional, Callable, Any, Union
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Callable, Any, Union, Iterator
 from .base import BaseLLM
+from .admission import AdmissionRejected, get_admission_controller
+from .call_cache import LLMCallCache, get_llm_call_cache
+from .profiles import get_generation_profiles
+from .singleflight import get_singleflight
+from .transport import get_transport, get_transport_stats
+from .tool_executor import get_tool_executor
 from .tools import AVAILABLE_TOOLS, get_tool_by_name
+from metrics import (
+    current_prompt, LLM_REQUESTS, LLM_REQUEST_SECONDS, LLM_QUEUE_WAIT_SECONDS, LLM_SERVER_QUEUE_SECONDS,
+    LLM_LOAD_SECONDS, LLM_PROMPT_EVAL_SECONDS, LLM_EVAL_SECONDS, LLM_PROMPT_TOKENS, LLM_EVAL_TOKENS,
+    LLM_PROMPT_EVAL_TOKENS_PER_CALL
+)
+
+_NANOSECONDS = 1e9
+
+
+def _response_field(response: Any, name: str):
+    """Đọc field từ dict (/api/generate) hoặc ChatResponse của ollama client"""
+    if isinstance(response, dict):
+        return response.get(name)
+    return getattr(response, name, None)
 
 
 class OllamaLLMs(BaseLLM):
     # Class-level cache để tránh multiple warm-up
     _warmed_models = set()  # Cache các models đã warm-up
     _client_cache = {}  # Cache các client instances
+    # Số token prompt Ollama phải prefill theo từng prompt (kiểm tra hiệu quả KV cache của prefix)
+    _prefill_stats: Dict[str, Dict[str, int]] = {}
+    _prefill_lock = threading.Lock()
     
     def __init__(self, base_url: str = "http://localhost:11434", model_name: str = "llama2", **kwargs):
         """
@@ -25,79 +51,217 @@ class OllamaLLMs(BaseLLM):
         # Create cache key
         self.cache_key = f"{base_url}#{model_name}"
         
+        # Mọi request tới backend đi qua một transport dùng chung (connection pool, timeout, retry, circuit breaker)
+        self.transport = get_transport(self.base_url)
+        self.session = self.transport.session
+
         # Reuse existing client if available
         if self.cache_key in self.__class__._client_cache:
             cached_client = self.__class__._client_cache[self.cache_key]
-            self.client = cached_client['client']
-            self.session = cached_client['session']
             self.logger = cached_client['logger']
             self.logger.info(f"♻️ Reusing cached Ollama client for {model_name}")
         else:
-            # Initialize new Ollama client with connection pooling
-            self.client = ollama.Client(
-                host=base_url,
-                timeout=120  # Tăng timeout cho models lớn
-            )
-            
-            # Tạo session với connection pooling cho HTTP requests
-            self.session = requests.Session()
-            self.session.headers.update({
-                'Content-Type': 'application/json',
-                'Connection': 'keep-alive'
-            })
-            
             # Setup logging
             self.logger = logging.getLogger(__name__)
             
             # Cache the client
             self.__class__._client_cache[self.cache_key] = {
-                'client': self.client,
-                'session': self.session,
+                'transport': self.transport,
                 'logger': self.logger
             }
         
-        # Only warm-up if not already warmed
-        if self.cache_key not in self.__class__._warmed_models:
-            self._ensure_model_loaded()
+        # Giới hạn concurrency + hàng đợi có giới hạn cho backend này (dùng chung giữa các instance)
+        from setting import get_settings
+        self.admission = get_admission_controller(self.base_url) if get_settings().LLM_ADMISSION_ENABLED else None
+
+        # Memoize các lời gọi tất định (temperature = 0 hoặc có seed), None nếu tắt
+        self.call_cache = get_llm_call_cache()
+        # Gộp các lời gọi giống hệt nhau đang chạy đồng thời (dùng chung giữa các instance), None nếu tắt
+        self.singleflight = get_singleflight()
+        # Generation profile theo bước pipeline (classification, extraction, reflection, answer)
+        self.profiles = get_generation_profiles()
+        # Thực thi tool call của chat_with_tools (thread pool, timeout, cache kết quả, cắt ngắn output)
+        self.tool_executor = get_tool_executor()
+
+        # Không warm-up trong constructor (tránh request chặn lúc import/khởi tạo);
+        # gọi warm_up() tường minh khi khởi động (readiness.warm_up, MCP/startup.py)
+
+    def warm_up(self, force: bool = False, keep_alive: Optional[int] = None) -> bool:
+        """
+        Warm-up model một lần cho mỗi (base_url, model)
+
+        Args:
+            force: warm-up lại kể cả khi đã warm-up (model đã bị Ollama unload, xem ModelResidencyManager)
+            keep_alive: thời gian Ollama giữ model sau lần gọi này (giây), None = mặc định của Ollama
+
+        Returns:
+            bool: True nếu model đã sẵn sàng
+        """
+        if not force and self.cache_key in self.__class__._warmed_models:
+            self.logger.info(f"⚡ Model {self.model_name} already warmed up, skipping...")
+            return True
+
+        if self._ensure_model_loaded(keep_alive):
             self.__class__._warmed_models.add(self.cache_key)
-        else:
-            self.logger.info(f"⚡ Model {model_name} already warmed up, skipping...")
-    
-    def _ensure_model_loaded(self):
+            return True
+        return False
+
+    def mark_evicted(self):
+        """Model không còn trong /api/ps: lần warm_up() sau sẽ gọi Ollama thật"""
+        self.__class__._warmed_models.discard(self.cache_key)
+
+    def _ensure_model_loaded(self, keep_alive: Optional[int] = None) -> bool:
         """
         Đảm bảo model đã được load vào memory (warm-up)
         """
         try:
             # Gửi một request nhỏ để warm-up model
-            warmup_response = self.client.chat(
-                model=self.model_name,
-                messages=[{"role": "user", "content": "Hi"}],
-                options={"num_predict": 1}  # Chỉ generate 1 token
-            )
+            payload = self.chat_payload([{"role": "user", "content": "Hi"}], False, options={"num_predict": 1})  # Chỉ generate 1 token
+            if keep_alive is not None:
+                payload["keep_alive"] = keep_alive if keep_alive > 0 else -1
+            resp = self.transport.post("/api/chat", payload)
+            if resp.status_code != 200:
+                raise ValueError(f"Ollama request failed: {resp.status_code}, {resp.text}")
             self.logger.info(f"🔥 Model {self.model_name} warmed up successfully")
+            return True
         except Exception as e:
             self.logger.warning(f"⚠️ Model warm-up failed: {e}")
+            return False
     
-    def keep_alive(self, duration: int = 300):
+    @contextmanager
+    def _admit(self):
+        """Slot của admission controller (no-op nếu admission control bị tắt), ghi lại thời gian chờ slot"""
+        if self.admission is None:
+            yield
+            return
+        wait_start = time.perf_counter()
+        self.admission.acquire()
+        LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - wait_start, model=self.model_name)
+        service_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.admission.release(time.perf_counter() - service_start)
+
+    def _record_call(self, endpoint: str, started_at: float, response: Any = None, status: str = "ok", prompt: Optional[str] = None):
+        """
+        Ghi metric cho một lời gọi Ollama: thời gian phía client và các duration Ollama tự báo
+        (load / prompt_eval = prefill / eval = decode), phần còn lại là mạng + hàng đợi phía server
+        """
+        labels = {"prompt": prompt or current_prompt(), "model": self.model_name}
+        wall_seconds = time.perf_counter() - started_at
+        LLM_REQUESTS.inc(endpoint=endpoint, status=status, **labels)
+        LLM_REQUEST_SECONDS.observe(wall_seconds, endpoint=endpoint, **labels)
+        if response is None:
+            return
+
+        total_duration = _response_field(response, "total_duration")
+        for field, histogram in (
+            ("load_duration", LLM_LOAD_SECONDS),
+            ("prompt_eval_duration", LLM_PROMPT_EVAL_SECONDS),
+            ("eval_duration", LLM_EVAL_SECONDS),
+        ):
+            value = _response_field(response, field)
+            if value is not None:
+                histogram.observe(value / _NANOSECONDS, **labels)
+        if total_duration is not None:
+            LLM_SERVER_QUEUE_SECONDS.observe(max(0.0, wall_seconds - total_duration / _NANOSECONDS), **labels)
+
+        prompt_tokens = _response_field(response, "prompt_eval_count")
+        if prompt_tokens is not None:
+            LLM_PROMPT_TOKENS.inc(prompt_tokens, **labels)
+            LLM_PROMPT_EVAL_TOKENS_PER_CALL.observe(prompt_tokens, endpoint=endpoint, **labels)
+            with self._prefill_lock:
+                stats = self._prefill_stats.setdefault(labels["prompt"], {"calls": 0, "prompt_eval_tokens": 0, "last": 0})
+                stats["calls"] += 1
+                stats["prompt_eval_tokens"] += prompt_tokens
+                stats["last"] = prompt_tokens
+        eval_tokens = _response_field(response, "eval_count")
+        if eval_tokens:
+            LLM_EVAL_TOKENS.inc(eval_tokens, **labels)
+
+    def _memoize(self, endpoint: str, messages: List[Dict[str, Any]], options: Optional[Dict[str, Any]], extra: Any, call: Callable[[], str]) -> str:
+        """
+        Gọi Ollama qua 2 lớp khử trùng lặp:
+        - call cache: lời gọi tất định đã có kết quả → trả về ngay
+        - singleflight: lời gọi giống hệt đang chạy → chờ và dùng chung kết quả
+        """
+        cache = self.call_cache
+        if cache is not None and not LLMCallCache.is_deterministic(options):
+            cache.record_skip(endpoint)
+            cache = None
+        if cache is None and self.singleflight is None:
+            return call()
+
+        key = LLMCallCache.make_key(self.model_name, endpoint, messages, options, extra)
+        if cache is not None:
+            cached = cache.get(key, endpoint)
+            if cached is not None:
+                return cached
+
+        def compute() -> str:
+            result = call()
+            if cache is not None:
+                cache.put(key, result)
+            return result
+
+        if self.singleflight is None:
+            return compute()
+        return self.singleflight.do(key, compute, endpoint)
+
+    def check_admission(self):
+        """Raise AdmissionRejected ngay nếu hàng đợi của backend đã đầy (CircuitOpen nếu backend đang bị ngắt)"""
+        self.transport.breaker.check()
+        if self.admission is not None:
+            self.admission.check()
+
+    def keep_alive(self, duration: int = 300) -> bool:
         """
         Giữ model trong memory trong khoảng thời gian nhất định
+        (prompt rỗng: Ollama chỉ load model / gia hạn keep_alive, không sinh token)
         Args:
             duration: Thời gian giữ model (giây), -1 = vĩnh viễn
         """
         try:
             payload = {
                 "model": self.model_name,
+                "prompt": "",
                 "keep_alive": duration if duration > 0 else -1
             }
-            self.session.post(f"{self.base_url}/api/generate", json=payload)
+            resp = self.transport.post("/api/generate", payload)
+            if resp.status_code != 200:
+                raise ValueError(f"Ollama request failed: {resp.status_code}, {resp.text}")
             self.logger.info(f"🔄 Model {self.model_name} keep-alive set to {duration}s")
+            return True
         except Exception as e:
             self.logger.warning(f"⚠️ Keep-alive failed: {e}")
+            return False
 
-    def generate_content(self, prompt: List[Dict[str, str]]) -> str:
+    def generate_content(
+        self,
+        prompt: List[Dict[str, str]],
+        format: Optional[Union[str, Dict[str, Any]]] = None,
+        options: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
         Generate content using the legacy API (backward compatibility)
+
+        Args:
+            prompt: List of message dicts with 'role' and 'content'
+            format: "json" hoặc JSON schema để Ollama ép output có cấu trúc (structured outputs)
+            options: Ollama options (temperature, seed, ...); temperature = 0 hoặc có seed → kết quả được cache
         """
+        return self._memoize(
+            "generate", prompt, options, format,
+            lambda: self._generate_content(prompt, format, options)
+        )
+
+    def _generate_content(
+        self,
+        prompt: List[Dict[str, str]],
+        format: Optional[Union[str, Dict[str, Any]]],
+        options: Optional[Dict[str, Any]]
+    ) -> str:
         messages = "\n".join([f"{p['role']}: {p['content']}" for p in prompt])
 
         payload = {
@@ -105,41 +269,212 @@ class OllamaLLMs(BaseLLM):
             "prompt": messages,
             "stream": False,
         }
+        if format is not None:
+            payload["format"] = format
+        if options:
+            payload["options"] = options
 
-        resp = requests.post(
-            f"{self.base_url}/api/generate",
-            json=payload,
-        )
+        return self._post("/api/generate", payload, "generate").get("response", "")
+
+    def _post(self, path: str, payload: Dict[str, Any], endpoint: str, read_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """POST qua transport trong slot của admission controller, trả về JSON của Ollama"""
+        started_at = time.perf_counter()
+        try:
+            with self._admit():
+                resp = self.transport.post(path, payload, read_timeout)
+        except Exception:
+            self._record_call(endpoint, started_at, status="error")
+            raise
 
         if resp.status_code != 200:
+            self._record_call(endpoint, started_at, status="error")
             raise ValueError(f"Ollama request failed: {resp.status_code}, {resp.text}")
 
         data = resp.json()
-        return data.get("response", "")
+        self._record_call(endpoint, started_at, data)
+        return data
 
-    def chat(self, messages: List[Dict[str, str]], **options) -> str:
+    def generate_content_stream(self, prompt: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        Stream content từ /api/generate, yield từng chunk text ngay khi Ollama sinh ra
+        """
+        messages = "\n".join([f"{p['role']}: {p['content']}" for p in prompt])
+
+        payload = {
+            "model": self.model_name,
+            "prompt": messages,
+            "stream": True,
+        }
+        return self._stream("/api/generate", payload, lambda data: data.get("response", ""), "generate_stream")
+
+    def generate_chat(
+        self,
+        messages: List[Dict[str, str]],
+        format: Optional[Union[str, Dict[str, Any]]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        profile: Optional[str] = None
+    ) -> str:
+        """
+        Sinh câu trả lời qua /api/chat, giữ nguyên danh sách messages (không gộp thành một chuỗi).
+
+        System message cố định ở đầu (PromptConfig.get_messages) và lịch sử chỉ append thêm
+        → prefix của prompt giống hệt lần gọi trước, Ollama chỉ prefill phần mới.
+
+        Args:
+            messages: [{"role": "system" | "user" | "assistant", "content": ...}]
+            format: "json" hoặc JSON schema (structured outputs)
+            options: Ollama options (ghi đè profile); temperature = 0 hoặc có seed → kết quả được cache
+            profile: tên generation profile (classification, extraction, reflection, answer)
+        """
+        options, think = self.profiles.resolve(profile, options)
+        read_timeout = self.profiles.timeout(profile)
+        return self._memoize(
+            "chat", messages, options, {"format": format, "think": think},
+            lambda: self._generate_chat(messages, format, options, think, read_timeout)
+        )
+
+    def chat_payload(
+        self,
+        messages: List[Dict[str, str]],
+        stream: bool,
+        format: Optional[Union[str, Dict[str, Any]]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        think: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """Body của request /api/chat (dùng chung với AsyncOllamaLLMs)"""
+        payload = {
+            "model": self.model_name,
+            "messages": messages,
+            "stream": stream,
+        }
+        if format is not None:
+            payload["format"] = format
+        if options:
+            payload["options"] = options
+        if think is not None:
+            payload["think"] = think
+        return payload
+
+    def _generate_chat(
+        self,
+        messages: List[Dict[str, str]],
+        format: Optional[Union[str, Dict[str, Any]]],
+        options: Optional[Dict[str, Any]],
+        think: Optional[bool] = None,
+        read_timeout: Optional[float] = None
+    ) -> str:
+        payload = self.chat_payload(messages, False, format, options, think)
+        data = self._post("/api/chat", payload, "chat", read_timeout)
+        return (data.get("message") or {}).get("content", "")
+
+    def generate_chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]] = None,
+        profile: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Giống generate_chat nhưng stream từng chunk text từ /api/chat
+        """
+        options, think = self.profiles.resolve(profile, options)
+        payload = self.chat_payload(messages, True, options=options, think=think)
+        return self._stream(
+            "/api/chat", payload, lambda data: (data.get("message") or {}).get("content", ""), "chat_stream",
+            read_timeout=self.profiles.timeout(profile)
+        )
+
+    def _stream(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        extract_chunk: Callable[[Dict[str, Any]], str],
+        endpoint: str,
+        read_timeout: Optional[float] = None
+    ) -> Iterator[str]:
+        """Đọc NDJSON stream của Ollama, yield text của từng dòng"""
+        started_at = time.perf_counter()
+        # Đọc tên prompt khi stream bắt đầu (block llm_prompt của caller có thể đã kết thúc khi stream xong)
+        prompt_name = current_prompt()
+        final_data, status = None, "error"
+
+        # Giữ slot (và connection của transport) trong suốt thời gian stream
+        try:
+            with self._admit(), self.transport.stream(path, payload, read_timeout) as resp:
+                if resp.status_code != 200:
+                    raise ValueError(f"Ollama request failed: {resp.status_code}, {resp.text}")
+
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise ValueError(f"Ollama stream failed: {data['error']}")
+                    chunk = extract_chunk(data)
+                    if chunk:
+                        yield chunk
+                    if data.get("done"):
+                        # Chunk cuối chứa các duration / token count của cả request
+                        final_data = data
+                        break
+                status = "ok"
+        finally:
+            self._record_call(endpoint, started_at, final_data, status=status, prompt=prompt_name)
+
+    def chat(self, messages: List[Dict[str, str]], profile: Optional[str] = None, **options) -> str:
         """
         Chat using Ollama 0.4 API without tools
         
         Args:
             messages: List of message dicts with 'role' and 'content'
-            **options: Additional options (temperature, etc.)
+            profile: tên generation profile (classification, extraction, reflection, answer)
+            **options: Additional options, vd: options={"temperature": 0} (lời gọi tất định được cache), format=...
         
         Returns:
             str: Generated response
         """
-        
+        if profile is not None:
+            resolved, think = self.profiles.resolve(profile, options.get("options"))
+            options["options"] = resolved
+            if think is not None:
+                options.setdefault("think", think)
+        read_timeout = self.profiles.timeout(profile)
+        extra = {name: value for name, value in options.items() if name != "options"}
+        return self._memoize(
+            "chat", messages, options.get("options"), extra,
+            lambda: self._chat(messages, read_timeout=read_timeout, **options)
+        )
+
+    def _chat(self, messages: List[Dict[str, str]], read_timeout: Optional[float] = None, **options) -> str:
         try:
-            response = self.client.chat(
-                model=self.model_name,
-                messages=messages,
-                **options
-            )
-            return response['message']['content']
+            return self._chat_response(messages, "chat", read_timeout=read_timeout, **options)['message']['content']
+        except AdmissionRejected:
+            raise
         except Exception as e:
             self.logger.error(f"Chat error: {e}")
             raise ValueError(f"Chat request failed: {str(e)}")
 
+    def _chat_response(
+        self,
+        messages: List[Dict[str, Any]],
+        endpoint: str,
+        tools: Optional[List[Callable]] = None,
+        read_timeout: Optional[float] = None,
+        **options
+    ) -> ollama.ChatResponse:
+        """
+        /api/chat không stream qua transport, trả về ChatResponse của thư viện ollama
+        (message.tool_calls, message.content) để phần function calling giữ nguyên
+
+        options: options / format / think / keep_alive như ollama.Client.chat
+        """
+        payload = self.chat_payload(
+            messages, False, options.pop("format", None), options.pop("options", None), options.pop("think", None)
+        )
+        payload.update(options)
+        if tools:
+            payload["tools"] = [convert_function_to_tool(tool).model_dump(exclude_none=True) for tool in tools]
+        return ollama.ChatResponse.model_validate(self._post("/api/chat", payload, endpoint, read_timeout))
+
     def chat_with_tools(
         self, 
         messages: List[Dict[str, str]], 
@@ -177,12 +512,7 @@ class OllamaLLMs(BaseLLM):
         for step in range(max_steps):
             try:
                 # Call Ollama with tools
-                response = self.client.chat(
-                    model=self.model_name,
-                    messages=current_messages,
-                    tools=tool_functions,
-                    **options
-                )
+                response = self._chat_response(current_messages, "chat_tools", tools=tool_functions, **dict(options))
                 
                 message = response['message']
                 
@@ -201,20 +531,25 @@ class OllamaLLMs(BaseLLM):
                     "content": message['content'] or ""
                 })
                 
-                for tool_call in message.tool_calls:
-                    tool_result = self._execute_tool_call(tool_call)
+                # Các tool call của cùng bước chạy song song (có timeout, tool thuần được cache theo arguments)
+                calls = [(tool_call.function.name, tool_call.function.arguments) for tool_call in message.tool_calls]
+                for (tool_name, tool_args), tool_result in zip(calls, self.tool_executor.run(calls)):
                     tool_call_history.append({
-                        "tool_name": tool_call.function.name,
-                        "arguments": tool_call.function.arguments,
+                        "tool_name": tool_name,
+                        "arguments": tool_args,
                         "result": tool_result
                     })
                     
-                    # Add tool result to conversation
+                    # Add tool result to conversation (cắt ngắn: context của các bước sau không phình theo output của tool).
+                    # Các message cũ giữ nguyên để prefix của prompt không đổi giữa các bước (Ollama dùng lại KV cache)
                     current_messages.append({
                         "role": "tool",
-                        "content": str(tool_result)
+                        "tool_name": tool_name,
+                        "content": self.tool_executor.format_result(tool_result)
                     })
                 
+            except AdmissionRejected:
+                raise
             except Exception as e:
                 self.logger.error(f"Tool calling error at step {step}: {e}")
                 return {
@@ -231,11 +566,7 @@ class OllamaLLMs(BaseLLM):
                 "content": "Please provide a final answer based on the information above."
             })
             
-            final_response = self.client.chat(
-                model=self.model_name,
-                messages=current_messages,
-                **options
-            )
+            final_response = self._chat_response(current_messages, "chat_tools", **dict(options))
             
             return {
                 "final_answer": final_response['message']['content'],
@@ -243,6 +574,8 @@ class OllamaLLMs(BaseLLM):
                 "steps": max_steps,
                 "max_steps_reached": True
             }
+        except AdmissionRejected:
+            raise
         except Exception as e:
             return {
                 "final_answer": "Max steps reached and couldn't generate final answer",
@@ -287,25 +620,7 @@ class OllamaLLMs(BaseLLM):
         Returns:
             Any: Tool execution result
         """
-        try:
-            tool_name = tool_call.function.name
-            tool_args = tool_call.function.arguments
-            
-            # Get the function from registry
-            tool_func = get_tool_by_name(tool_name)
-            if not tool_func:
-                return {"error": f"Tool '{tool_name}' not found"}
-            
-            # Execute the tool with arguments
-            result = tool_func(**tool_args)
-            
-            self.logger.info(f"Tool '{tool_name}' executed successfully")
-            return result
-            
-        except Exception as e:
-            error_msg = f"Error executing tool '{tool_name}': {str(e)}"
-            self.logger.error(error_msg)
-            return {"error": error_msg}
+        return self.tool_executor.execute(tool_call.function.name, tool_call.function.arguments)
     
     def list_available_tools(self) -> List[str]:
         """
@@ -329,8 +644,22 @@ class OllamaLLMs(BaseLLM):
         return {
             "warmed_models": list(cls._warmed_models),
             "cached_clients": list(cls._client_cache.keys()),
-            "cache_count": len(cls._client_cache)
+            "cache_count": len(cls._client_cache),
+            "prefill": cls.get_prefill_stats(),
+            "transports": get_transport_stats()
         }
+
+    @classmethod
+    def get_prefill_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """Số token prompt Ollama thực sự prefill theo từng prompt (trung bình thấp = prefix được lấy từ KV cache)"""
+        with cls._prefill_lock:
+            return {
+                prompt: {
+                    **stats,
+                    "avg_prompt_eval_tokens": round(stats["prompt_eval_tokens"] / stats["calls"], 1) if stats["calls"] else 0.0
+                }
+                for prompt, stats in cls._prefill_stats.items()
+            }
     
     def is_warmed_up(self) -> bool:
         """Check if this model instance is warmed up"""
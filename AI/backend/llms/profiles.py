@@ -0,0 +1,162 @@
+"""
+Generation profile theo từng bước của pipeline: giới hạn số token sinh ra, stop sequences,
+context window, temperature, bật/tắt thinking và read timeout cho mỗi loại lời gọi Ollama
+"""
+import re
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from metrics import metrics
+
+LLM_INVALID_LABELS = metrics.counter(
+    "llm_invalid_labels_total",
+    "Số output phân loại không khớp nhãn hợp lệ nào (phải dùng nhãn fallback)"
+)
+
+# Các field của profile không phải Ollama options
+_PROFILE_FIELDS = ("think", "timeout")
+
+# Bước phân loại / trích xuất / viết lại chỉ cần output ngắn, tất định và không cần <think>;
+# chỉ câu trả lời cuối cho user được sinh dài và có sampling
+DEFAULT_PROFILES: Dict[str, Dict[str, Any]] = {
+    "classification": {
+        "temperature": 0,
+        "num_predict": 16,
+        "num_ctx": 4096,
+        "stop": ["\n\n", "</s>"],
+        "think": False,
+        "timeout": 15,  # Read timeout (giây): output ngắn, chờ lâu hơn nghĩa là backend đang có vấn đề
+    },
+    "extraction": {
+        "temperature": 0,
+        "num_predict": 256,
+        "num_ctx": 4096,
+        "stop": ["\n\n"],
+        "think": False,
+        "timeout": 30,
+    },
+    "reflection": {
+        "temperature": 0,
+        "num_predict": 160,
+        "num_ctx": 8192,
+        "stop": ["\n\n"],
+        "think": False,
+        "timeout": 30,
+    },
+    # Viết lại + phân loại intent trong một lời gọi structured JSON (REFLECTION_INTENT_SCHEMA):
+    # không có stop "\n\n" (JSON có thể xuống dòng giữa các key) và đủ num_predict cho cả object
+    "reflection_intent": {
+        "temperature": 0,
+        "num_predict": 384,
+        "num_ctx": 8192,
+        "think": False,
+        "timeout": 30,
+    },
+    # Gộp các lượt bị đẩy khỏi cửa sổ lịch sử vào rolling summary (num_predict giới hạn độ dài bản tóm tắt)
+    "summary": {
+        "temperature": 0,
+        "num_predict": 256,
+        "num_ctx": 4096,
+        "think": False,
+        "timeout": 30,
+    },
+    "answer": {
+        "temperature": 0.6,
+        "num_predict": 1024,
+        "num_ctx": 8192,
+        "think": None,  # None = để model mặc định (block <think> được ThinkTagFilter lọc khi stream)
+        "timeout": None,  # None = OLLAMA_TIMEOUT
+    },
+}
+
+
+class GenerationProfiles:
+    """
+    Bảng profile theo tên (classification, extraction, reflection, reflection_intent, summary, answer)
+
+    - resolve(name, options): (Ollama options, think) của profile, options truyền vào ghi đè profile
+    - timeout(name): read timeout (giây) của profile, None = mặc định của transport
+    - prompt_budget(name, reserve): số token prompt tối đa để prompt + output vẫn nằm trong num_ctx
+    - overrides: ghi đè từng field của profile có sẵn hoặc thêm profile mới (LLM_PROFILE_OVERRIDES)
+    """
+
+    def __init__(self, overrides: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.profiles = {name: dict(profile) for name, profile in DEFAULT_PROFILES.items()}
+        for name, profile in (overrides or {}).items():
+            self.profiles.setdefault(name, {}).update(profile)
+
+    def resolve(self, name: Optional[str], options: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Dict[str, Any]], Optional[bool]]:
+        """
+        Returns:
+            (options gửi cho Ollama hoặc None, think: True/False hoặc None = để model mặc định)
+        """
+        if name is None:
+            return options, None
+        if name not in self.profiles:
+            raise ValueError(f"Unknown generation profile: {name}")
+
+        profile = self.profiles[name]
+        merged = {key: value for key, value in profile.items() if key not in _PROFILE_FIELDS}
+        merged.update(options or {})
+        return merged or None, profile.get("think")
+
+    def timeout(self, name: Optional[str]) -> Optional[float]:
+        if name is None or name not in self.profiles:
+            return None
+        return self.profiles[name].get("timeout")
+
+    def prompt_budget(self, name: str, reserve: int = 0) -> Optional[int]:
+        """num_ctx - num_predict - reserve của profile, None nếu profile không khai báo num_ctx"""
+        profile = self.profiles.get(name, {})
+        num_ctx = profile.get("num_ctx")
+        if not num_ctx:
+            return None
+        return max(0, num_ctx - max(0, profile.get("num_predict") or 0) - reserve)
+
+    def get_profiles(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(profile) for name, profile in self.profiles.items()}
+
+
+def match_label(output: str, labels: Iterable[str], fallback: str) -> str:
+    """
+    Đưa output phân loại của LLM về đúng một nhãn hợp lệ
+
+    - Khớp chính xác (bỏ khoảng trắng, dấu nháy, dấu câu ở 2 đầu, không phân biệt hoa thường)
+    - Nếu không: nhãn hợp lệ đầu tiên xuất hiện trong output (nhãn dài được ưu tiên)
+    - Nếu không có nhãn nào: fallback (đếm vào llm_invalid_labels_total)
+    """
+    labels = list(labels)
+    cleaned = re.sub(r"<think>.*?</think>", "", output or "", flags=re.DOTALL | re.IGNORECASE)
+    cleaned = cleaned.strip().strip("`'\".,:; ").lower()
+
+    by_lower = {label.lower(): label for label in labels}
+    if cleaned in by_lower:
+        return by_lower[cleaned]
+
+    found = []
+    for label in sorted(labels, key=len, reverse=True):
+        position = re.search(rf"(?<![a-z_]){re.escape(label.lower())}(?![a-z_])", cleaned)
+        if position is not None:
+            found.append((position.start(), label))
+    if found:
+        return min(found)[1]
+
+    LLM_INVALID_LABELS.inc(fallback=fallback)
+    print(f"⚠️ Invalid classification output {output!r}, falling back to {fallback}")
+    return fallback
+
+
+_generation_profiles = None
+_generation_profiles_lock = threading.Lock()
+
+
+def get_generation_profiles() -> GenerationProfiles:
+    """Bảng profile dùng chung trong process (default + LLM_PROFILE_OVERRIDES)"""
+    global _generation_profiles
+    if _generation_profiles is None:
+        with _generation_profiles_lock:
+            if _generation_profiles is None:
+                from setting import get_settings
+
+                _generation_profiles = GenerationProfiles(get_settings().LLM_PROFILE_OVERRIDES)
+    return _generation_profiles
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Giữ các model phục vụ chat luôn nằm trong memory của Ollama: warm-up nền lúc khởi động,
+gia hạn keep_alive định kỳ, đối chiếu /api/ps và warm-up lại model bị unload trước khi request của user chạm tới
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from .ollama_llms import OllamaLLMs
+from .transport import get_transport
+from metrics import metrics
+
+LLM_MODEL_RESIDENT = metrics.gauge("llm_model_resident", "1 nếu model đang được Ollama giữ trong memory (theo /api/ps)")
+LLM_MODEL_REWARMS = metrics.counter(
+    "llm_model_rewarms_total",
+    "Số lần model bị Ollama unload và được warm-up lại bởi residency manager"
+)
+
+
+def _normalize(name: str) -> str:
+    """Ollama báo model không có tag là <name>:latest"""
+    return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+
+
+class ModelResidencyManager:
+    """
+    Mỗi lần check() (thread nền chạy mỗi interval giây), với từng (backend, model) cần phục vụ:
+    - model có trong /api/ps → gia hạn keep_alive
+    - model không có → warm-up lại (1 token) với keep_alive; lần đầu chính là warm-up lúc khởi động
+
+    on_change(ready, error) được gọi khi trạng thái "mọi model đều resident trên ít nhất một backend" thay đổi
+    (dùng để gate readiness).
+    """
+
+    def __init__(
+        self,
+        base_urls: Iterable[str],
+        models: Iterable[str],
+        keep_alive: int = 600,
+        interval: float = 30.0,
+        client_factory: Callable[[str, str], Any] = None,
+        on_change: Optional[Callable[[bool, Optional[str]], None]] = None
+    ):
+        self.base_urls = list(dict.fromkeys(url.rstrip("/") for url in base_urls))
+        self.models = list(dict.fromkeys(models))
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.client_factory = client_factory or (lambda url, model: OllamaLLMs(base_url=url, model_name=model))
+        self.on_change = on_change
+
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Any] = {}
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._ready: Optional[bool] = None
+        self._checks = 0
+        self._last_check_at = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _client(self, base_url: str, model: str):
+        key = f"{base_url}#{model}"
+        if key not in self._clients:
+            self._clients[key] = self.client_factory(base_url, model)
+        return self._clients[key]
+
+    def running_models(self, base_url: str) -> Optional[Set[str]]:
+        """Tên các model Ollama đang giữ trong memory (/api/ps), None nếu không hỏi được backend"""
+        try:
+            resp = get_transport(base_url).get("/api/ps", read_timeout=5)
+            if resp.status_code != 200:
+                return None
+            return {_normalize(m.get("name") or m.get("model", "")) for m in resp.json().get("models", [])}
+        except Exception as e:
+            print(f"⚠️ Cannot list running models on {base_url}: {e}")
+            return None
+
+    def check(self) -> Dict[str, Any]:
+        """Một lượt đối chiếu /api/ps + keep_alive / warm-up lại, trả về get_stats()"""
+        for base_url in self.base_urls:
+            running = self.running_models(base_url)
+            for model in self.models:
+                self._check_model(base_url, model, running)
+
+        with self._lock:
+            self._checks += 1
+            self._last_check_at = time.time()
+            missing = [model for model in self.models if not self.is_resident(model, locked=True)]
+            ready = not missing
+            changed = ready != self._ready
+            self._ready = ready
+        if changed and self.on_change is not None:
+            self.on_change(ready, None if ready else f"models not resident: {', '.join(missing)}")
+        return self.get_stats()
+
+    def _check_model(self, base_url: str, model: str, running: Optional[Set[str]]):
+        key = f"{base_url}#{model}"
+        client = self._client(base_url, model)
+        with self._lock:
+            state = self._state.setdefault(key, {
+                "backend": base_url, "model": model, "resident": False,
+                "warmups": 0, "rewarms": 0, "last_warm_at": None, "last_error": None,
+            })
+            was_resident = state["resident"]
+
+        if running is not None and _normalize(model) in running:
+            # Đang resident: chỉ gia hạn keep_alive (prompt rỗng, không sinh token)
+            ok, warmed = client.keep_alive(self.keep_alive), False
+        else:
+            if running is not None and hasattr(client, "mark_evicted"):
+                client.mark_evicted()
+            ok, warmed = client.warm_up(force=True, keep_alive=self.keep_alive), True
+            if warmed and ok and was_resident:
+                LLM_MODEL_REWARMS.inc(backend=base_url, model=model)
+                print(f"♻️ Model {model} was unloaded by {base_url}, warmed up again")
+
+        with self._lock:
+            state["resident"] = bool(ok)
+            state["checked_at"] = time.time()
+            if warmed and ok:
+                state["warmups"] += 1
+                state["rewarms"] += 1 if was_resident else 0
+                state["last_warm_at"] = state["checked_at"]
+            state["last_error"] = None if ok else ("warm-up failed" if warmed else "keep-alive failed")
+        LLM_MODEL_RESIDENT.set(1 if ok else 0, backend=base_url, model=model)
+
+    def is_resident(self, model: str, locked: bool = False) -> bool:
+        """Model đang resident trên ít nhất một backend"""
+        def resident() -> bool:
+            return any(self._state.get(f"{url}#{model}", {}).get("resident") for url in self.base_urls)
+        if locked:
+            return resident()
+        with self._lock:
+            return resident()
+
+    # ------------------------------------------------------------ thread nền
+
+    def start(self) -> threading.Thread:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="ollama-residency", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Model residency check failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": bool(self._ready),
+                "models": list(self.models),
+                "backends": list(self.base_urls),
+                "keep_alive": self.keep_alive,
+                "interval": self.interval,
+                "checks": self._checks,
+                "last_check_at": self._last_check_at,
+                "residency": {key: dict(state) for key, state in self._state.items()},
+            }
+
+
+_residency_manager: Optional[ModelResidencyManager] = None
+_residency_manager_lock = threading.Lock()
+
+
+def get_residency_manager(
+    ollama_url: Optional[str] = None,
+    models: Optional[List[str]] = None,
+    on_change: Optional[Callable[[bool, Optional[str]], None]] = None
+) -> ModelResidencyManager:
+    """
+    Residency manager dùng chung trong process: model theo từng bước pipeline (LLM_TASK_MODELS + models)
+    trên OLLAMA_BACKENDS + ollama_url
+    """
+    global _residency_manager
+    if _residency_manager is None:
+        with _residency_manager_lock:
+            if _residency_manager is None:
+                from setting import get_settings
+                from .llm_manager import default_ollama_url, llm_manager
+
+                settings = get_settings()
+                _residency_manager = ModelResidencyManager(
+                    base_urls=list(settings.OLLAMA_BACKENDS) + [ollama_url or default_ollama_url()],
+                    models=[*(models or []), *llm_manager.get_task_models().values()],
+                    keep_alive=settings.MODEL_KEEP_ALIVE,
+                    interval=settings.MODEL_RESIDENCY_INTERVAL_SECONDS,
+                    on_change=on_change
+                )
+    return _residency_manager
+
+
+def peek_residency_manager() -> Optional[ModelResidencyManager]:
+    """Residency manager nếu đã được khởi tạo (không tạo mới)"""
+    return _residency_manager
@@ -0,0 +1,112 @@
+"""
+Singleflight: gộp các lời gọi LLM giống hệt nhau đang chạy đồng thời thành một lời gọi tới Ollama
+"""
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from metrics import metrics
+
+LLM_COALESCED_CALLS = metrics.counter(
+    "llm_coalesced_calls_total",
+    "Số lời gọi LLM dùng lại kết quả của một lời gọi giống hệt đang chạy (không gửi thêm tới Ollama)"
+)
+LLM_COALESCED_SAVED_SECONDS = metrics.counter(
+    "llm_coalesced_saved_seconds_total",
+    "Tổng thời gian generation đã tiết kiệm nhờ gộp lời gọi (thời gian của lời gọi gốc x số lời gọi được gộp)"
+)
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "followers", "duration")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self.duration = 0.0
+
+
+class SingleFlight:
+    """
+    Trong lúc một lời gọi với key K đang chạy, các lời gọi khác cùng key chờ và nhận chung kết quả
+    (hoặc chung exception) thay vì chạy lại. Key hoàn thành xong thì bị xóa ngay: không cache kết quả.
+
+    Ví dụ:
+        flight = SingleFlight()
+        result = flight.do(key, lambda: llm.generate(...))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {"calls": 0, "executed": 0, "coalesced": 0, "saved_seconds": 0.0}
+
+    def do(self, key: str, fn: Callable[[], Any], endpoint: str = "") -> Any:
+        with self._lock:
+            self._stats["calls"] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        start_time = time.perf_counter()
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            flight.duration = time.perf_counter() - start_time
+            with self._lock:
+                # Xóa trước khi đánh thức follower: lời gọi mới đến sau sẽ chạy lại
+                self._flights.pop(key, None)
+                followers = flight.followers
+                self._stats["executed"] += 1
+                self._stats["coalesced"] += followers
+                self._stats["saved_seconds"] += followers * flight.duration
+            flight.done.set()
+            if followers:
+                LLM_COALESCED_CALLS.inc(followers, endpoint=endpoint)
+                LLM_COALESCED_SAVED_SECONDS.inc(followers * flight.duration, endpoint=endpoint)
+        return flight.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+        stats["coalesced_rate"] = round(stats["coalesced"] / stats["calls"], 4) if stats["calls"] else 0.0
+        return stats
+
+
+_singleflight = None
+_singleflight_lock = threading.Lock()
+
+
+def get_singleflight():
+    """SingleFlight dùng chung cho mọi OllamaLLMs trong process, None nếu LLM_SINGLEFLIGHT_ENABLED = False"""
+    global _singleflight
+    if _singleflight is None:
+        with _singleflight_lock:
+            if _singleflight is None:
+                from setting import get_settings
+
+                if not get_settings().LLM_SINGLEFLIGHT_ENABLED:
+                    return None
+                _singleflight = SingleFlight()
+    return _singleflight
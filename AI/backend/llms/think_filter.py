@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Lọc incremental các block <think>...</think> khỏi token stream của Qwen3
+"""
+
+
+class ThinkTagFilter:
+    """
+    Loại bỏ các block <think>...</think> ngay trong lúc stream.
+
+    Token được đưa vào qua feed(); phần text hiển thị được trả về ngay khi
+    chắc chắn không thuộc block think, nên token hữu ích đầu tiên tới client
+    sớm nhất có thể. Chỉ giữ lại trong buffer đoạn đuôi có thể là một tag
+    bị cắt ngang giữa 2 chunk.
+    """
+
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_think = False
+        self._emitted = False
+
+    @staticmethod
+    def _partial_tag_length(text: str, tag: str) -> int:
+        """Độ dài phần đuôi của text trùng với phần đầu của tag"""
+        lowered = text.lower()
+        for size in range(min(len(tag) - 1, len(text)), 0, -1):
+            if lowered.endswith(tag[:size]):
+                return size
+        return 0
+
+    def _visible(self, text: str) -> str:
+        # Bỏ khoảng trắng đầu câu trả lời (thường là "\n\n" sau </think>)
+        if not self._emitted:
+            text = text.lstrip()
+            if text:
+                self._emitted = True
+        return text
+
+    def feed(self, chunk: str) -> str:
+        """
+        Nhận một chunk mới và trả về phần text hiển thị được ngay.
+        """
+        if not chunk:
+            return ""
+
+        self._buffer += chunk
+        output = []
+
+        while self._buffer:
+            lowered = self._buffer.lower()
+            if self._in_think:
+                end = lowered.find(self.CLOSE_TAG)
+                if end == -1:
+                    # Chỉ giữ phần có thể là "</think>" bị cắt ngang
+                    keep = self._partial_tag_length(self._buffer, self.CLOSE_TAG)
+                    self._buffer = self._buffer[len(self._buffer) - keep:] if keep else ""
+                    break
+                self._buffer = self._buffer[end + len(self.CLOSE_TAG):]
+                self._in_think = False
+            else:
+                start = lowered.find(self.OPEN_TAG)
+                if start == -1:
+                    keep = self._partial_tag_length(self._buffer, self.OPEN_TAG)
+                    ready = self._buffer[:len(self._buffer) - keep]
+                    self._buffer = self._buffer[len(self._buffer) - keep:] if keep else ""
+                    output.append(self._visible(ready))
+                    break
+                output.append(self._visible(self._buffer[:start]))
+                self._buffer = self._buffer[start + len(self.OPEN_TAG):]
+                self._in_think = True
+
+        return "".join(output)
+
+    def flush(self) -> str:
+        """
+        Kết thúc stream: trả về phần còn lại trong buffer.
+        Block think chưa đóng bị bỏ đi.
+        """
+        remaining = "" if self._in_think else self._visible(self._buffer)
+        self._buffer = ""
+        self._in_think = False
+        return remaining
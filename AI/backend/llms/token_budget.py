@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Ước lượng số token của prompt và cắt lịch sử hội thoại cho vừa ngân sách token
+(ngân sách suy ra từ num_ctx của generation profile, xem GenerationProfiles.prompt_budget)
+
+Không có tokenizer của model ở phía client nên dùng ước lượng theo số ký tự; prompt_eval_count
+do Ollama báo (llm_prompt_eval_tokens_per_call) dùng để đối chiếu hệ số CHARS_PER_TOKEN.
+"""
+import math
+from typing import Dict, List, Optional
+
+# Tiếng Việt có dấu trung bình ~3 ký tự / token với tokenizer của Qwen (tiếng Anh ~4)
+CHARS_PER_TOKEN = 3.0
+# Token của chat template cho mỗi message (role, ký tự bắt đầu / kết thúc)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: Optional[str], chars_per_token: float = CHARS_PER_TOKEN) -> int:
+    if not text:
+        return 0
+    return int(math.ceil(len(text) / max(chars_per_token, 0.1)))
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]], chars_per_token: float = CHARS_PER_TOKEN) -> int:
+    return sum(estimate_tokens(m.get("content"), chars_per_token) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def fit_messages(
+    messages: List[Dict[str, str]],
+    budget: Optional[int],
+    pinned: int = 0,
+    chars_per_token: float = CHARS_PER_TOKEN
+) -> List[Dict[str, str]]:
+    """
+    Giữ `pinned` message đầu (system, tóm tắt) và các message gần nhất vừa budget token, bỏ các message cũ ở giữa
+
+    Message cuối (câu hỏi hiện tại của user) luôn được giữ kể cả khi một mình nó đã vượt budget.
+    budget None = không giới hạn.
+    """
+    if budget is None or not messages:
+        return list(messages)
+    head, tail = list(messages[:pinned]), list(messages[pinned:])
+    used = estimate_message_tokens(head, chars_per_token)
+
+    kept = []
+    for index, message in enumerate(reversed(tail)):
+        cost = estimate_message_tokens([message], chars_per_token)
+        if index > 0 and used + cost > budget:
+            break
+        kept.append(message)
+        used += cost
+    return head + kept[::-1]
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Thực thi tool calls của chat_with_tools: chạy song song trên thread pool có giới hạn, timeout theo từng tool,
+cache kết quả của tool thuần (theo arguments, có TTL) và cắt ngắn output lớn trước khi đưa lại vào context
+"""
+import contextvars
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from metrics import metrics
+
+LLM_TOOL_CALLS = metrics.counter("llm_tool_calls_total", "Số tool call theo tool và kết quả (ok, error, timeout, rejected, cached)")
+LLM_TOOL_SECONDS = metrics.histogram("llm_tool_seconds", "Thời gian chạy một tool call (không tính kết quả lấy từ cache)")
+
+
+class ToolResultCache:
+    """LRU theo số entry, mỗi entry hết hạn sau TTL của tool"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(name: str, arguments: Dict[str, Any]) -> str:
+        return f"{name}:{json.dumps(arguments or {}, sort_keys=True, ensure_ascii=False, default=str)}"
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return True, entry[1]
+
+    def put(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+def truncate_result(result: Any, max_chars: int) -> str:
+    """
+    Chuỗi đưa vào message role "tool", tối đa max_chars ký tự:
+    - list: giữ các phần tử đầu vừa đủ, ghi chú số phần tử bị bỏ
+    - còn lại: cắt chuỗi, ghi chú số ký tự bị bỏ
+    """
+    text = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+
+    if isinstance(result, list):
+        kept, size = [], 2
+        for item in result:
+            item_text = json.dumps(item, ensure_ascii=False, default=str)
+            if size + len(item_text) + 2 > max_chars:
+                break
+            kept.append(item)
+            size += len(item_text) + 2
+        if kept:
+            return (
+                json.dumps(kept, ensure_ascii=False, default=str)
+                + f"\n[truncated: showing {len(kept)} of {len(result)} items]"
+            )
+
+    return text[:max_chars] + f"\n[truncated: {len(text) - max_chars} more characters]"
+
+
+class ToolExecutor:
+    """
+    - run(calls): các tool call của cùng một bước chạy song song trên thread pool dùng chung (max_workers),
+      mỗi call chờ tối đa timeout giây; kết quả trả về đúng thứ tự calls
+    - cache_ttls: tool thuần (kết quả chỉ phụ thuộc arguments) → TTL giây; tool không có trong map không được cache
+    - max_result_chars: giới hạn độ dài output đưa lại vào context (giữ chi phí prefill của các bước sau có giới hạn)
+
+    Tool quá timeout vẫn chạy tiếp trong thread của pool (Python không dừng được thread) nhưng bước chat không chờ nó;
+    các call này được đếm là đang chiếm worker, khi chúng chiếm hết pool thì call mới bị từ chối ngay (status "rejected")
+    thay vì xếp hàng sau chúng rồi timeout.
+    """
+
+    def __init__(
+        self,
+        resolve: Callable[[str], Optional[Callable]],
+        max_workers: int = 4,
+        timeout: float = 10.0,
+        max_result_chars: int = 4000,
+        cache_ttls: Optional[Dict[str, float]] = None,
+        cache: Optional[ToolResultCache] = None
+    ):
+        self.resolve = resolve
+        self.timeout = timeout
+        self.max_result_chars = max_result_chars
+        self.cache_ttls = {name: ttl for name, ttl in (cache_ttls or {}).items() if ttl and ttl > 0}
+        self.cache = cache or ToolResultCache()
+        self.max_workers = max(1, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-tool")
+        # Future của các call đã quá timeout nhưng vẫn đang chạy (tự bỏ ra khi chạy xong)
+        self._abandoned = set()
+        self._abandoned_lock = threading.Lock()
+
+    def _abandon(self, future):
+        with self._abandoned_lock:
+            self._abandoned.add(future)
+        future.add_done_callback(self._release)
+
+    def _release(self, future):
+        with self._abandoned_lock:
+            self._abandoned.discard(future)
+
+    def free_workers(self) -> int:
+        """Số worker không bị chiếm bởi tool đã quá timeout"""
+        with self._abandoned_lock:
+            return max(0, self.max_workers - len(self._abandoned))
+
+    def execute(self, name: str, arguments: Optional[Dict[str, Any]]) -> Any:
+        """Chạy một tool (qua cache nếu là tool thuần); lỗi được trả về dạng {"error": ...} cho model"""
+        arguments = arguments or {}
+        ttl = self.cache_ttls.get(name)
+        key = ToolResultCache.make_key(name, arguments) if ttl else None
+        if key is not None:
+            hit, cached = self.cache.get(key)
+            if hit:
+                LLM_TOOL_CALLS.inc(tool=name, status="cached")
+                return cached
+
+        tool_func = self.resolve(name)
+        if not tool_func:
+            LLM_TOOL_CALLS.inc(tool=name, status="error")
+            return {"error": f"Tool '{name}' not found"}
+
+        started_at = time.perf_counter()
+        try:
+            result = tool_func(**arguments)
+        except Exception as e:
+            LLM_TOOL_CALLS.inc(tool=name, status="error")
+            return {"error": f"Error executing tool '{name}': {str(e)}"}
+        finally:
+            LLM_TOOL_SECONDS.observe(time.perf_counter() - started_at, tool=name)
+
+        LLM_TOOL_CALLS.inc(tool=name, status="ok")
+        if key is not None:
+            self.cache.put(key, result, ttl)
+        return result
+
+    def run(self, calls: Sequence[Tuple[str, Optional[Dict[str, Any]]]]) -> List[Any]:
+        """calls: [(tên tool, arguments)] → kết quả theo đúng thứ tự"""
+        free_workers = self.free_workers()
+        if not free_workers:
+            for name, _ in calls:
+                LLM_TOOL_CALLS.inc(tool=name, status="rejected")
+            print(f"⚠️ Tool pool busy: {self.max_workers} workers held by timed-out tool calls")
+            return [{"error": f"Tool '{name}' unavailable: all workers are busy with timed-out calls"} for name, _ in calls]
+
+        futures = [
+            # Giữ contextvars của request (tên prompt cho metrics, admission priority) trong thread của pool
+            self._pool.submit(contextvars.copy_context().run, self.execute, name, arguments)
+            for name, arguments in calls
+        ]
+
+        # Các call chạy cùng lúc nên chờ chung một deadline; nhiều call hơn số worker còn rảnh thì mỗi lượt được thêm timeout
+        waves = -(-len(calls) // free_workers)
+        deadline = time.monotonic() + self.timeout * waves
+        results = []
+        for (name, _), future in zip(calls, futures):
+            try:
+                results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                if not future.cancel():
+                    self._abandon(future)
+                LLM_TOOL_CALLS.inc(tool=name, status="timeout")
+                print(f"⚠️ Tool '{name}' timed out after {self.timeout:.1f}s")
+                results.append({"error": f"Tool '{name}' timed out after {self.timeout:.1f}s"})
+        return results
+
+    def format_result(self, result: Any) -> str:
+        return truncate_result(result, self.max_result_chars)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "timeout": self.timeout,
+            "max_workers": self.max_workers,
+            "free_workers": self.free_workers(),
+            "max_result_chars": self.max_result_chars,
+            "cached_tools": dict(self.cache_ttls),
+            "cache": self.cache.get_stats(),
+        }
+
+
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ToolExecutor:
+    """ToolExecutor dùng chung (thread pool + cache kết quả dùng chung cho mọi OllamaLLMs)"""
+    global _tool_executor
+    if _tool_executor is None:
+        with _tool_executor_lock:
+            if _tool_executor is None:
+                from setting import get_settings
+                from .tools import PURE_TOOL_TTLS, get_tool_by_name
+
+                settings = get_settings()
+                _tool_executor = ToolExecutor(
+                    resolve=get_tool_by_name,
+                    max_workers=settings.LLM_TOOL_MAX_WORKERS,
+                    timeout=settings.LLM_TOOL_TIMEOUT_SECONDS,
+                    max_result_chars=settings.LLM_TOOL_MAX_RESULT_CHARS,
+                    cache_ttls={**PURE_TOOL_TTLS, **settings.LLM_TOOL_CACHE_TTLS},
+                    cache=ToolResultCache(settings.LLM_TOOL_CACHE_MAX_ENTRIES)
+                )
+    return _tool_executor
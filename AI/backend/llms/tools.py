@@ -213,6 +213,13 @@ def intent_classification_ai(query: str) -> str:
     return intent_classification(query)
 
 
+# Tool thuần (kết quả chỉ phụ thuộc arguments) → TTL (giây) để cache kết quả trong chat_with_tools,
+# ghi đè bằng LLM_TOOL_CACHE_TTLS (0 = không cache)
+PURE_TOOL_TTLS = {
+    "search_job_info_from_mongo": 300.0,
+}
+
+
 # Tool registry - mapping tên tool -> function
 AVAILABLE_TOOLS = {
     # "add_two_numbers": add_two_numbers,
@@ -0,0 +1,298 @@
+"""
+HTTP transport dùng chung cho mọi lời gọi tới một Ollama backend:
+connection pool theo concurrency, timeout connect/read, retry có jitter khi lỗi kết nối và circuit breaker
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .admission import AdmissionRejected
+from metrics import metrics
+
+LLM_HTTP_RETRIES = metrics.counter("llm_http_retries_total", "Số lần thử lại request tới Ollama do lỗi kết nối")
+LLM_CIRCUIT_TRANSITIONS = metrics.counter(
+    "llm_circuit_transitions_total",
+    "Số lần circuit breaker của một backend chuyển trạng thái (closed / open / half_open)"
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(AdmissionRejected):
+    """
+    Circuit breaker của backend đang mở: request bị từ chối ngay (HTTP 503) thay vì chờ timeout.
+    Kế thừa AdmissionRejected để các route và OllamaBackendPool xử lý giống backend quá tải.
+    """
+
+    def __init__(self, retry_after: int, backend: str = ""):
+        super().__init__("circuit_open", retry_after, backend)
+
+
+class CircuitBreaker:
+    """
+    - closed: request đi qua bình thường, đếm lỗi kết nối / timeout liên tiếp
+    - open: sau failure_threshold lỗi liên tiếp, mọi request bị từ chối ngay trong reset_seconds
+    - half_open: hết reset_seconds, chỉ cho 1 request thử; thành công → closed, lỗi → open lại
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 15.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str):
+        # Gọi khi đang giữ lock
+        if state != self._state:
+            self._state = state
+            LLM_CIRCUIT_TRANSITIONS.inc(backend=self.name, state=state)
+            print(f"🔌 Circuit breaker {self.name}: {state}")
+
+    def _retry_after(self) -> int:
+        return max(1, int(self._opened_at + self.reset_seconds - time.monotonic() + 0.999))
+
+    def before_request(self):
+        """Raise CircuitOpen nếu breaker đang mở (hoặc đang có request thử ở half_open)"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._transition(HALF_OPEN)
+                self._probe_in_flight = False
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self._rejected += 1
+            raise CircuitOpen(self._retry_after(), self.name)
+
+    def check(self):
+        """Giống before_request nhưng không giữ lượt thử của half_open (kiểm tra sớm trước khi xử lý request)"""
+        if self.state == OPEN:
+            with self._lock:
+                self._rejected += 1
+                raise CircuitOpen(self._retry_after(), self.name)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def get_stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "retry_after": self._retry_after() if state == OPEN else 0,
+                "rejected": self._rejected,
+            }
+
+
+class OllamaTransport:
+    """
+    requests.Session riêng cho một backend
+
+    - pool_size: số connection giữ lại (≈ concurrency của admission controller + vài connection cho health check)
+    - timeout: (connect, read); read timeout lấy theo generation profile ở mỗi lời gọi
+    - retries: chỉ thử lại khi chưa kết nối được (ConnectionError / ConnectTimeout), backoff có jitter;
+      ReadTimeout và lỗi HTTP không được thử lại (Ollama có thể đang sinh dở)
+    - breaker: lỗi kết nối / timeout liên tiếp → fail fast bằng CircuitOpen
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = 8,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 120.0,
+        retries: int = 2,
+        backoff_seconds: float = 0.2,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = max(0, retries)
+        self.backoff_seconds = backoff_seconds
+        self.breaker = breaker or CircuitBreaker(self.base_url)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json", "Connection": "keep-alive"})
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._peak_active = 0
+        self._requests = 0
+        self._retries = 0
+        self._failures = {"connection": 0, "timeout": 0, "other": 0}
+
+    def timeout(self, read_timeout: Optional[float] = None) -> Tuple[float, float]:
+        return (self.connect_timeout, read_timeout or self.read_timeout)
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter: tránh mọi worker cùng thử lại một lúc khi backend vừa restart
+        return random.uniform(0, self.backoff_seconds * (2 ** attempt))
+
+    def _send(self, method: str, path: str, read_timeout: Optional[float], **kwargs) -> requests.Response:
+        self.breaker.before_request()
+        url = f"{self.base_url}{path}"
+        attempt = 0
+        while True:
+            try:
+                resp = getattr(self.session, method)(url, timeout=self.timeout(read_timeout), **kwargs)
+                break
+            except requests.exceptions.ReadTimeout:
+                self.record_failure("timeout")
+                raise
+            except requests.exceptions.ConnectionError:
+                if attempt >= self.retries:
+                    self.record_failure("connection")
+                    raise
+                self.record_retry()
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+            except requests.RequestException:
+                self.record_failure("other")
+                raise
+        self.breaker.record_success()
+        return resp
+
+    def record_failure(self, kind: str):
+        """kind: connection | timeout | other (AsyncOllamaLLMs cũng báo lỗi vào đây để dùng chung breaker)"""
+        with self._lock:
+            self._failures[kind] += 1
+        self.breaker.record_failure()
+
+    def record_retry(self):
+        with self._lock:
+            self._retries += 1
+        LLM_HTTP_RETRIES.inc(backend=self.base_url)
+
+    @contextmanager
+    def _track(self):
+        with self._lock:
+            self._active += 1
+            self._requests += 1
+            self._peak_active = max(self._peak_active, self._active)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def post(self, path: str, json: Dict[str, Any], read_timeout: Optional[float] = None) -> requests.Response:
+        """POST (không stream), response đã đọc xong khi trả về"""
+        with self._track():
+            return self._send("post", path, read_timeout, json=json)
+
+    def get(self, path: str, read_timeout: Optional[float] = None) -> requests.Response:
+        with self._track():
+            return self._send("get", path, read_timeout)
+
+    @contextmanager
+    def stream(self, path: str, json: Dict[str, Any], read_timeout: Optional[float] = None) -> Iterator[requests.Response]:
+        """POST stream=True, connection được tính là đang dùng cho tới khi đóng response"""
+        with self._track():
+            resp = self._send("post", path, read_timeout, json=json, stream=True)
+            try:
+                yield resp
+            except requests.exceptions.ConnectionError:
+                # Ollama ngừng gửi chunk quá read timeout giữa chừng stream
+                self.record_failure("timeout")
+                raise
+            finally:
+                resp.close()
+
+    def probe(self, path: str = "/api/version", timeout: float = 2.0) -> bool:
+        """Health check qua cùng connection pool, không đi qua breaker (để biết backend đã hồi phục)"""
+        try:
+            return self.session.get(f"{self.base_url}{path}", timeout=timeout).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "pool_size": self.pool_size,
+                "active": self._active,
+                "peak_active": self._peak_active,
+                "utilization": round(self._active / self.pool_size, 3) if self.pool_size else 0.0,
+                "requests": self._requests,
+                "retries": self._retries,
+                "failures": dict(self._failures),
+                "timeout": {"connect": self.connect_timeout, "read": self.read_timeout},
+            }
+        stats["breaker"] = self.breaker.get_stats()
+        return stats
+
+    def close(self):
+        self.session.close()
+
+
+_transports: Dict[str, OllamaTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(base_url: str) -> OllamaTransport:
+    """Transport dùng chung cho một backend (mọi OllamaLLMs / AsyncOllamaLLMs cùng base_url)"""
+    base_url = base_url.rstrip("/")
+    if base_url not in _transports:
+        with _transports_lock:
+            if base_url not in _transports:
+                from setting import get_settings
+
+                settings = get_settings()
+                concurrency = settings.LLM_BACKEND_MAX_CONCURRENCY.get(base_url, settings.LLM_MAX_CONCURRENCY)
+                _transports[base_url] = OllamaTransport(
+                    base_url,
+                    # Slot của admission controller + keep_alive / warm-up / health check
+                    pool_size=max(1, concurrency) + 2,
+                    connect_timeout=settings.OLLAMA_CONNECT_TIMEOUT,
+                    read_timeout=settings.OLLAMA_TIMEOUT,
+                    retries=settings.OLLAMA_CONNECT_RETRIES,
+                    backoff_seconds=settings.OLLAMA_RETRY_BACKOFF_SECONDS,
+                    breaker=CircuitBreaker(
+                        base_url,
+                        failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+                        reset_seconds=settings.LLM_BREAKER_RESET_SECONDS
+                    )
+                )
+    return _transports[base_url]
+
+
+def get_transport_stats() -> Dict[str, Any]:
+    with _transports_lock:
+        transports = list(_transports.values())
+    return {transport.base_url: transport.get_stats() for transport in transports}
@@ -0,0 +1,275 @@
+"""
+Metrics registry (counter, gauge, histogram) cho pipeline chat, xuất ra /metrics theo Prometheus text format
+
+Không phụ thuộc prometheus_client: mỗi process giữ số liệu của riêng nó, Prometheus scrape từng worker.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Tên prompt của lời gọi LLM hiện tại (label "prompt" của các metric llm_*)
+_current_prompt = contextvars.ContextVar("llm_prompt_name", default="unlabeled")
+
+
+@contextmanager
+def llm_prompt(name: str):
+    """
+    Gắn tên prompt cho các lời gọi LLM trong block này
+
+    Ví dụ:
+        with llm_prompt("reflection"):
+            llm.generate_content(messages)
+    """
+    token = _current_prompt.set(name)
+    try:
+        yield
+    finally:
+        _current_prompt.reset(token)
+
+
+def current_prompt() -> str:
+    return _current_prompt.get()
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterable[Tuple[str, LabelKey, Optional[Tuple[str, str]], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_format_labels(key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, key, None, value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, key, None, value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [counts theo bucket (+Inf cuối), sum, count]
+        self._series: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Đo thời gian block (ghi lại cả khi block raise exception)"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def get(self, **labels) -> Dict[str, float]:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            if series is None:
+                return {"count": 0, "sum": 0.0}
+            return {"count": series[2], "sum": series[1]}
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1], series[2])) for key, series in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key, ("le", _format_value(bound)), cumulative
+            yield f"{self.name}_sum", key, None, total
+            yield f"{self.name}_count", key, None, count
+
+
+class MetricsRegistry:
+    """
+    Registry các metric của process
+
+    - counter/gauge/histogram(name, ...) trả về metric đã có nếu cùng tên (idempotent)
+    - add_collector(fn): fn được gọi trước mỗi lần render để cập nhật các gauge lấy từ nơi khác
+      (admission queue, session store, embedding cache, ...)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _get_or_create(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def add_collector(self, collector: Callable[[], None]):
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Toàn bộ metric theo Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# --------------------------------------------------------------- pipeline chat
+CHAT_STAGE_SECONDS = metrics.histogram(
+    "chatbot_stage_seconds",
+    "Thời gian từng bước của ChatbotOllama.chat (router, reflection, classification, feature_extraction, generation, total)"
+)
+CHAT_FIRST_TOKEN_SECONDS = metrics.histogram(
+    "chatbot_first_token_seconds",
+    "Thời gian từ lúc nhận tin nhắn tới chunk đầu tiên của câu trả lời stream"
+)
+CHAT_PROMPT_TOKENS = metrics.histogram(
+    "chatbot_prompt_tokens_per_turn",
+    "Số token (ước lượng) của prompt được lắp trong mỗi lượt chat theo phần (history, reflection, answer)",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+)
+CHAT_HISTORY_SUMMARIES = metrics.counter(
+    "chatbot_history_summaries_total",
+    "Số lần gộp các lượt bị đẩy khỏi cửa sổ lịch sử vào rolling summary theo kết quả"
+)
+
+# ------------------------------------------------------------------- LLM calls
+LLM_REQUESTS = metrics.counter("llm_requests_total", "Số lời gọi Ollama theo prompt, model, endpoint và kết quả")
+LLM_REQUEST_SECONDS = metrics.histogram("llm_request_seconds", "Thời gian gọi Ollama nhìn từ client (gồm cả chờ admission)")
+LLM_QUEUE_WAIT_SECONDS = metrics.histogram("llm_queue_wait_seconds", "Thời gian chờ slot của admission controller")
+LLM_SERVER_QUEUE_SECONDS = metrics.histogram(
+    "llm_server_queue_seconds",
+    "Thời gian ngoài total_duration của Ollama (mạng + hàng đợi phía Ollama server)"
+)
+LLM_LOAD_SECONDS = metrics.histogram("llm_load_seconds", "load_duration do Ollama báo (load model vào memory)")
+LLM_PROMPT_EVAL_SECONDS = metrics.histogram("llm_prompt_eval_seconds", "prompt_eval_duration do Ollama báo (prefill)")
+LLM_EVAL_SECONDS = metrics.histogram("llm_eval_seconds", "eval_duration do Ollama báo (decode)")
+LLM_PROMPT_TOKENS = metrics.counter("llm_prompt_tokens_total", "prompt_eval_count do Ollama báo")
+LLM_EVAL_TOKENS = metrics.counter("llm_eval_tokens_total", "eval_count (số token sinh ra) do Ollama báo")
+LLM_PROMPT_EVAL_TOKENS_PER_CALL = metrics.histogram(
+    "llm_prompt_eval_tokens_per_call",
+    "Số token prompt Ollama thực sự phải prefill trong mỗi lời gọi (thấp khi prefix được lấy từ KV cache)",
+    buckets=(8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+)
+
+# ---------------------------------------------------------------- dependencies
+EMBEDDING_ENCODE_SECONDS = metrics.histogram("embedding_encode_seconds", "Thời gian encode embedding (gồm cache lookup)")
+ROUTER_GUIDE_SECONDS = metrics.histogram("router_guide_seconds", "Thời gian SemanticRouter.guide/guide_many")
+QDRANT_SEARCH_SECONDS = metrics.histogram("qdrant_search_seconds", "Thời gian search trên Qdrant")
+SUPABASE_RPC_SECONDS = metrics.histogram("supabase_rpc_seconds", "Thời gian gọi stored procedure Supabase")
+MONGO_FIND_SECONDS = metrics.histogram("mongo_find_seconds", "Thời gian find trên MongoDB")
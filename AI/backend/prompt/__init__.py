@@ -1,3 +1,3 @@
-from .promt_config import PromptConfig
+from .promt_config import PromptConfig, CHAT_INTENTS
 
-__all__ = ["PromptConfig"]
\ No newline at end of file
+__all__ = ["PromptConfig", "CHAT_INTENTS"]
\ No newline at end of file
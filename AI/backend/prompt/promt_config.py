@@ -1,10 +1,32 @@
+import hashlib
+import json
+import re
+from typing import Dict, List, Tuple
+
+# Placeholder {name} (không tính {{ }} đã escape)
+_PLACEHOLDER = re.compile(r"(?<!\{)\{([A-Za-z_]\w*)\}(?!\})")
+
+# Các intent hợp lệ mà chatbot có thể xử lý (dùng chung cho prompt, router và validate)
+CHAT_INTENTS = [
+    "intent_jd",
+    "intent_incomplete_recruitment_question",
+    "intent_candidate",
+    "intent_review_cv",
+    "intent_suggest_job",
+    "intent_company_info",
+    "intent_guide",
+    "intent_feedback",
+    "intent_chitchat",
+]
+
+
 class PromptConfig:
     def __init__(self):
         self.prompts = {
             "job_description_analysis": (
                 "Analyze the following job description and extract key skills, qualifications, "
-                "and responsibilities required for the role:\n\n{job_description}\n\n"
-                "Provide a summary in bullet points."
+                "and responsibilities required for the role. Provide a summary in bullet points.\n\n"
+                "{job_description}"
             ),
             "extract_features_question_about_job": (
                 """You are an information extraction engine. Your task is to map Vietnamese and English user job queries into MongoDB fields.
@@ -97,14 +119,16 @@ OUTPUT:
             
           "chitchat_to_recruitment": (
                 """
-            Người dùng đang nói chuyện phiếm về: "{user_input}"
+            Người dùng đang nói chuyện phiếm với bạn.
             Hãy trả lời một cách thân thiện và tự nhiên, sau đó khéo léo chuyển hướng cuộc trò chuyện về chủ đề tuyển dụng và tìm việc làm. 
 
             Ví dụ:
             - Nếu hỏi về thời tiết: "Thời tiết đẹp thật! Ngày đẹp trời như này thích hợp để cập nhật CV và tìm kiếm cơ hội việc làm mới đấy. Bạn có muốn tôi giúp tìm việc làm phù hợp không?"
             - Nếu hỏi về bản thân bot: "Cảm ơn bạn quan tâm! Tôi là trợ lý tuyển dụng, chuyên giúp mọi người tìm kiếm cơ hội nghề nghiệp. Bạn đang tìm kiếm công việc nào?"
 
-            Hãy trả lời ngắn gọn, thân thiện và chuyển hướng một cách tự nhiên."""
+            Hãy trả lời ngắn gọn, thân thiện và chuyển hướng một cách tự nhiên.
+            Người dùng đang nói chuyện phiếm về: "{user_input}"
+            """
             ),
           
           "classification_recruitment_intent": (
@@ -225,6 +249,77 @@ CHỈ TRẢ VỀ duy nhất 1 trong các key intent ở trên.
 Người dùng: "{user_input}"
 Trả lời:
 """
+),
+          "reflection_and_classification_chat_intent": (
+  """
+Bạn là bộ hiểu câu hỏi cho chatbot tuyển dụng. Bạn nhận được lịch sử hội thoại giữa người dùng (user) và trợ lý (assistant).
+
+🎯 Nhiệm vụ (làm CẢ HAI trong một lần):
+1. query: Viết lại YÊU CẦU hoặc CÂU HỎI cuối cùng của NGƯỜI DÙNG thành MỘT CÂU HOÀN CHỈNH và ĐỘC LẬP bằng tiếng Việt.
+   - KẾT HỢP thông tin từ lịch sử để câu có thể hiểu được mà KHÔNG cần xem lại lịch sử.
+   - NGẮN GỌN, TỰ NHIÊN và GIỮ NGUYÊN Ý ĐỊNH của người dùng.
+2. intent: Phân loại câu ở bước 1 vào CHÍNH XÁC 1 intent:
+- intent_jd: TÌM KIẾM CÔNG VIỆC với ÍT NHẤT MỘT thông tin CỤ THỂ (vị trí, kỹ năng, địa điểm, loại công việc rõ ràng).
+- intent_incomplete_recruitment_question: LIÊN QUAN tuyển dụng nhưng QUÁ CHUNG CHUNG, THIẾU thông tin cụ thể.
+- intent_candidate: Tìm ỨNG VIÊN với tiêu chí cụ thể.
+- intent_review_cv: Yêu cầu đánh giá / nhận xét CV.
+- intent_suggest_job: Nhờ gợi ý công việc dựa trên CV hoặc hồ sơ cá nhân.
+- intent_company_info: Hỏi thông tin về một công ty cụ thể.
+- intent_guide: Hỏi cách dùng website / thao tác hệ thống.
+- intent_feedback: Góp ý / phàn nàn / phản hồi trải nghiệm.
+- intent_chitchat: Chào hỏi / xã giao / nội dung ngoài tuyển dụng.
+
+QUY TẮC:
+- Cụm mơ hồ như "ở đây", "việc làm", "IT", "có job nào không" KHÔNG tính là cụ thể → intent_incomplete_recruitment_question.
+- Ưu tiên phân loại incomplete trước khi xét intent_jd.
+
+💡 Ví dụ:
+Lịch sử hội thoại:
+- User: "Tìm việc ở đây"
+- Assistant: "Bạn muốn tìm việc gì?"
+- User: "Hà Nội"
+➡️ {{"query": "Tôi muốn tìm công việc ở Hà Nội", "intent": "intent_jd"}}
+
+CHỈ TRẢ VỀ JSON với đúng 2 key "query" và "intent".
+
+Lịch sử hội thoại:
+{history}
+"""
+),
+          "reflection": (
+"""Bạn nhận được toàn bộ lịch sử hội thoại giữa người dùng (user) và trợ lý (assistant).  
+
+🎯 Nhiệm vụ:
+- Viết lại YÊU CẦU hoặc CÂU HỎI cuối cùng của NGƯỜI DÙNG thành MỘT CÂU HOÀN CHỈNH và ĐỘC LẬP bằng tiếng Việt.  
+- Phải KẾT HỢP các thông tin từ lịch sử để câu hỏi/đề nghị có thể hiểu được mà KHÔNG cần xem lại lịch sử.  
+- Câu viết phải NGẮN GỌN, TỰ NHIÊN và GIỮ NGUYÊN Ý ĐỊNH của người dùng.
+
+💡 Ví dụ:
+Lịch sử hội thoại:
+- User: "Tìm việc ở đây"
+- Assistant: "Bạn muốn tìm việc gì?"
+- User: "Hà Nội"
+
+➡️ Kết quả mong đợi: "Tôi muốn tìm công việc ở Hà Nội"
+*** Lưu ý: Ví dụ chỉ mang tính minh họa
+{historyString}"""
+),
+          "conversation_summary": (
+"""Bạn tóm tắt hội thoại giữa người dùng (user) và chatbot tuyển dụng (assistant).
+
+🎯 Nhiệm vụ:
+- Cập nhật BẢN TÓM TẮT HIỆN TẠI bằng các LƯỢT HỘI THOẠI MỚI, trả về MỘT bản tóm tắt duy nhất bằng tiếng Việt.
+- GIỮ LẠI các thông tin người dùng đã cung cấp: vị trí, kỹ năng, địa điểm, kinh nghiệm, mức lương, công ty, CV, yêu cầu còn dang dở.
+- Thông tin mới mâu thuẫn với tóm tắt cũ thì dùng thông tin mới.
+- Bỏ lời chào hỏi, câu xã giao và nội dung lặp lại. Tối đa 8 gạch đầu dòng ngắn.
+
+CHỈ TRẢ VỀ bản tóm tắt, không giải thích thêm.
+
+Bản tóm tắt hiện tại:
+{summary}
+
+Các lượt hội thoại mới:
+{new_turns}"""
 ),
           "intent_chitchat": (
             """
@@ -244,6 +339,40 @@ Trả lời:
 
         }
 
+    @classmethod
+    def templates_version(cls) -> str:
+        """Hash của toàn bộ prompt template (đổi template → cache kết quả LLM cũ bị vô hiệu)"""
+        prompts = cls().prompts
+        payload = json.dumps(prompts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def split_template(template: str) -> Tuple[str, str]:
+        """
+        Tách template thành (phần hướng dẫn cố định, phần chứa input):
+        cắt ở đầu dòng chứa placeholder đầu tiên
+        """
+        match = _PLACEHOLDER.search(template)
+        if match is None:
+            return template, ""
+        line_start = template.rfind("\n", 0, match.start()) + 1
+        return template[:line_start], template[line_start:]
+
+    def get_messages(self, prompt_name: str, **kwargs) -> List[Dict[str, str]]:
+        """
+        Prompt dạng messages cho /api/chat: phần hướng dẫn cố định là system message (giống hệt nhau
+        giữa các lần gọi → Ollama dùng lại KV cache của prefix), chỉ phần input của user thay đổi.
+        Example: get_messages("classification_chat_intent", user_input="Tìm việc ở Hà Nội")
+        """
+        template = self.prompts.get(prompt_name, "Prompt not found.")
+        instructions, user_part = self.split_template(template)
+        messages = []
+        if instructions.strip():
+            messages.append({"role": "system", "content": instructions.format().strip()})
+        if user_part.strip():
+            messages.append({"role": "user", "content": user_part.format(**kwargs).strip()})
+        return messages
+
     def get_prompt(self, prompt_name: str, **kwargs) -> str:
         """
         Return the prompt text. If kwargs are provided, format placeholders.
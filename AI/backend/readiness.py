@@ -0,0 +1,163 @@
+"""
+Trạng thái sẵn sàng (readiness) và thời gian từng pha khởi động của process
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional
+
+# Mốc bắt đầu process (module này được import sớm bởi Flask app và MCP/startup.py)
+PROCESS_STARTED_AT = time.perf_counter()
+
+
+class ReadinessTracker:
+    """
+    Theo dõi:
+    - thời gian các pha khởi động: import, settings, embedding_load, router_build, ollama_warmup
+    - trạng thái từng thành phần: pending | loading | ready | failed
+
+    Process được coi là ready khi mọi thành phần bắt buộc đã ready.
+    """
+
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self, required: Iterable[str] = ()):
+        self.required = list(required)
+        self._lock = threading.Lock()
+        self._phases: Dict[str, float] = {}
+        self._components: Dict[str, Dict[str, Any]] = {
+            name: {"status": self.PENDING} for name in self.required
+        }
+
+    def record_phase(self, name: str, seconds: float):
+        with self._lock:
+            self._phases[name] = round(seconds, 4)
+
+    @contextmanager
+    def phase(self, name: str, component: Optional[str] = None):
+        """
+        Đo thời gian một pha khởi động; nếu có component thì cập nhật trạng thái của nó
+
+        Ví dụ:
+            with readiness.phase("embedding_load", component="embedding"):
+                model_manager.get_embedding_model()
+        """
+        if component:
+            self.set_status(component, self.LOADING)
+        start_time = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record_phase(name, time.perf_counter() - start_time)
+            if component:
+                self.set_status(component, self.FAILED, error=str(e))
+            raise
+        self.record_phase(name, time.perf_counter() - start_time)
+        if component:
+            self.set_status(component, self.READY)
+
+    def set_status(self, component: str, status: str, error: str = None):
+        with self._lock:
+            entry = {"status": status, "updated_at": time.time()}
+            if error:
+                entry["error"] = error
+            self._components[component] = entry
+
+    def require(self, *components: str):
+        """Đánh dấu các thành phần bắt buộc phải ready"""
+        with self._lock:
+            for component in components:
+                if component not in self.required:
+                    self.required.append(component)
+                self._components.setdefault(component, {"status": self.PENDING})
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(
+                self._components.get(name, {}).get("status") == self.READY
+                for name in self.required
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Trạng thái hiện tại để trả về qua /health"""
+        ready = self.is_ready()
+        with self._lock:
+            return {
+                "ready": ready,
+                "required": list(self.required),
+                "components": {name: dict(entry) for name, entry in self._components.items()},
+                "startup_phases": dict(self._phases),
+                "uptime_seconds": round(time.perf_counter() - PROCESS_STARTED_AT, 2),
+            }
+
+    def report(self) -> str:
+        """Bảng thời gian các pha khởi động (để in ra log)"""
+        with self._lock:
+            phases = dict(self._phases)
+        lines = ["⏱️ Startup phases:"]
+        for name, seconds in phases.items():
+            lines.append(f"   {name:<16} {seconds * 1000:>10.1f} ms")
+        lines.append(f"   {'total':<16} {sum(phases.values()) * 1000:>10.1f} ms")
+        return "\n".join(lines)
+
+
+readiness = ReadinessTracker()
+
+
+def _on_residency_change(ready: bool, error: Optional[str] = None):
+    readiness.set_status("ollama", ReadinessTracker.READY if ready else ReadinessTracker.FAILED, error=error)
+
+
+def warm_up(ollama_url: Optional[str] = None, model_name: Optional[str] = None, include_ollama: bool = True) -> Dict[str, Any]:
+    """
+    Load trước các tài nguyên nặng (embedding, routers, Ollama model) và ghi lại thời gian từng pha.
+    Mỗi pha lỗi không chặn các pha sau; trạng thái lỗi được phản ánh trong readiness.
+
+    Args:
+        ollama_url: URL Ollama server
+        model_name: model cần warm-up
+        include_ollama: False để bỏ qua bước warm-up Ollama
+
+    Returns:
+        dict: readiness.snapshot()
+    """
+    from setting import get_settings
+
+    with readiness.phase("settings"):
+        settings = get_settings()
+
+    try:
+        from tool.model_manager import model_manager
+
+        with readiness.phase("embedding_load", component="embedding"):
+            model_manager.get_embedding_model(pinned=True)
+        with readiness.phase("router_build", component="router"):
+            model_manager.get_semantic_router()
+            model_manager.get_intent_router()
+    except Exception as e:
+        print(f"⚠️ Embedding/router warm-up failed: {e}")
+
+    if include_ollama and ollama_url and model_name:
+        manager = None
+        try:
+            from llms.residency import get_residency_manager
+
+            # model_name + các model theo bước pipeline (LLM_TASK_MODELS) trên mọi backend;
+            # "ollama" chỉ ready khi mọi model phục vụ chat đều đang nằm trong memory của Ollama
+            manager = get_residency_manager(ollama_url, [model_name], on_change=_on_residency_change)
+            with readiness.phase("ollama_warmup", component="ollama"):
+                stats = manager.check()
+                if not stats["ready"]:
+                    raise RuntimeError(f"Ollama models not resident: {stats['residency']}")
+        except Exception as e:
+            print(f"⚠️ Ollama warm-up failed: {e}")
+        finally:
+            # Gia hạn keep_alive / warm-up lại model bị unload trong nền (kể cả khi lần đầu thất bại)
+            if manager is not None and settings.MODEL_RESIDENCY_ENABLED:
+                manager.start()
+
+    print(readiness.report())
+    return readiness.snapshot()
@@ -1,3 +1,5 @@
+from functools import lru_cache
+from typing import Any, Dict, List
 from loguru import logger
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -29,9 +31,103 @@ class Settings(BaseSettings):
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_TIMEOUT: int = 120
     MODEL_KEEP_ALIVE: int = 600  # Giữ model trong 10 phút
+    # Residency manager: đối chiếu /api/ps, gia hạn keep_alive và warm-up lại model bị unload mỗi N giây
+    MODEL_RESIDENCY_ENABLED: bool = True
+    MODEL_RESIDENCY_INTERVAL_SECONDS: float = 30.0
     ENABLE_MODEL_PRELOAD: bool = True
     BATCH_SIZE: int = 32  # Batch size cho embedding
+    EMBEDDING_MICRO_BATCHING: bool = True  # Gom các lời gọi encode đồng thời thành 1 batch
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0  # Thời gian tối đa chờ gom batch
+    # Cache embedding theo (model, text): LRU trong process + vector store mmap trên đĩa ("" để tắt tầng đĩa)
+    EMBEDDING_CACHE_DIR: str = ".cache/embeddings"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    # Giới hạn bộ nhớ của model registry (MB), vượt thì evict model ít dùng nhất; 0 = không giới hạn
+    MODEL_REGISTRY_MAX_MEMORY_MB: int = 0
     MAX_WORKERS: int = 4  # Số threads cho parallel processing
+
+    # Cache lời gọi LLM tất định (temperature = 0 / có seed): LRU theo bytes + SQLite ("" để chỉ dùng bộ nhớ)
+    LLM_CALL_CACHE_ENABLED: bool = True
+    LLM_CALL_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    LLM_CALL_CACHE_DB_PATH: str = ".cache/llm_calls.sqlite3"
+    LLM_CALL_CACHE_MAX_DISK_ENTRIES: int = 50000
+    # Gộp các lời gọi LLM giống hệt nhau đang chạy đồng thời thành 1 lần generation
+    LLM_SINGLEFLIGHT_ENABLED: bool = True
+    # Ghi đè generation profile (num_predict, stop, num_ctx, temperature, think) theo tên,
+    # vd: {"answer": {"think": true, "num_predict": 2048}}
+    LLM_PROFILE_OVERRIDES: Dict[str, Dict[str, Any]] = {}
+    # Model theo bước pipeline (classification, reflection, extraction, answer); bước không có trong map dùng OLLAMA_MODEL,
+    # vd: {"classification": "<Qwen3-1.7B>", "reflection": "<Qwen3-1.7B>", "extraction": "<Qwen3-1.7B>", "answer": "<Qwen3-4B>"}
+    LLM_TASK_MODELS: Dict[str, str] = {}
+    # Tool calling (chat_with_tools): số tool chạy song song, timeout mỗi tool, độ dài tối đa output đưa lại vào context,
+    # TTL cache kết quả theo tool (ghi đè PURE_TOOL_TTLS trong llms/tools.py)
+    LLM_TOOL_MAX_WORKERS: int = 4
+    LLM_TOOL_TIMEOUT_SECONDS: float = 10.0
+    LLM_TOOL_MAX_RESULT_CHARS: int = 4000
+    LLM_TOOL_CACHE_TTLS: Dict[str, float] = {}
+    LLM_TOOL_CACHE_MAX_ENTRIES: int = 512
+
+    # Admission control trước Ollama: concurrency tối đa mỗi backend + hàng đợi có giới hạn
+    LLM_ADMISSION_ENABLED: bool = True
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_QUEUE_SIZE: int = 32
+    LLM_QUEUE_MAX_WAIT_SECONDS: float = 30.0
+
+    # HTTP transport tới Ollama: timeout kết nối (read timeout = OLLAMA_TIMEOUT hoặc theo generation profile),
+    # số lần thử lại khi lỗi kết nối (backoff có jitter), circuit breaker mở sau N lỗi liên tiếp
+    OLLAMA_CONNECT_TIMEOUT: float = 3.0
+    OLLAMA_CONNECT_RETRIES: int = 2
+    OLLAMA_RETRY_BACKOFF_SECONDS: float = 0.2
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 15.0
+
+    # Nhiều Ollama node cho cùng model: LLMManager cân bằng tải (least outstanding requests) giữa các backend,
+    # OLLAMA_URL được thêm vào pool nếu chưa có; để trống = chỉ dùng OLLAMA_URL
+    OLLAMA_BACKENDS: List[str] = []
+    LLM_BACKEND_MAX_CONCURRENCY: Dict[str, int] = {}  # Concurrency riêng theo backend (ghi đè LLM_MAX_CONCURRENCY)
+    LLM_BACKEND_EJECT_AFTER_ERRORS: int = 3  # Số lỗi liên tiếp trước khi tạm loại backend khỏi pool
+    LLM_BACKEND_EJECT_SECONDS: float = 30.0
+    LLM_BACKEND_HEALTH_INTERVAL_SECONDS: float = 10.0  # 0 = không health check nền
+
+    # Session store của Flask app (LRU + TTL, reaper chạy nền)
+    SESSION_MAX_COUNT: int = 1000
+    SESSION_MAX_HISTORY_BYTES: int = 64 * 1024 * 1024  # Tổng bytes lịch sử của mọi session
+    SESSION_TTL_SECONDS: int = 3600
+    SESSION_REAP_INTERVAL_SECONDS: int = 60
+    # Nơi lưu lịch sử hội thoại: "memory" (trong process) | "sqlite" (dùng chung giữa các worker, giữ qua restart)
+    CONVERSATION_BACKEND: str = "memory"
+    CONVERSATION_DB_PATH: str = ".cache/conversations.sqlite3"
+
+    # Chat pipeline settings
+    # True: gộp bước viết lại câu hỏi (reflection) và phân loại intent thành 1 lần gọi LLM
+    # False: giữ luồng cũ 2 lần gọi (để so sánh latency A/B)
+    COMBINED_REFLECTION_CLASSIFICATION: bool = True
+    # Lịch sử đưa vào prompt: HISTORY_KEEP_TURNS lượt gần nhất nguyên văn, các lượt cũ hơn gộp dần vào rolling summary
+    # (chạy nền mỗi khi có HISTORY_SUMMARY_BATCH_TURNS lượt mới ra khỏi cửa sổ); prompt luôn vừa
+    # num_ctx - num_predict - HISTORY_PROMPT_RESERVE_TOKENS của profile
+    HISTORY_KEEP_TURNS: int = 4
+    HISTORY_SUMMARY_ENABLED: bool = True
+    HISTORY_SUMMARY_BATCH_TURNS: int = 2
+    HISTORY_PROMPT_RESERVE_TOKENS: int = 256
+    HISTORY_CHARS_PER_TOKEN: float = 3.0  # Ước lượng token theo số ký tự (không có tokenizer phía client)
+
+    # Cascading intent classifier: SemanticRouter trả lời khi score >= threshold, còn lại mới gọi LLM
+    INTENT_ROUTER_ENABLED: bool = True
+    INTENT_ROUTER_THRESHOLD: float = 0.75
+    INTENT_ROUTER_THRESHOLDS: Dict[str, float] = {}  # Ngưỡng riêng theo intent, vd: {"intent_chitchat": 0.7}
+    INTENT_ROUTER_AGGREGATION: str = "topk"  # mean | max | topk | centroid
+    INTENT_ROUTER_TOP_K: int = 5
+    # Thư mục cache embedding của route samples (.npy mmap, dùng chung giữa các worker); "" để tắt
+    ROUTE_EMBEDDING_CACHE_DIR: str = ".cache/route_embeddings"
+
+    # Cache câu trả lời theo câu hỏi độc lập: khớp chính xác, rồi khớp theo cosine >= threshold
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD: float = 0.92
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2000
+    # TTL (giây) theo intent; chỉ các intent có trong đây được cache (intent cá nhân hóa không bao giờ nằm ở đây)
+    RESPONSE_CACHE_INTENT_TTLS: Dict[str, int] = {
+        "intent_chitchat": 86400,
+        "intent_incomplete_recruitment_question": 3600,
+    }
     
     
     @classmethod
@@ -45,4 +141,12 @@ class Settings(BaseSettings):
             return settings
         except Exception as e:
             logger.error(f"Failed to load settings: {e}")
-            raise
\ No newline at end of file
+            raise
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Settings dùng chung trong process (chỉ load một lần)
+    """
+    return Settings.load_settings()
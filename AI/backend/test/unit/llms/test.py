@@ -15,7 +15,7 @@ def test_generate_content_success(ollama_client):
     mock_response.status_code = 200
     mock_response.json.return_value = {"response": "Hello from Ollama"}
 
-    with patch.object(requests, "post", return_value=mock_response) as mock_post:
+    with patch.object(requests.Session, "post", return_value=mock_response) as mock_post:
         prompt = [{"role": "user", "content": "Say hello"}]
         output = ollama_client.generate_content(prompt)
 
@@ -32,7 +32,7 @@ def test_generate_content_failure(ollama_client):
     mock_response.status_code = 500
     mock_response.text = "Internal Server Error"
 
-    with patch.object(requests, "post", return_value=mock_response):
+    with patch.object(requests.Session, "post", return_value=mock_response):
         prompt = [{"role": "user", "content": "Say hello"}]
 
         with pytest.raises(ValueError) as excinfo:
@@ -48,7 +48,7 @@ def test_generate_content_empty_response(ollama_client):
     mock_response.status_code = 200
     mock_response.json.return_value = {}
 
-    with patch.object(requests, "post", return_value=mock_response):
+    with patch.object(requests.Session, "post", return_value=mock_response):
         prompt = [{"role": "user", "content": "Say hello"}]
         output = ollama_client.generate_content(prompt)
 
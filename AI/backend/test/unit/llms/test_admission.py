@@ -0,0 +1,82 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.admission import AdmissionController, AdmissionRejected
+
+
+def _hold_slot(controller, started, release_event):
+    with controller.slot():
+        started.set()
+        release_event.wait(5)
+
+
+def test_rejects_when_queue_full():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=0, max_wait_seconds=1)
+    started, release_event = threading.Event(), threading.Event()
+    worker = threading.Thread(target=_hold_slot, args=(controller, started, release_event))
+    worker.start()
+    started.wait(5)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire()
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after >= 1
+
+    with pytest.raises(AdmissionRejected):
+        controller.check()
+
+    release_event.set()
+    worker.join(5)
+    stats = controller.get_stats()
+    assert stats["in_flight"] == 0
+    assert stats["rejected"]["queue_full"] == 2
+
+
+def test_wait_timeout_returns_503():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4, max_wait_seconds=0.05)
+    controller.acquire()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire()
+    assert rejected.value.status_code == 503
+    assert controller.get_stats()["queue_depth"] == 0
+
+    controller.release()
+    assert controller.get_stats()["in_flight"] == 0
+
+
+def test_higher_priority_waiter_admitted_first():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4, max_wait_seconds=5)
+    controller.acquire()
+    order = []
+
+    def waiter(name, priority):
+        controller.acquire(priority)
+        order.append(name)
+        controller.release()
+
+    background = threading.Thread(target=waiter, args=("background", 10))
+    background.start()
+    while controller.get_stats()["queue_depth"] < 1:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=waiter, args=("interactive", 0))
+    interactive.start()
+    while controller.get_stats()["queue_depth"] < 2:
+        time.sleep(0.001)
+
+    controller.release()
+    background.join(5)
+    interactive.join(5)
+
+    assert order == ["interactive", "background"]
+    stats = controller.get_stats()
+    assert stats["admitted"] == 3
+    assert stats["wait_ms_buckets"]["+Inf"] == 3
+    assert stats["in_flight"] == 0
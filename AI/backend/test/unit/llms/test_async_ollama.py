@@ -0,0 +1,188 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.admission import AdmissionController
+from llms.async_ollama_llms import AsyncOllamaLLMs, get_async_client, get_async_ollama_client
+from llms.backend_pool import OllamaBackendPool
+from setting import get_settings
+
+
+def make_llm(handler) -> AsyncOllamaLLMs:
+    llm = AsyncOllamaLLMs(base_url="http://async-test:11434", model_name="async-test-model")
+    llm.sync_client.call_cache = None
+    llm.sync_client.admission = None
+    llm._http = httpx.AsyncClient(base_url=llm.base_url, transport=httpx.MockTransport(handler))
+    return llm
+
+
+def test_concurrent_generations_do_not_need_threads():
+    """Nhiều lời gọi chậm cùng chờ trên một event loop, các lời gọi giống hệt nhau chỉ gửi một request"""
+    calls = []
+
+    async def handler(request):
+        body = json.loads(request.content)
+        calls.append(body["messages"][-1]["content"])
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"message": {"content": f"re: {body['messages'][-1]['content']}"}})
+
+    async def run():
+        llm = make_llm(handler)
+        questions = [f"q{i % 50}" for i in range(100)]
+        answers = await asyncio.gather(*[
+            llm.generate_chat([{"role": "user", "content": question}]) for question in questions
+        ])
+        await llm.aclose()
+        return questions, answers
+
+    questions, answers = asyncio.run(run())
+    assert answers == [f"re: {question}" for question in questions]
+    assert len(calls) == 50
+
+
+def test_generate_chat_stream_yields_chunks():
+    lines = [
+        {"message": {"content": "Xin"}, "done": False},
+        {"message": {"content": " chao"}, "done": False},
+        {"message": {"content": ""}, "done": True, "prompt_eval_count": 4},
+    ]
+
+    def handler(request):
+        assert request.url.path == "/api/chat"
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines).encode())
+
+    async def run():
+        llm = make_llm(handler)
+        return [chunk async for chunk in llm.generate_chat_stream([{"role": "user", "content": "Hi"}])]
+
+    assert asyncio.run(run()) == ["Xin", " chao"]
+
+
+def test_async_admission_waits_on_event_loop():
+    controller = AdmissionController("async-test", max_concurrency=1, max_queue=10, max_wait_seconds=1)
+    order = []
+
+    async def worker(name):
+        async with controller.slot_async():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*[worker(i) for i in range(5)])
+
+    asyncio.run(run())
+    assert sorted(order) == list(range(5))
+    assert controller.get_stats()["in_flight"] == 0
+
+
+def test_read_timeout_follows_settings_and_profile():
+    timeouts = []
+
+    def handler(request):
+        timeouts.append(request.extensions["timeout"]["read"])
+        return httpx.Response(200, json={"message": {"content": "ok"}})
+
+    async def run():
+        llm = make_llm(handler)
+        await llm.generate_chat([{"role": "user", "content": "a"}])
+        await llm.generate_chat([{"role": "user", "content": "b"}], profile="classification")
+        await llm.aclose()
+
+    asyncio.run(run())
+    assert timeouts == [get_settings().OLLAMA_TIMEOUT, 15]
+
+
+def test_async_pool_routes_each_request_and_skips_failing_backend():
+    """Backend lỗi được thử lại trên backend khác rồi bị loại, giống pool đồng bộ"""
+    urls = ["http://apool-a:11434", "http://apool-b:11434"]
+    hits = []
+
+    def handler(request):
+        hits.append(request.url.host)
+        if request.url.host == "apool-a":
+            return httpx.Response(500, text="boom")
+        return httpx.Response(200, json={"message": {"content": "b"}})
+
+    pool = OllamaBackendPool("apool-model", urls, eject_after_errors=1, eject_seconds=60, health_interval=0)
+    for url in urls:
+        client = get_async_ollama_client(url, "apool-model")
+        client.sync_client.call_cache = None
+        client.sync_client.admission = None
+        client._http = httpx.AsyncClient(base_url=url, transport=httpx.MockTransport(handler))
+
+    async def run():
+        llm = get_async_client(pool)
+        return [await llm.generate_chat([{"role": "user", "content": f"q{i}"}]) for i in range(3)]
+
+    assert asyncio.run(run()) == ["b", "b", "b"]
+    assert hits.count("apool-a") == 1  # bị loại sau lỗi đầu tiên
+    stats = pool.get_stats()["backends"]
+    assert stats["http://apool-a:11434"]["ejected_for_seconds"] > 0
+    assert all(backend["outstanding"] == 0 for backend in stats.values())
+
+
+def test_achat_understanding_waits_on_async_client():
+    """achat: reflection + phân loại đi qua AsyncOllamaLLMs, không gọi client đồng bộ trong thread"""
+    from app.chatbot.ChatbotOllama import ChatbotOllama
+    from llms.ollama_llms import OllamaLLMs
+
+    profiles = []
+
+    async def fake_generate_chat(self, messages, format=None, options=None, profile=None):
+        profiles.append(profile)
+        if profile == "classification":
+            return "intent_guide"
+        return json.dumps({"query": "Làm sao đăng tin tuyển dụng?", "intent": None})
+
+    def sync_call(*args, **kwargs):
+        raise AssertionError("sync LLM call in async pipeline")
+
+    bot = ChatbotOllama(session_id="async-understand", combined_understanding=True)
+    bot.add_user_message("Chào bạn")
+    bot.add_assistant_message("Chào bạn, tôi giúp gì được?")
+    with patch.object(OllamaLLMs, "generate_chat", sync_call), \
+            patch.object(AsyncOllamaLLMs, "generate_chat", fake_generate_chat):
+        answer = asyncio.run(bot.achat("Đăng tin thế nào?"))
+
+    assert bot.last_intent == "intent_guide"
+    assert "hướng dẫn" in answer
+    assert profiles == ["reflection_intent", "classification"]
+
+
+def test_achat_extracts_features_async_and_only_on_cache_miss():
+    """intent_jd: trích xuất đặc trưng qua AsyncOllamaLLMs; response cache hit thì không lập kế hoạch trả lời"""
+    from app.chatbot.ChatbotOllama import ChatbotOllama
+    from llms.ollama_llms import OllamaLLMs
+    from tool.intent_classifier import CascadingIntentClassifier
+    from tool.response_cache import SemanticResponseCache
+
+    profiles = []
+
+    async def fake_generate_chat(self, messages, format=None, options=None, profile=None):
+        profiles.append(profile)
+        if profile == "extraction":
+            return json.dumps({"title": "Python developer", "location": "Hà Nội"})
+        return json.dumps({"query": "Tìm việc Python ở Hà Nội", "intent": "intent_jd"})
+
+    def sync_call(*args, **kwargs):
+        raise AssertionError("sync LLM call in async pipeline")
+
+    bot = ChatbotOllama(session_id="async-extract", combined_understanding=True)
+    with patch.object(OllamaLLMs, "generate_chat", sync_call), patch.object(OllamaLLMs, "chat", sync_call), \
+            patch.object(AsyncOllamaLLMs, "generate_chat", fake_generate_chat), \
+            patch.object(CascadingIntentClassifier, "route", return_value=None):
+        answer = asyncio.run(bot.achat("Tìm việc Python ở Hà Nội"))
+        assert "Python developer" in answer
+        assert profiles == ["reflection_intent", "extraction"]
+
+        profiles.clear()
+        with patch.object(SemanticResponseCache, "get", return_value="cached"):
+            assert asyncio.run(bot.achat("Tìm việc Python ở Hà Nội")) == "cached"
+        assert profiles == ["reflection_intent"]
@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.admission import AdmissionController, AdmissionRejected
+from llms.backend_pool import OllamaBackendPool
+
+
+def make_pool(responses, **kwargs) -> OllamaBackendPool:
+    """responses: url -> hàm xử lý generate_chat của backend đó"""
+    def factory(url, model):
+        client = MagicMock()
+        client.admission = AdmissionController(url, max_concurrency=2, max_queue=2)
+        client.generate_chat.side_effect = responses[url]
+        return client
+
+    return OllamaBackendPool("pool-model", list(responses), client_factory=factory, health_interval=0, **kwargs)
+
+
+def test_routes_to_least_loaded_backend():
+    pool = make_pool({"http://a:11434": lambda m: "a", "http://b:11434": lambda m: "b"})
+    busy = pool.backends[0].client.admission
+    busy.acquire()
+
+    assert {pool.generate_chat([]) for _ in range(3)} == {"b"}
+    busy.release()
+    assert {pool.generate_chat([]) for _ in range(4)} == {"a", "b"}
+    assert pool.get_stats()["recent_decisions"][-1]["reason"] == "least_outstanding"
+
+
+def test_failing_backend_is_retried_elsewhere_then_ejected():
+    def broken(messages):
+        raise ValueError("connection refused")
+
+    pool = make_pool({"http://a:11434": broken, "http://b:11434": lambda m: "b"}, eject_after_errors=2, eject_seconds=60)
+
+    assert [pool.generate_chat([]) for _ in range(6)] == ["b"] * 6
+    stats = pool.get_stats()["backends"]
+    assert stats["http://a:11434"]["available"] is False
+    assert stats["http://a:11434"]["errors"] == 2
+    assert stats["http://b:11434"]["requests"] == 6
+
+    # Hết thời gian bị loại: backend nhận traffic trở lại
+    pool.backends[0].ejected_until = 0
+    pool.backends[0].client.generate_chat.side_effect = lambda m: "a"
+    assert "a" in {pool.generate_chat([]) for _ in range(4)}
+    assert pool.get_stats()["backends"]["http://a:11434"]["consecutive_errors"] == 0
+
+
+def test_admission_rejection_moves_to_next_backend_and_all_full_raises():
+    def full(messages):
+        raise AdmissionRejected("queue_full", 1, "a")
+
+    pool = make_pool({"http://a:11434": full, "http://b:11434": lambda m: "b"})
+    assert pool.generate_chat([]) == "b"
+    assert pool.get_stats()["backends"]["http://a:11434"]["consecutive_errors"] == 0
+
+    pool.backends[1].client.generate_chat.side_effect = full
+    with pytest.raises(AdmissionRejected):
+        pool.generate_chat([])
@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.call_cache import DETERMINISTIC_OPTIONS, LLMCallCache
+from llms.ollama_llms import OllamaLLMs
+
+
+def test_only_deterministic_options_are_cacheable():
+    assert LLMCallCache.is_deterministic({"temperature": 0})
+    assert LLMCallCache.is_deterministic({"temperature": 0.7, "seed": 42})
+    assert not LLMCallCache.is_deterministic({"temperature": 0.7})
+    assert not LLMCallCache.is_deterministic(None)
+
+
+def test_key_depends_on_model_messages_and_options():
+    messages = [{"role": "user", "content": "Tìm việc Python"}]
+    key = LLMCallCache.make_key("qwen", "generate", messages, {"temperature": 0})
+    assert key == LLMCallCache.make_key("qwen", "generate", list(messages), {"temperature": 0})
+    assert key != LLMCallCache.make_key("llama", "generate", messages, {"temperature": 0})
+    assert key != LLMCallCache.make_key("qwen", "generate", messages, {"temperature": 0, "seed": 1})
+    assert key != LLMCallCache.make_key("qwen", "generate", [{"role": "user", "content": "Tìm việc Java"}], {"temperature": 0})
+
+
+def test_lru_is_bounded_by_bytes():
+    cache = LLMCallCache(max_bytes=200)
+    cache.put("a" * 64, "x" * 50)
+    cache.put("b" * 64, "y" * 50)
+    assert cache.get("a" * 64) is None
+    assert cache.get("b" * 64) == "y" * 50
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= 200
+
+
+def test_sqlite_tier_survives_restart_and_template_change_invalidates(tmp_path):
+    db_path = str(tmp_path / "llm_calls.sqlite3")
+    LLMCallCache(db_path=db_path, template_version="v1").put("key", "intent_jd")
+
+    reopened = LLMCallCache(db_path=db_path, template_version="v1")
+    assert reopened.get("key") == "intent_jd"
+    assert reopened.get_stats()["disk_hits"] == 1
+
+    assert LLMCallCache(db_path=db_path, template_version="v2").get("key") is None
+
+
+def test_ollama_generate_content_memoizes_deterministic_calls():
+    llm = OllamaLLMs(base_url="http://cache-test:11434", model_name="test-model")
+    llm.call_cache = LLMCallCache()
+    llm.admission = None
+
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"response": "intent_chitchat"}
+    messages = [{"role": "user", "content": "Chào bạn"}]
+
+    with patch("requests.Session.post", return_value=response) as post:
+        assert llm.generate_content(messages, options=DETERMINISTIC_OPTIONS) == "intent_chitchat"
+        assert llm.generate_content(messages, options=DETERMINISTIC_OPTIONS) == "intent_chitchat"
+        assert post.call_count == 1
+        assert post.call_args.kwargs["json"]["options"] == DETERMINISTIC_OPTIONS
+
+        llm.generate_content(messages)
+        llm.generate_content(messages)
+        assert post.call_count == 3
+
+    stats = llm.call_cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["skipped"] == 2
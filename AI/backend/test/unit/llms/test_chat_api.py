@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.ollama_llms import OllamaLLMs
+from metrics import llm_prompt
+from prompt.promt_config import PromptConfig
+
+
+def test_get_messages_keeps_instructions_as_stable_system_prefix():
+    """Phần hướng dẫn giống hệt nhau giữa các câu hỏi, chỉ user message thay đổi"""
+    config = PromptConfig()
+    first = config.get_messages("classification_chat_intent", user_input="Tìm việc Python ở Hà Nội")
+    second = config.get_messages("classification_chat_intent", user_input="Chào bạn")
+
+    assert [m["role"] for m in first] == ["system", "user"]
+    assert first[0] == second[0]
+    assert "Tìm việc Python ở Hà Nội" in first[1]["content"]
+    assert "Tìm việc Python ở Hà Nội" not in first[0]["content"]
+
+
+def test_split_template_ignores_escaped_braces():
+    instructions, user_part = PromptConfig.split_template('Trả về JSON {{"intent": "..."}}\nCâu hỏi: {user_input}\nTrả lời:')
+    assert instructions == 'Trả về JSON {{"intent": "..."}}\n'
+    assert user_part == "Câu hỏi: {user_input}\nTrả lời:"
+
+
+def test_generate_chat_posts_messages_to_chat_api_and_records_prefill():
+    llm = OllamaLLMs(base_url="http://chat-test:11434", model_name="chat-test-model")
+    llm.call_cache = None
+    llm.singleflight = None
+    llm.admission = None
+
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"message": {"role": "assistant", "content": "intent_jd"}, "prompt_eval_count": 12}
+    messages = [{"role": "system", "content": "Phân loại intent"}, {"role": "user", "content": "Tìm việc"}]
+
+    with patch("requests.Session.post", return_value=response) as post, llm_prompt("prefill_test"):
+        assert llm.generate_chat(messages, format="json") == "intent_jd"
+
+    assert post.call_args.args[0] == "http://chat-test:11434/api/chat"
+    payload = post.call_args.kwargs["json"]
+    assert payload["messages"] == messages
+    assert payload["format"] == "json"
+    assert "prompt" not in payload
+
+    stats = OllamaLLMs.get_prefill_stats()["prefill_test"]
+    assert stats["calls"] == 1
+    assert stats["last"] == 12
+
+
+def test_generate_chat_stream_yields_message_chunks():
+    llm = OllamaLLMs(base_url="http://chat-test:11434", model_name="chat-test-model")
+    llm.admission = None
+
+    response = MagicMock(status_code=200)
+    response.iter_lines.return_value = [
+        b'{"message": {"content": "Xin"}, "done": false}',
+        b'{"message": {"content": " chao"}, "done": false}',
+        b'{"message": {"content": ""}, "done": true, "prompt_eval_count": 3}',
+    ]
+
+    with patch("requests.Session.post", return_value=response) as post:
+        chunks = list(llm.generate_chat_stream([{"role": "user", "content": "Hi"}]))
+
+    assert chunks == ["Xin", " chao"]
+    assert post.call_args.args[0].endswith("/api/chat")
+    assert post.call_args.kwargs["json"]["stream"] is True
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.ollama_llms import OllamaLLMs
+from llms.profiles import GenerationProfiles, match_label
+from prompt.promt_config import CHAT_INTENTS
+
+
+def test_resolve_profile_merges_caller_options_and_splits_think():
+    profiles = GenerationProfiles({"classification": {"num_predict": 8}})
+
+    options, think = profiles.resolve("classification", {"seed": 7})
+    assert options["num_predict"] == 8
+    assert options["temperature"] == 0
+    assert options["seed"] == 7
+    assert "think" not in options
+    assert think is False
+
+    assert profiles.resolve(None, {"temperature": 0}) == ({"temperature": 0}, None)
+    with pytest.raises(ValueError):
+        profiles.resolve("unknown")
+
+
+@pytest.mark.parametrize("output, expected", [
+    ("intent_jd", "intent_jd"),
+    ('  "Intent_JD".\n', "intent_jd"),
+    ("<think>có thể là intent_chitchat</think>intent_review_cv", "intent_review_cv"),
+    ("Intent: intent_incomplete_recruitment_question", "intent_incomplete_recruitment_question"),
+    ("tìm việc", "intent_chitchat"),
+])
+def test_match_label_returns_allowed_label_or_fallback(output, expected):
+    assert match_label(output, CHAT_INTENTS, fallback="intent_chitchat") == expected
+
+
+def test_generate_chat_sends_profile_options_and_think():
+    llm = OllamaLLMs(base_url="http://profile-test:11434", model_name="profile-test-model")
+    llm.call_cache = None
+    llm.singleflight = None
+    llm.admission = None
+
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"message": {"content": "intent_jd"}}
+
+    with patch("requests.Session.post", return_value=response) as post:
+        llm.generate_chat([{"role": "user", "content": "Tìm việc Java"}], profile="classification")
+
+    payload = post.call_args.kwargs["json"]
+    assert payload["think"] is False
+    assert payload["options"]["num_predict"] == llm.profiles.profiles["classification"]["num_predict"]
+    assert payload["options"]["stop"]
@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.residency import ModelResidencyManager
+
+
+def make_manager(running, changes):
+    clients = {}
+
+    def factory(url, model):
+        client = MagicMock()
+        client.warm_up.return_value = True
+        client.keep_alive.return_value = True
+        clients[model] = client
+        return client
+
+    manager = ModelResidencyManager(
+        ["http://residency-test:11434"], ["small", "large:q4"], keep_alive=600, interval=0,
+        client_factory=factory, on_change=lambda ready, error: changes.append((ready, error))
+    )
+    manager.running_models = lambda base_url: running
+    return manager, clients
+
+
+def test_warms_missing_models_then_only_refreshes_keep_alive():
+    running, changes = set(), []
+    manager, clients = make_manager(running, changes)
+
+    assert manager.check()["ready"] is True
+    assert changes == [(True, None)]
+    clients["small"].warm_up.assert_called_once_with(force=True, keep_alive=600)
+
+    running.update({"small:latest", "large:q4"})
+    manager.check()
+    assert clients["small"].warm_up.call_count == 1
+    clients["large:q4"].keep_alive.assert_called_once_with(600)
+
+
+def test_evicted_model_is_rewarmed_and_failure_gates_readiness():
+    running, changes = {"small:latest", "large:q4"}, []
+    manager, clients = make_manager(running, changes)
+    manager.check()
+
+    # Ollama unload model lớn: lượt check sau warm-up lại trước khi có request
+    running.discard("large:q4")
+    manager.check()
+    clients["large:q4"].mark_evicted.assert_called_once()
+    key = "http://residency-test:11434#large:q4"
+    assert manager.get_stats()["residency"][key]["rewarms"] == 1
+
+    running.discard("small:latest")
+    clients["small"].warm_up.return_value = False
+    assert manager.check()["ready"] is False
+    assert changes[-1][0] is False and "small" in changes[-1][1]
+    assert manager.is_resident("large:q4") and not manager.is_resident("small")
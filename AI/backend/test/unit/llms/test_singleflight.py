@@ -0,0 +1,70 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.singleflight import SingleFlight
+
+
+def _run_concurrently(flight, key, fn, count):
+    results, errors = [], []
+    barrier = threading.Barrier(count)
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_concurrent_identical_calls_execute_once():
+    flight = SingleFlight()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.1)
+        return "intent_chitchat"
+
+    results, errors = _run_concurrently(flight, "same-key", generate, 5)
+
+    assert results == ["intent_chitchat"] * 5
+    assert not errors
+    assert len(calls) == 1
+    stats = flight.get_stats()
+    assert stats["executed"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["saved_seconds"] > 0
+    assert stats["in_flight"] == 0
+
+
+def test_followers_receive_leader_error_and_key_is_released():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.05)
+        raise ValueError("Ollama request failed")
+
+    results, errors = _run_concurrently(flight, "key", fail, 3)
+    assert not results
+    assert len(errors) == 3 and all(isinstance(error, ValueError) for error in errors)
+
+    # Lời gọi sau khi flight kết thúc chạy lại (không cache kết quả/lỗi)
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_different_keys_run_independently():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.get_stats()["coalesced"] == 0
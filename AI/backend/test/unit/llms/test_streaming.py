@@ -0,0 +1,49 @@
+import pytest
+import requests
+from unittest.mock import patch, MagicMock
+from llms.ollama_llms import OllamaLLMs
+from llms.think_filter import ThinkTagFilter
+
+
+def run_filter(chunks):
+    think_filter = ThinkTagFilter()
+    output = "".join(think_filter.feed(chunk) for chunk in chunks)
+    return output + think_filter.flush()
+
+
+def test_think_filter_removes_block_split_across_chunks():
+    """Tag <think> bị cắt ngang giữa nhiều chunk vẫn được loại bỏ"""
+    chunks = ["<thi", "nk>suy nghĩ ", "nội bộ</th", "ink>\n\nXin ", "chào!"]
+    assert run_filter(chunks) == "Xin chào!"
+
+
+def test_think_filter_passes_plain_text_immediately():
+    """Text không có tag được trả về ngay, không chờ hết stream"""
+    think_filter = ThinkTagFilter()
+    assert think_filter.feed("Xin chào") == "Xin chào"
+    assert think_filter.feed(" bạn <") == " bạn "
+    assert think_filter.feed("3") == "<3"
+
+
+def test_think_filter_drops_unterminated_block():
+    """Block think chưa đóng khi kết thúc stream bị bỏ đi"""
+    assert run_filter(["Trả lời. <think>chưa xong"]) == "Trả lời. "
+
+
+def test_generate_content_stream_yields_chunks():
+    """Stream trả về từng chunk theo thứ tự từ NDJSON của Ollama"""
+    client = OllamaLLMs(model_name="llama2", base_url="http://mockserver:11434")
+
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.iter_lines.return_value = [
+        b'{"response": "Xin", "done": false}',
+        b'{"response": " chao", "done": false}',
+        b'{"response": "", "done": true}',
+    ]
+
+    with patch.object(requests.Session, "post", return_value=mock_response) as mock_post:
+        chunks = list(client.generate_content_stream([{"role": "user", "content": "Hi"}]))
+
+    assert chunks == ["Xin", " chao"]
+    assert mock_post.call_args.kwargs["json"]["stream"] is True
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.benchmark import benchmark_classification, recommend
+from llms.llm_manager import llm_manager
+from setting import get_settings
+from tool.extract_feature_question_about_jd import ExtractFeatureQuestion
+
+TASK_MODELS = {"classification": "small-model", "extraction": "small-model", "answer": "large-model"}
+
+
+def test_task_models_fall_back_to_default_model(monkeypatch):
+    monkeypatch.setenv("OLLAMA_MODEL", "default-model")
+    with patch.object(get_settings(), "LLM_TASK_MODELS", TASK_MODELS):
+        assert llm_manager.get_task_models() == {
+            "classification": "small-model",
+            "reflection": "default-model",
+            "extraction": "small-model",
+            "answer": "large-model",
+        }
+        assert llm_manager.get_client_for_task("answer", base_url="http://tasks:11434").model_name == "large-model"
+
+
+def test_feature_extractor_honours_model_name(monkeypatch):
+    monkeypatch.setenv("OLLAMA_MODEL", "env-model")
+    assert ExtractFeatureQuestion(model_name="extract-model").llm.model_name == "extract-model"
+    with patch.object(get_settings(), "LLM_TASK_MODELS", TASK_MODELS):
+        assert ExtractFeatureQuestion().llm.model_name == "small-model"
+
+
+def test_benchmark_reports_accuracy_agreement_and_recommends_cheapest():
+    samples = [("intent_jd", "q1"), ("intent_candidate", "q2"), ("intent_review_cv", "q3")]
+    answers = {
+        "large": ["intent_jd", "intent_candidate", "intent_review_cv"],
+        "small": ["intent_jd", "intent_candidate", "intent_jd"],
+    }
+
+    def factory(base_url, model):
+        client = MagicMock()
+        client.generate_chat.side_effect = answers[model]
+        return client
+
+    result = benchmark_classification(["large", "small"], samples, base_url="http://bench:11434", client_factory=factory, warm_up=False)
+    assert result["models"]["large"]["accuracy"] == 1.0
+    assert result["models"]["small"]["agreement"] == round(2 / 3, 4)
+    assert result["recommended"] == "large"
+
+    report = {
+        "a": {"accuracy": 0.95, "latency_ms": {"p50": 300}},
+        "b": {"accuracy": 0.94, "latency_ms": {"p50": 120}},
+        "c": {"accuracy": 0.80, "latency_ms": {"p50": 50}},
+    }
+    assert recommend(report) == "b"
@@ -0,0 +1,86 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.tool_executor import ToolExecutor, truncate_result
+
+
+def test_tool_calls_run_concurrently_with_timeout():
+    barrier = threading.Barrier(3, timeout=2)
+
+    def slow_search(query: str):
+        barrier.wait()  # chỉ qua được khi 3 call chạy cùng lúc
+        return f"jobs for {query}"
+
+    def hang():
+        time.sleep(1)
+
+    tools = {"search": slow_search, "hang": hang}
+    executor = ToolExecutor(tools.get, max_workers=4, timeout=0.3)
+
+    started_at = time.perf_counter()
+    results = executor.run([("search", {"query": "a"}), ("search", {"query": "b"}), ("search", {"query": "c"}), ("hang", {})])
+    assert results[:3] == ["jobs for a", "jobs for b", "jobs for c"]
+    assert "timed out" in results[3]["error"]
+    assert time.perf_counter() - started_at < 0.9
+
+
+def test_pure_tool_results_are_cached_by_arguments_until_ttl():
+    calls = []
+
+    def search(collection: str, query: str):
+        calls.append(query)
+        return [{"title": query}]
+
+    executor = ToolExecutor({"search": search}.get, cache_ttls={"search": 60})
+    assert executor.execute("search", {"query": "python", "collection": "jobs"}) == [{"title": "python"}]
+    assert executor.execute("search", {"collection": "jobs", "query": "python"}) == [{"title": "python"}]
+    executor.execute("search", {"collection": "jobs", "query": "java"})
+    assert calls == ["python", "java"]
+    assert executor.get_stats()["cache"]["hits"] == 1
+
+    executor.cache._entries[next(iter(executor.cache._entries))] = (0, "expired")
+    executor.execute("search", {"collection": "jobs", "query": "python"})
+    assert calls == ["python", "java", "python"]
+
+
+def test_large_results_are_truncated_for_context():
+    jobs = [{"title": f"job {i}", "description": "x" * 80} for i in range(100)]
+    text = truncate_result(jobs, 500)
+    assert len(text) < 600
+    assert text.endswith("of 100 items]")
+    assert truncate_result("y" * 1000, 100).endswith("[truncated: 900 more characters]")
+    assert truncate_result({"ok": True}, 100) == '{"ok": true}'
+
+
+def test_timed_out_calls_holding_every_worker_reject_new_calls():
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append("slow")
+        release.wait(2)
+        return "late"
+
+    tools = {"slow": slow, "fast": lambda: "ok"}
+    executor = ToolExecutor(tools.get, max_workers=1, timeout=0.05)
+
+    assert "timed out" in executor.run([("slow", {})])[0]["error"]
+    assert executor.free_workers() == 0
+
+    # Pool bị chiếm bởi call đã quá timeout: từ chối ngay, không chờ thêm một timeout nữa
+    started_at = time.perf_counter()
+    result = executor.run([("fast", {})])
+    assert "busy" in result[0]["error"]
+    assert time.perf_counter() - started_at < 0.05
+    assert calls == ["slow"]
+
+    release.set()
+    for _ in range(100):
+        if executor.free_workers():
+            break
+        time.sleep(0.01)
+    assert executor.run([("fast", {})]) == ["ok"]
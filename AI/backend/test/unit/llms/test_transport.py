@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.transport import CircuitBreaker, CircuitOpen, OllamaTransport
+
+
+def make_transport(**kwargs) -> OllamaTransport:
+    kwargs.setdefault("breaker", CircuitBreaker("http://transport-test:11434", failure_threshold=2, reset_seconds=60))
+    return OllamaTransport("http://transport-test:11434", pool_size=4, backoff_seconds=0, **kwargs)
+
+
+def ok_response():
+    response = MagicMock()
+    response.status_code = 200
+    return response
+
+
+def test_connection_errors_are_retried_read_timeouts_are_not():
+    transport = make_transport(retries=2, connect_timeout=1.5)
+    with patch.object(requests.Session, "post", side_effect=[requests.ConnectionError("refused"), ok_response()]) as post:
+        assert transport.post("/api/chat", {"model": "m"}, read_timeout=15).status_code == 200
+    assert post.call_count == 2
+    assert post.call_args.kwargs["timeout"] == (1.5, 15)
+    assert transport.get_stats()["retries"] == 1
+
+    with patch.object(requests.Session, "post", side_effect=requests.exceptions.ReadTimeout("slow")) as post:
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            transport.post("/api/chat", {"model": "m"})
+    assert post.call_count == 1
+    assert transport.get_stats()["failures"]["timeout"] == 1
+
+
+def test_breaker_opens_fails_fast_and_recovers_after_probe():
+    transport = make_transport(retries=0)
+    with patch.object(requests.Session, "post", side_effect=requests.ConnectionError("refused")):
+        for _ in range(2):
+            with pytest.raises(requests.ConnectionError):
+                transport.post("/api/chat", {})
+
+    with patch.object(requests.Session, "post") as post:
+        with pytest.raises(CircuitOpen) as rejected:
+            transport.post("/api/chat", {})
+        assert post.call_count == 0
+    assert rejected.value.status_code == 503
+    assert rejected.value.retry_after > 0
+    assert transport.get_stats()["breaker"]["state"] == "open"
+
+    # Hết reset_seconds: chỉ một request thử được đi qua, thành công thì đóng breaker
+    transport.breaker._opened_at -= 60
+    with patch.object(requests.Session, "post", return_value=ok_response()):
+        transport.post("/api/chat", {})
+    assert transport.get_stats()["breaker"]["state"] == "closed"
+
+
+def test_stream_counts_connection_as_active_until_closed():
+    transport = make_transport()
+    response = ok_response()
+    with patch.object(requests.Session, "post", return_value=response) as post:
+        with transport.stream("/api/chat", {"stream": True}) as resp:
+            assert resp is response
+            assert transport.get_stats()["active"] == 1
+    assert post.call_args.kwargs["stream"] is True
+    response.close.assert_called_once()
+    stats = transport.get_stats()
+    assert stats["active"] == 0 and stats["peak_active"] == 1 and stats["utilization"] == 0.0
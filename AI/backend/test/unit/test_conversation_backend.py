@@ -0,0 +1,85 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parents[2]))
+
+from app.chatbot.conversation_backend import InMemoryConversationBackend, SQLiteConversationBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryConversationBackend()
+    return SQLiteConversationBackend(str(tmp_path / "conversations.sqlite3"))
+
+
+def test_append_and_read_history(backend):
+    backend.append("s1", "system", "Bạn là trợ lý tuyển dụng")
+    backend.append("s1", "user", "Tìm việc Python")
+    backend.append("s2", "user", "Xin chào")
+
+    assert backend.get_history("s1") == [
+        {"role": "system", "content": "Bạn là trợ lý tuyển dụng"},
+        {"role": "user", "content": "Tìm việc Python"},
+    ]
+    assert len(backend.get_history("s2")) == 1
+    assert backend.get_history("missing") == []
+
+
+def test_state_context_and_clear(backend):
+    backend.append("s1", "user", "hi")
+    backend.set_state("s1", "waiting_for_location")
+    backend.set_context("s1", {"title": "Data Analyst"})
+
+    assert backend.get_state("s1") == "waiting_for_location"
+    assert backend.get_context("s1") == {"title": "Data Analyst"}
+
+    backend.clear("s1")
+    assert backend.get_history("s1") == []
+    assert backend.get_state("s1") == "idle"
+    assert backend.get_context("s1") == {}
+
+
+def test_drop_oldest_keeps_system_and_last(backend):
+    backend.append("s1", "system", "sys")
+    backend.append("s1", "user", "q1")
+    backend.append("s1", "assistant", "a1")
+
+    assert backend.drop_oldest("s1") == {"role": "user", "content": "q1"}
+    assert backend.drop_oldest("s1") is None
+    assert [m["role"] for m in backend.get_history("s1")] == ["system", "assistant"]
+
+
+def test_sqlite_history_shared_between_instances(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    worker_a = SQLiteConversationBackend(path)
+    worker_b = SQLiteConversationBackend(path)
+
+    worker_a.append("s1", "user", "q1")
+    assert worker_b.get_history("s1") == [{"role": "user", "content": "q1"}]
+
+    # worker_b đọc tăng dần, rồi thấy được việc xóa lịch sử từ worker_a
+    worker_a.append("s1", "assistant", "a1")
+    assert len(worker_b.get_history("s1")) == 2
+    worker_a.clear("s1")
+    worker_a.append("s1", "user", "q2")
+    assert worker_b.get_history("s1") == [{"role": "user", "content": "q2"}]
+
+
+def test_history_since_returns_system_and_turn_tail(backend):
+    backend.append("s1", "system", "sys")
+    for index in range(1, 4):
+        backend.append("s1", "user", f"q{index}")
+        backend.append("s1", "assistant", f"a{index}")
+
+    system, turns = backend.get_history_since("s1", 4)
+    assert system == [{"role": "system", "content": "sys"}]
+    assert [m["content"] for m in turns] == ["q3", "a3"]
+
+    backend.drop_oldest("s1")
+    backend.append("s1", "user", "q4")
+    _, turns = backend.get_history_since("s1", 4)
+    assert [m["content"] for m in turns] == ["a3", "q4"]
+    assert backend.get_history_since("missing", 0) == ([], [])
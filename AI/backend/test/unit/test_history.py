@@ -0,0 +1,117 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parents[2]))
+
+from app.chatbot.conversation_backend import InMemoryConversationBackend, SQLiteConversationBackend
+from app.chatbot.history import SUMMARY_PREFIX, ConversationHistory
+from llms.token_budget import estimate_message_tokens, fit_messages
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryConversationBackend()
+    return SQLiteConversationBackend(str(tmp_path / "conversations.sqlite3"))
+
+
+def add_turn(backend, index):
+    backend.append("s1", "user", f"q{index}")
+    backend.append("s1", "assistant", f"a{index}")
+
+
+def make_history(backend, calls):
+    def summarize(previous, messages):
+        calls.append((previous, [m["content"] for m in messages]))
+        return (previous + " " if previous else "") + "+".join(m["content"] for m in messages)
+
+    return ConversationHistory(backend, "s1", keep_turns=2, batch_turns=1, summarize=summarize)
+
+
+def test_summary_folds_only_newly_evicted_turns(backend):
+    calls = []
+    history = make_history(backend, calls)
+    for index in range(1, 4):
+        add_turn(backend, index)
+
+    assert history.fold() is True
+    assert calls == [("", ["q1", "a1"])]
+
+    add_turn(backend, 4)
+    history.fold()
+    assert calls[-1] == ("q1+a1", ["q2", "a2"])
+    assert history.fold() is False  # không có lượt mới ra khỏi cửa sổ
+
+    view = history.view()
+    assert view[0] == {"role": "system", "content": f"{SUMMARY_PREFIX}\nq1+a1 q2+a2"}
+    assert [m["content"] for m in view[1:]] == ["q3", "a3", "q4", "a4"]
+    assert history.get_stats()["summarized_messages"] == 4
+
+
+def test_trimmed_history_is_not_summarized_again(backend):
+    calls = []
+    history = make_history(backend, calls)
+    for index in range(1, 5):
+        add_turn(backend, index)
+    history.fold()
+
+    # Session store cắt các tin nhắn cũ nhất (đã nằm trong tóm tắt)
+    backend.drop_oldest("s1")
+    backend.drop_oldest("s1")
+    backend.drop_oldest("s1")
+    add_turn(backend, 5)
+    history.fold()
+    assert calls[-1] == ("q1+a1+q2+a2", ["q3", "a3"])
+
+
+def test_prompt_stays_flat_as_conversation_grows():
+    backend = InMemoryConversationBackend()
+    history = make_history(backend, [])
+    history.summarize = lambda previous, messages: "tóm tắt ngắn"
+
+    sizes = []
+    for index in range(1, 31):
+        backend.append("s1", "user", f"câu hỏi số {index} " * 10)
+        sizes.append(estimate_message_tokens(history.view(budget=400)))
+        backend.append("s1", "assistant", f"câu trả lời số {index} " * 20)
+        history.fold()
+
+    assert max(sizes) <= 400
+    assert estimate_message_tokens(backend.get_history("s1")) > 10 * 400
+    # Không cần budget: tóm tắt + tối đa một batch chờ tóm tắt + cửa sổ keep_turns lượt
+    assert len(history.view()) <= 1 + 2 + 4
+
+
+def test_fit_messages_keeps_pinned_and_latest():
+    messages = [{"role": "system", "content": "s" * 30}] + [{"role": "user", "content": "x" * 300} for _ in range(5)]
+    fitted = fit_messages(messages, budget=250, pinned=1)
+    assert fitted[0] == messages[0]
+    assert len(fitted) == 3
+    # Câu hỏi cuối luôn được giữ
+    assert fit_messages(messages, budget=10, pinned=1) == [messages[0], messages[-1]]
+
+
+def test_split_reads_only_unsummarized_tail(backend):
+    """Sau khi đã tóm tắt, mỗi lượt chỉ đọc từ anchor trở đi, không đọc / copy lại toàn bộ lịch sử"""
+    history = make_history(backend, [])
+    reads = []
+    get_history_since = backend.get_history_since
+
+    def counting_get_history_since(session_id, start):
+        system, turns = get_history_since(session_id, start)
+        reads.append(len(turns))
+        return system, turns
+
+    backend.get_history_since = counting_get_history_since
+    backend.get_history = None  # không được dùng tới
+
+    for index in range(1, 41):
+        add_turn(backend, index)
+        history.fold()
+        view = history.view()
+
+    assert [m["content"] for m in view[1:]] == ["q39", "a39", "q40", "a40"]
+    # cửa sổ 2 lượt + tối đa một batch chờ tóm tắt + anchor
+    assert max(reads[-20:]) <= 2 * 2 + 2 * 1 + 1
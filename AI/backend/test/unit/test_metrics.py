@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parents[2]))
+
+from metrics import MetricsRegistry, current_prompt, llm_prompt
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Stage latency", buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="router")
+    histogram.observe(0.5, stage="router")
+    histogram.observe(5.0, stage="router")
+
+    text = registry.render()
+    assert "# TYPE stage_seconds histogram" in text
+    assert 'stage_seconds_bucket{stage="router",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="router",le="1"} 2' in text
+    assert 'stage_seconds_bucket{stage="router",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="router"} 3' in text
+    assert histogram.get(stage="router")["sum"] == pytest.approx(5.55)
+
+
+def test_counter_labels_and_collectors():
+    registry = MetricsRegistry()
+    counter = registry.counter("llm_requests_total", "LLM requests")
+    counter.inc(prompt="reflection", status="ok")
+    counter.inc(2, prompt="reflection", status="ok")
+    gauge = registry.gauge("queue_depth", "Queue depth")
+    registry.add_collector(lambda: gauge.set(7, backend='http://a"b'))
+
+    text = registry.render()
+    assert 'llm_requests_total{prompt="reflection",status="ok"} 3' in text
+    assert 'queue_depth{backend="http://a\\"b"} 7' in text
+    assert registry.counter("llm_requests_total", "LLM requests") is counter
+    with pytest.raises(ValueError):
+        registry.gauge("llm_requests_total", "wrong type")
+
+
+def test_llm_prompt_label_is_scoped():
+    assert current_prompt() == "unlabeled"
+    with llm_prompt("reflection"):
+        assert current_prompt() == "reflection"
+        with llm_prompt("response"):
+            assert current_prompt() == "response"
+        assert current_prompt() == "reflection"
+    assert current_prompt() == "unlabeled"
@@ -0,0 +1,28 @@
+import string
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parents[2]))
+
+from prompt.promt_config import PromptConfig
+
+prompt_config = PromptConfig()
+
+
+def placeholders(template):
+    return {field for _, field, _, _ in string.Formatter().parse(template) if field}
+
+
+@pytest.mark.parametrize("name", sorted(prompt_config.prompts))
+def test_every_template_puts_instructions_in_system_message(name):
+    kwargs = {field: f"<{field}>" for field in placeholders(prompt_config.prompts[name])}
+    messages = prompt_config.get_messages(name, **kwargs)
+
+    # Phần chỉ dẫn cố định phải nằm ở system message (prefix dùng chung được KV cache), không bị đẩy sang user
+    assert messages[0]["role"] == "system"
+    assert len(messages[0]["content"]) >= 100
+    # Biến của request chỉ nằm ở user message
+    assert all(value not in messages[0]["content"] for value in kwargs.values())
+    assert all(value in messages[-1]["content"] for value in kwargs.values())
@@ -0,0 +1,52 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parents[2]))
+
+from readiness import ReadinessTracker
+
+
+def test_ready_only_when_required_components_ready():
+    tracker = ReadinessTracker(required=["embedding", "ollama"])
+    assert not tracker.is_ready()
+
+    with tracker.phase("embedding_load", component="embedding"):
+        pass
+    assert not tracker.is_ready()
+
+    tracker.set_status("ollama", ReadinessTracker.READY)
+    snapshot = tracker.snapshot()
+    assert snapshot["ready"]
+    assert "embedding_load" in snapshot["startup_phases"]
+
+
+def test_failed_phase_marks_component_failed():
+    tracker = ReadinessTracker(required=["router"])
+
+    with pytest.raises(RuntimeError):
+        with tracker.phase("router_build", component="router"):
+            raise RuntimeError("boom")
+
+    component = tracker.snapshot()["components"]["router"]
+    assert component["status"] == ReadinessTracker.FAILED
+    assert component["error"] == "boom"
+    assert "router_build" in tracker.report()
+
+
+def test_no_required_components_is_ready():
+    assert ReadinessTracker().is_ready()
+
+
+def test_importing_app_starts_no_threads():
+    """import main (test, asgi, master của gunicorn --preload) không warm-up, không mở session store"""
+    code = (
+        "import threading, main; "
+        "assert main._warmup_thread is None and main._session_store is None; "
+        "assert [t.name for t in threading.enumerate()] == ['MainThread'], threading.enumerate()"
+    )
+    app_dir = Path(__file__).parents[2] / "app"
+    result = subprocess.run([sys.executable, "-c", code], cwd=app_dir, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
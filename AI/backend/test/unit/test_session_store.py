@@ -0,0 +1,118 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[2]))
+
+from app.chatbot.base import BaseChatbot
+from app.chatbot.conversation_backend import InMemoryConversationBackend
+from app.session_store import SessionStore
+
+
+class FakeChatbot:
+    def __init__(self, session_id=None):
+        self.conversation_history = []
+
+    def get_history(self):
+        return self.conversation_history
+
+    def drop_oldest_message(self):
+        for index, message in enumerate(self.conversation_history[:-1]):
+            if message["role"] != "system":
+                return self.conversation_history.pop(index)
+        return None
+
+
+class CountingBackend(InMemoryConversationBackend):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_history(self, session_id):
+        self.reads += 1
+        return super().get_history(session_id)
+
+
+class BackendChatbot(BaseChatbot):
+    def classify_intent(self, message):
+        return "intent_chitchat"
+
+    def chat(self, message, include_history=True):
+        return message
+
+
+def test_record_usage_tracks_bytes_without_rereading_history():
+    backend = CountingBackend()
+    backend.append("s1", "user", "xin chào")  # lịch sử có sẵn (vd: do worker khác ghi)
+    store = SessionStore(factory=lambda session_id: BackendChatbot(session_id=session_id, backend=backend))
+    bot = store.get_or_create("s1")
+
+    for turn in range(5):
+        bot.add_user_message(f"câu hỏi {turn}")
+        bot.add_assistant_message("trả lời")
+        store.record_usage("s1")
+
+    expected = sum(len(m["content"].encode("utf-8")) for m in backend.get_history("s1"))
+    assert store.get_stats()["history_bytes"] == expected
+    assert backend.reads == 2  # một lần khởi tạo + lần tính expected ở trên
+
+    bot.drop_oldest_message()
+    bot.clear_history()
+    store.record_usage("s1")
+    assert store.get_stats()["history_bytes"] == 0
+    store.stop_reaper()
+
+
+def test_capacity_evicts_least_recently_used():
+    store = SessionStore(factory=FakeChatbot, max_sessions=2)
+    store.get_or_create("a")
+    store.get_or_create("b")
+    store.get_or_create("a")
+    store.get_or_create("c")
+
+    assert "a" in store and "c" in store and "b" not in store
+    assert store.get_stats()["evictions"]["capacity"] == 1
+    store.stop_reaper()
+
+
+def test_history_bytes_cap_evicts_then_trims():
+    store = SessionStore(factory=FakeChatbot, max_history_bytes=10)
+    old = store.get_or_create("old")
+    old.conversation_history.append({"role": "user", "content": "12345678"})
+    store.record_usage("old")
+
+    bot = store.get_or_create("new")
+    bot.conversation_history.extend([
+        {"role": "system", "content": "s"},
+        {"role": "user", "content": "123456"},
+        {"role": "assistant", "content": "abcdef"},
+    ])
+    store.record_usage("new")
+
+    stats = store.get_stats()
+    assert "old" not in store
+    assert stats["history_bytes"] <= 10
+    assert [m["role"] for m in bot.conversation_history] == ["system", "assistant"]
+    assert stats["evictions"] == {"ttl": 0, "capacity": 0, "bytes": 1, "trimmed_messages": 1}
+    store.stop_reaper()
+
+
+def test_reap_removes_expired_sessions():
+    store = SessionStore(factory=FakeChatbot, ttl_seconds=0.05)
+    store.get_or_create("a")
+    time.sleep(0.1)
+    store.get_or_create("b")
+
+    assert store.reap() == 1
+    assert len(store) == 1
+    store.stop_reaper()
+
+
+def test_background_reaper():
+    store = SessionStore(factory=FakeChatbot, ttl_seconds=0.01, reap_interval_seconds=0.02)
+    store.get_or_create("a")
+    time.sleep(0.2)
+
+    assert len(store) == 0
+    assert store.get_stats()["reaper_running"]
+    store.stop_reaper()
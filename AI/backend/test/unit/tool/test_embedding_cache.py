@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from tool.embeddings.base import BaseEmbedding
+from tool.embeddings.cache import CachedEmbedding, text_key
+
+
+class CountingEmbedding(BaseEmbedding):
+    def __init__(self):
+        super().__init__("fake/model")
+        self.encoded = []
+
+    def encode(self, text):
+        texts = [text] if isinstance(text, str) else list(text)
+        self.encoded.extend(texts)
+        vectors = np.array([[len(t), t.count("a"), 1.0] for t in texts], dtype=np.float32)
+        return vectors[0] if isinstance(text, str) else vectors
+
+
+def test_key_uses_normalized_text():
+    assert text_key("m", "  tuyển   dụng ") == text_key("m", "tuyển dụng")
+    assert text_key("m", "tuyển dụng") != text_key("other", "tuyển dụng")
+
+
+def test_lru_hits_skip_encoding():
+    inner = CountingEmbedding()
+    cached = CachedEmbedding(inner, max_entries=10)
+
+    first = cached.encode(["java", "python", "java"])
+    second = cached.encode("python")
+
+    assert inner.encoded == ["java", "python"]
+    np.testing.assert_array_equal(first[1], second)
+    stats = cached.get_stats()
+    assert stats["misses"] == 2
+    assert stats["lru_hits"] == 1
+    assert stats["hit_rate"] == 0.25
+
+
+def test_disk_store_shared_between_instances(tmp_path):
+    writer = CachedEmbedding(CountingEmbedding(), cache_dir=str(tmp_path))
+    expected = writer.encode(["backend developer", "data analyst"])
+
+    reader_inner = CountingEmbedding()
+    reader = CachedEmbedding(reader_inner, cache_dir=str(tmp_path))
+    vectors = reader.encode(["data analyst", "backend developer", "tester"])
+
+    assert reader_inner.encoded == ["tester"]
+    np.testing.assert_array_equal(vectors[0], expected[1])
+    np.testing.assert_array_equal(vectors[1], expected[0])
+    assert reader.get_stats()["disk_hits"] == 2
+    assert reader.store.count() == 3
+
+
+def test_lru_eviction():
+    inner = CountingEmbedding()
+    cached = CachedEmbedding(inner, max_entries=2)
+
+    cached.encode(["a", "b", "c"])
+    cached.encode("a")
+
+    assert inner.encoded == ["a", "b", "c", "a"]
+    assert cached.get_stats()["lru_entries"] == 2
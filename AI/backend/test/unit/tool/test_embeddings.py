@@ -0,0 +1,75 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add backend directory to path (simple one-liner)
+sys.path.append(str(Path(__file__).parents[3]))
+
+from tool.embeddings import BaseEmbedding, MicroBatchingEmbedding
+
+
+class LengthEmbedding(BaseEmbedding):
+    """Embedding giả: vector = [độ dài text, 1]; ghi lại từng lần gọi encode"""
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__("fake/length")
+        self.calls = []
+        self.delay = delay
+
+    def encode(self, text):
+        texts = [text] if isinstance(text, str) else list(text)
+        self.calls.append(texts)
+        time.sleep(self.delay)
+        vectors = np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+        return vectors[0] if isinstance(text, str) else vectors
+
+
+def test_encode_batch_buckets_by_length_and_keeps_order():
+    embedding = LengthEmbedding()
+    texts = ["aaaa", "a", "aaa", "aa"]
+
+    vectors = embedding.encode_batch(texts, batch_size=2, normalize=False)
+
+    assert vectors[:, 0].tolist() == [4, 1, 3, 2]
+    assert embedding.calls == [["a", "aa"], ["aaa", "aaaa"]]
+
+
+def test_encode_batch_normalize():
+    vectors = LengthEmbedding().encode_batch(["aaa"], normalize=True)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+
+
+def test_micro_batcher_merges_concurrent_calls():
+    inner = LengthEmbedding(delay=0.01)
+    batcher = MicroBatchingEmbedding(inner, max_batch_size=64, max_wait_ms=50)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.encode("x" * (i + 1))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(results[i][0] == i + 1 for i in range(8))
+    assert len(inner.calls) < 8
+    stats = batcher.get_stats()
+    assert stats["requests"] == 8 and stats["max_batch_size"] > 1
+
+
+def test_micro_batcher_propagates_errors():
+    class Broken(BaseEmbedding):
+        def encode(self, text):
+            raise RuntimeError("boom")
+
+    batcher = MicroBatchingEmbedding(Broken("broken"), max_wait_ms=1)
+    try:
+        batcher.encode("x")
+        assert False, "expected error"
+    except RuntimeError as e:
+        assert str(e) == "boom"
@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+# Add backend directory to path (simple one-liner)
+sys.path.append(str(Path(__file__).parents[3]))
+
+from tool.intent_classifier import CascadingIntentClassifier
+
+
+def make_classifier(score, intent, **kwargs):
+    router = MagicMock()
+    router.guide.return_value = (score, intent)
+    return CascadingIntentClassifier(router_provider=lambda: router, **kwargs)
+
+
+def test_router_answers_when_confident():
+    """Score vượt threshold: không gọi LLM"""
+    classifier = make_classifier(0.9, "intent_guide", threshold=0.8)
+    llm = MagicMock(return_value="intent_chitchat")
+
+    assert classifier.classify("Hướng dẫn tạo tài khoản", llm) == ("intent_guide", "router")
+    llm.assert_not_called()
+    assert classifier.get_stats()["tiers"]["router"]["count"] == 1
+
+
+def test_llm_called_on_low_confidence():
+    """Score thấp: chuyển sang LLM"""
+    classifier = make_classifier(0.5, "intent_guide", threshold=0.8)
+    llm = MagicMock(return_value="intent_feedback")
+
+    assert classifier.classify("Trang web dùng khó quá", llm) == ("intent_feedback", "llm")
+    stats = classifier.get_stats()
+    assert stats["tiers"]["router_misses"]["count"] == 1
+    assert stats["tiers"]["llm"]["count"] == 1
+    assert stats["router_hit_rate"] == 0.0
+
+
+def test_per_intent_threshold_and_router_error():
+    """Ngưỡng riêng theo intent được ưu tiên; router lỗi thì dùng LLM"""
+    classifier = make_classifier(0.85, "intent_chitchat", threshold=0.8, intent_thresholds={"intent_chitchat": 0.9})
+    assert classifier.route("Chào bạn") is None
+
+    broken = CascadingIntentClassifier(router_provider=MagicMock(side_effect=RuntimeError("no model")))
+    assert broken.classify("Chào bạn", lambda q: "intent_chitchat") == ("intent_chitchat", "llm")
+    assert broken.get_stats()["tiers"]["router_errors"]["count"] == 1
+
+
+def test_calibrate_picks_lowest_threshold_meeting_precision():
+    """Calibrate chọn threshold thấp nhất còn đạt precision yêu cầu"""
+    outputs = {
+        "a": (0.95, "intent_jd"),
+        "b": (0.90, "intent_jd"),
+        "c": (0.80, "intent_guide"),
+        "d": (0.70, "intent_jd"),
+    }
+    router = MagicMock()
+    router.guide.side_effect = lambda query: outputs[query]
+    classifier = CascadingIntentClassifier(router_provider=lambda: router, threshold=0.99)
+
+    labelled = [("a", "intent_jd"), ("b", "intent_jd"), ("c", "intent_jd"), ("d", "intent_jd")]
+    assert classifier.calibrate(labelled, target_precision=0.75) == 0.70
+    assert classifier.calibrate(labelled, target_precision=1.0) == 0.90
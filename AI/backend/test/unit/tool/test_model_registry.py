@@ -0,0 +1,77 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from tool.model_registry import ModelRegistry, estimate_model_bytes
+
+
+class FakeTensor:
+    def __init__(self, count, size=4):
+        self.count = count
+        self.size = size
+
+    def numel(self):
+        return self.count
+
+    def element_size(self):
+        return self.size
+
+
+class FakeModule:
+    def __init__(self, mb):
+        self.mb = mb
+
+    def parameters(self):
+        return [FakeTensor(self.mb * 1024 * 1024 // 4)]
+
+    def buffers(self):
+        return []
+
+
+class Wrapper:
+    def __init__(self, inner):
+        self.embedding = inner
+
+
+def test_concurrent_first_requests_load_once():
+    registry = ModelRegistry()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get_or_load("embedding:m", loader)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len({id(model) for model in results}) == 1
+    assert registry.get_stats()["models"]["embedding:m"]["hits"] == 7
+
+
+def test_estimates_memory_through_wrappers():
+    assert estimate_model_bytes(Wrapper(FakeModule(3))) == 3 * 1024 * 1024
+    assert estimate_model_bytes(object()) == 0
+
+
+def test_lru_eviction_under_memory_cap():
+    registry = ModelRegistry(max_memory_mb=5)
+    registry.get_or_load("a", lambda: FakeModule(2), pinned=True)
+    registry.get_or_load("b", lambda: FakeModule(2))
+    registry.get_or_load("c", lambda: FakeModule(2))
+
+    assert registry.keys() == ["a", "c"]
+    stats = registry.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["total_resident_mb"] == 4.0
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from tool.database.postgest import PostgreSQLClient
+
+
+def make_client(records):
+    client = PostgreSQLClient.__new__(PostgreSQLClient)
+    client.qdrant_client = MagicMock()
+    client.embedding_model = MagicMock()
+    client.embedding_model.encode_batch.side_effect = lambda texts, batch_size: np.ones((len(texts), 3))
+    client.get_data_from_procedures = MagicMock(return_value=records)
+    client.create_collection_if_not_exists = MagicMock(return_value=True)
+    return client
+
+
+def test_record_with_failing_id_extractor_is_skipped():
+    """id_extractor lỗi: bỏ qua bản ghi (không upsert với uuid ngẫu nhiên tạo bản trùng mỗi lần chạy lại)"""
+    records = [{"id": 1, "text": "a"}, {"text": "b"}, {"id": 3, "text": "c"}]
+    client = make_client(records)
+
+    result = client.embed_data_to_qdrant(
+        "get_jobs", "jobs",
+        text_extractor=lambda record: record["text"],
+        id_extractor=lambda record: str(record["id"])
+    )
+
+    assert result["total_inserted"] == 2
+    texts = client.embedding_model.encode_batch.call_args.args[0]
+    assert texts == ["a", "c"]
+    points = client.qdrant_client.upsert.call_args.kwargs["points"]
+    assert [str(point.id) for point in points] == ["1", "3"]
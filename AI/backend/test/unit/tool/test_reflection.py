@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Add backend directory to path (simple one-liner)
+sys.path.append(str(Path(__file__).parents[3]))
+
+from llms.profiles import GenerationProfiles
+from tool.reflection import Reflection
+
+
+HISTORY = [
+    {"role": "user", "content": "Tìm việc ở đây"},
+    {"role": "assistant", "content": "Bạn muốn tìm việc gì?"},
+    {"role": "user", "content": "Hà Nội"},
+]
+
+
+def test_reflect_and_classify_single_structured_call():
+    """Viết lại + phân loại chỉ gọi LLM một lần với JSON schema"""
+    llm = MagicMock()
+    llm.generate_chat.return_value = '{"query": "Tôi muốn tìm công việc ở Hà Nội", "intent": "intent_jd"}'
+
+    result = Reflection(llm=llm).reflect_and_classify(HISTORY)
+
+    assert result == {"query": "Tôi muốn tìm công việc ở Hà Nội", "intent": "intent_jd"}
+    llm.generate_chat.assert_called_once()
+    schema = llm.generate_chat.call_args.kwargs["format"]
+    assert "intent_jd" in schema["properties"]["intent"]["enum"]
+    assert llm.generate_chat.call_args.kwargs["profile"] == "reflection_intent"
+
+
+def test_structured_profile_does_not_truncate_json():
+    """JSON nhiều dòng không bị cắt bởi stop "\n\n" hay num_predict của profile reflection"""
+    profiles = GenerationProfiles()
+    options, think = profiles.resolve("reflection_intent")
+    assert "\n\n" not in (options.get("stop") or [])
+    assert options["num_predict"] > profiles.resolve("reflection")[0]["num_predict"]
+    assert think is False
+
+
+def test_reflect_and_classify_invalid_output_falls_back():
+    """Output không hợp lệ: dùng câu hỏi cuối của user và intent None"""
+    llm = MagicMock()
+    llm.generate_chat.return_value = "not json"
+
+    result = Reflection(llm=llm).reflect_and_classify(HISTORY)
+
+    assert result == {"query": "Hà Nội", "intent": None}
+
+
+def test_reflection_history_fits_profile_budget():
+    """Lịch sử dài bị cắt cho vừa num_ctx của profile reflection_intent, giữ tóm tắt và câu hỏi cuối"""
+    llm = MagicMock()
+    llm.generate_chat.return_value = '{"query": "Tìm việc Python ở Hà Nội", "intent": "intent_jd"}'
+    history = [{"role": "system", "content": "Tóm tắt các lượt hội thoại trước:\nUser cần việc Python"}]
+    history += [{"role": "user" if i % 2 == 0 else "assistant", "content": f"tin nhắn {i} " * 40} for i in range(60)]
+    history.append({"role": "user", "content": "Hà Nội"})
+
+    profiles = GenerationProfiles({"reflection_intent": {"num_ctx": 1200, "num_predict": 100}})
+    with patch("tool.reflection.core.get_generation_profiles", return_value=profiles):
+        Reflection(llm=llm).reflect_and_classify(history)
+
+    prompt = llm.generate_chat.call_args.args[0][-1]["content"]
+    assert "User cần việc Python" in prompt and prompt.rstrip().endswith("user: Hà Nội")
+    assert "tin nhắn 0 " not in prompt
+    assert len(prompt) < 1200 * 3
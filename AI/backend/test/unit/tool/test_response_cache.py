@@ -0,0 +1,99 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parents[3]))
+
+from tool.response_cache import SemanticResponseCache, normalize_query
+
+
+class FakeEmbedding:
+    """Vector theo từ khóa: các câu cùng nhóm từ khóa có cosine = 1"""
+
+    KEYWORDS = ("việc", "chào", "lương")
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text):
+        self.calls += 1
+        text = text.lower()
+        return np.array([1.0 if keyword in text else 0.0 for keyword in self.KEYWORDS] + [0.01], dtype=np.float32)
+
+
+def make_cache(**kwargs):
+    embedding = FakeEmbedding()
+    options = {
+        "embedding_provider": lambda: embedding,
+        "intent_ttls": {"intent_chitchat": 60, "intent_incomplete_recruitment_question": 60},
+        "similarity_threshold": 0.95,
+    }
+    options.update(kwargs)
+    return SemanticResponseCache(**options), embedding
+
+
+def test_exact_match_ignores_case_spacing_and_trailing_punctuation():
+    assert normalize_query("  Có việc nào  đang tuyển không? ") == normalize_query("có việc nào đang tuyển không")
+
+    cache, _ = make_cache()
+    cache.put("Có việc nào đang tuyển không?", "intent_incomplete_recruitment_question", "Bạn muốn tìm việc gì?")
+
+    assert cache.get("có việc nào đang tuyển không", "intent_incomplete_recruitment_question") == "Bạn muốn tìm việc gì?"
+    assert cache.get_stats()["exact_hits"] == 1
+
+
+def test_semantic_match_within_same_intent_only():
+    cache, _ = make_cache()
+    cache.put("Xin chào bạn", "intent_chitchat", "Chào bạn!")
+
+    assert cache.get("chào buổi sáng", "intent_chitchat") == "Chào bạn!"
+    assert cache.get("chào buổi sáng", "intent_incomplete_recruitment_question") is None
+    assert cache.get("mức lương thế nào", "intent_chitchat") is None
+
+    stats = cache.get_stats()
+    assert stats["semantic_hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == round(1 / 3, 4)
+
+
+def test_personalized_intents_are_never_cached():
+    cache, embedding = make_cache()
+    cache.put("Review CV của tôi", "intent_review_cv", "...")
+
+    assert cache.get("Review CV của tôi", "intent_review_cv") is None
+    assert cache.get_stats()["entries"] == 0
+    assert cache.get_stats()["skipped"] == 1
+    assert embedding.calls == 0
+
+
+def test_ttl_expiry_and_lru_eviction():
+    cache, _ = make_cache(intent_ttls={"intent_chitchat": 0.05}, max_entries=2)
+    cache.put("chào", "intent_chitchat", "a")
+    time.sleep(0.06)
+    assert cache.get("chào", "intent_chitchat") is None
+    assert cache.get_stats()["expirations"] == 1
+
+    cache, _ = make_cache(max_entries=2, embedding_provider=None)
+    cache.put("một", "intent_chitchat", "1")
+    cache.put("hai", "intent_chitchat", "2")
+    cache.get("một", "intent_chitchat")
+    cache.put("ba", "intent_chitchat", "3")
+
+    assert cache.get("hai", "intent_chitchat") is None
+    assert cache.get("một", "intent_chitchat") == "1"
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_miss_then_put_encodes_query_once():
+    """put() sau một lượt miss dùng lại embedding đã tính ở get()"""
+    cache, embedding = make_cache()
+    assert cache.get("Xin chào bạn", "intent_chitchat") is None
+    cache.put("Xin chào bạn", "intent_chitchat", "Chào bạn!")
+    assert embedding.calls == 1
+
+    assert cache.get("chào buổi sáng", "intent_chitchat") == "Chào bạn!"
+    # put() không qua get() vẫn tự encode
+    cache.put("mức lương thế nào", "intent_chitchat", "Tùy vị trí")
+    assert embedding.calls == 3
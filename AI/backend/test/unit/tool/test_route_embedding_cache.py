@@ -0,0 +1,79 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add backend directory to path (simple one-liner)
+sys.path.append(str(Path(__file__).parents[3]))
+
+from tool.semantic_router import SemanticRouter, Route, RouteEmbeddingCache
+
+
+class CountingEmbedding:
+    """Embedding giả đếm số text đã encode"""
+
+    name = "fake/model"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(text), 1.0, text.count("a")] for text in texts], dtype=np.float32)
+
+
+def test_cache_reuses_file_and_encodes_only_changed_samples(tmp_path):
+    embedding = CountingEmbedding()
+    routes = [Route(name="a", samples=["aa", "ab"]), Route(name="b", samples=["bbb"])]
+
+    cache = RouteEmbeddingCache(str(tmp_path), embedding.name)
+    names, matrix, counts = cache.load(routes, embedding.encode)
+    assert names == ["a", "b"] and counts == [2, 1]
+    assert len(embedding.encoded) == 3
+
+    # Lần thứ hai: không encode lại, ma trận là mmap read-only
+    embedding.encoded.clear()
+    _, cached_matrix, _ = cache.load(routes, embedding.encode)
+    assert embedding.encoded == []
+    assert isinstance(cached_matrix, np.memmap) and not cached_matrix.flags.writeable
+    np.testing.assert_allclose(cached_matrix, matrix)
+
+    # Thêm một sample: chỉ sample đó được encode
+    routes[1] = Route(name="b", samples=["bbb", "ba"])
+    _, updated, counts = cache.load(routes, embedding.encode)
+    assert embedding.encoded == ["ba"]
+    assert counts == [2, 2] and updated.shape[0] == 4
+
+
+def test_router_from_cache_matches_uncached(tmp_path):
+    embedding = CountingEmbedding()
+    routes = [Route(name="a", samples=["aa", "ab"]), Route(name="b", samples=["bbbbbb"])]
+
+    cached = SemanticRouter(embedding, routes, sample_cache=RouteEmbeddingCache(str(tmp_path), embedding.name))
+    plain = SemanticRouter(embedding, routes)
+
+    np.testing.assert_allclose(cached.score_matrix(["aaa", "bbbb"]), plain.score_matrix(["aaa", "bbbb"]), rtol=1e-6)
+
+
+def test_routers_sharing_a_model_keep_separate_caches(tmp_path):
+    embedding = CountingEmbedding()
+    semantic_routes = [Route(name="a", samples=["aa", "ab"])]
+    intent_routes = [Route(name="intent_jd", samples=["java", "python", "hanoi"])]
+
+    for _ in range(3):  # 3 lần khởi động process
+        RouteEmbeddingCache(str(tmp_path), embedding.name, namespace="semantic_router").load(semantic_routes, embedding.encode)
+        RouteEmbeddingCache(str(tmp_path), embedding.name, namespace="intent_router").load(intent_routes, embedding.encode)
+    assert len(embedding.encoded) == 5
+
+
+def test_missing_matrix_is_rebuilt_on_load(tmp_path):
+    embedding = CountingEmbedding()
+    routes = [Route(name="a", samples=["aa", "ab"])]
+    cache = RouteEmbeddingCache(str(tmp_path), embedding.name)
+    cache.load(routes, embedding.encode)
+
+    # Worker khác vừa dọn file (vd: layout cũ) → load build lại thay vì FileNotFoundError
+    for path in Path(cache.directory).glob("routes-*.npy"):
+        path.unlink()
+    _, matrix, _ = cache.load(routes, embedding.encode)
+    assert matrix.shape[0] == 2
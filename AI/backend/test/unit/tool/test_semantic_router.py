@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add backend directory to path (simple one-liner)
+sys.path.append(str(Path(__file__).parents[3]))
+
+from tool.semantic_router import SemanticRouter, Route
+
+
+class FakeEmbedding:
+    """Embedding giả: mỗi text map sang một vector cố định"""
+
+    VECTORS = {
+        "jd1": [1.0, 0.0, 0.0],
+        "jd2": [10.0, 1.0, 0.0],
+        "chat1": [0.0, 1.0, 0.0],
+        "chat2": [0.0, 2.0, 1.0],
+        "q_jd": [3.0, 0.2, 0.0],
+        "q_chat": [0.0, 1.0, 0.3],
+    }
+
+    def encode(self, texts):
+        return np.array([self.VECTORS[text] for text in texts])
+
+
+ROUTES = [
+    Route(name="intent_jd", samples=["jd1", "jd2"]),
+    Route(name="intent_chitchat", samples=["chat1", "chat2"]),
+]
+
+
+@pytest.mark.parametrize("aggregation", SemanticRouter.AGGREGATIONS)
+def test_guide_picks_nearest_route(aggregation):
+    router = SemanticRouter(embedding=FakeEmbedding(), routes=ROUTES, aggregation=aggregation, top_k=2)
+
+    assert router.guide("q_jd")[1] == "intent_jd"
+    assert router.guide("q_chat")[1] == "intent_chitchat"
+
+
+def test_sample_matrix_is_row_normalized_float32():
+    router = SemanticRouter(embedding=FakeEmbedding(), routes=ROUTES)
+
+    assert router.sample_matrix.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(router.sample_matrix, axis=1), 1.0, rtol=1e-6)
+    assert router.route_index.tolist() == [0, 0, 1, 1]
+
+
+def test_mean_score_is_mean_cosine_per_sample():
+    """Điểm mean là trung bình cosine theo từng sample (không chia cho norm cả ma trận)"""
+    router = SemanticRouter(embedding=FakeEmbedding(), routes=ROUTES, aggregation="mean")
+
+    query = np.array([3.0, 0.2, 0.0])
+    samples = np.array([[1.0, 0.0, 0.0], [10.0, 1.0, 0.0]])
+    expected = np.mean(samples @ query / (np.linalg.norm(samples, axis=1) * np.linalg.norm(query)))
+
+    assert router.scores("q_jd")["intent_jd"] == pytest.approx(expected, rel=1e-5)
+
+
+def test_guide_many_matches_guide():
+    router = SemanticRouter(embedding=FakeEmbedding(), routes=ROUTES, aggregation="max")
+
+    assert router.guide_many(["q_jd", "q_chat"]) == [router.guide("q_jd"), router.guide("q_chat")]
+    assert router.guide_many([]) == []
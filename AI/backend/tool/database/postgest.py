@@ -12,6 +12,8 @@ from qdrant_client.models import Distance, VectorParams, PointStruct
 backend_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_dir))
 
+from metrics import QDRANT_SEARCH_SECONDS, SUPABASE_RPC_SECONDS
+
 try:
     from llms.llm_manager import llm_manager
     LLM_MANAGER_AVAILABLE = True
@@ -89,14 +91,22 @@ class PostgreSQLClient:
             if model:
                 return model
         
-        # Fallback: tạo trực tiếp
+        # Fallback: lấy trực tiếp từ ModelManager (vẫn qua model registry dùng chung)
         try:
-            from sentence_transformers import SentenceTransformer
-            return SentenceTransformer('dangvantuan/vietnamese-document-embedding')
+            from tool.model_manager import model_manager
+            return model_manager.get_embedding_model('dangvantuan/vietnamese-document-embedding')
         except Exception as e:
             logger.error(f"❌ Failed to initialize embedding model: {str(e)}")
             return None
 
+    def _encode_texts(self, texts: List[str], batch_size: int = 32):
+        """Encode nhiều text theo batch (encode_batch nếu model hỗ trợ, ngược lại encode list)"""
+        if not texts:
+            return []
+        if hasattr(self.embedding_model, "encode_batch"):
+            return self.embedding_model.encode_batch(texts, batch_size=batch_size)
+        return self.embedding_model.encode(texts, batch_size=batch_size)
+
     def _is_valid_point_id(self, point_id: str) -> bool:
         """
         Kiểm tra xem point ID có hợp lệ với Qdrant không
@@ -123,7 +133,8 @@ class PostgreSQLClient:
             List[Dict]: danh sách công ty với ngành nghề
         """
         try:
-            response = self.client.rpc(name_of_procedure).execute()
+            with SUPABASE_RPC_SECONDS.time(procedure=name_of_procedure):
+                response = self.client.rpc(name_of_procedure).execute()
        
             if response.data:
                 logger.info(f"✅ Retrieved {len(response.data)} records")
@@ -245,41 +256,36 @@ class PostgreSQLClient:
             if not self.create_collection_if_not_exists(collection_name):
                 return {"status": "error", "message": f"Failed to create collection {collection_name}"}
             
-            # 4. Tạo embedding và points
-            points = []
+            # 4. Trích xuất text và ID (bản ghi lỗi bị bỏ qua trước khi embedding)
+            texts, records, point_ids = [], [], []
             for i, record in enumerate(processed_data):
                 try:
-                    # Trích xuất text để embedding
                     text_to_embed = text_extractor(record)
-                    
-                    # Tạo embedding vector
-                    embedding = self.embedding_model.encode(text_to_embed).tolist()
-                    
-                    # Trích xuất ID hoặc tạo ID mới
-                    if id_extractor:
-                        point_id = id_extractor(record)
-                        # Đảm bảo ID tương thích với Qdrant (UUID hoặc integer)
-                        if not self._is_valid_point_id(point_id):
-                            point_id = str(uuid.uuid4())
-                    else:
-                        point_id = str(uuid.uuid4())
-                    
-                    # Tạo point
-                    point = PointStruct(
-                        id=point_id,
-                        vector=embedding,
-                        payload=record
-                    )
-                    points.append(point)
-                    
-                    if (i + 1) % 10 == 0:
-                        logger.info(f"⚡ Processed {i + 1}/{len(processed_data)} records")
-                        
+                    point_id = id_extractor(record) if id_extractor else None
                 except Exception as e:
                     logger.warning(f"⚠️ Error processing record {i}: {str(e)}")
                     continue
+                # Đảm bảo ID tương thích với Qdrant (UUID hoặc integer)
+                if point_id is None or not self._is_valid_point_id(point_id):
+                    point_id = str(uuid.uuid4())
+                texts.append(text_to_embed)
+                records.append(record)
+                point_ids.append(point_id)
+
+            # 5. Tạo embedding theo batch (một forward pass cho mỗi batch thay vì từng bản ghi)
+            embeddings = self._encode_texts(texts, batch_size)
+            logger.info(f"⚡ Encoded {len(texts)} records in batches of {batch_size}")
+
+            # 6. Tạo points
+            points = []
+            for record, point_id, embedding in zip(records, point_ids, embeddings):
+                points.append(PointStruct(
+                    id=point_id,
+                    vector=embedding.tolist(),
+                    payload=record
+                ))
             
-            # 5. Upsert vào Qdrant theo batch
+            # 7. Upsert vào Qdrant theo batch
             total_inserted = 0
             for i in range(0, len(points), batch_size):
                 batch = points[i:i + batch_size]
@@ -341,12 +347,13 @@ class PostgreSQLClient:
             query_vector = self.embedding_model.encode(query_text).tolist()
             
             # Tìm kiếm trong Qdrant
-            search_results = self.qdrant_client.search(
-                collection_name=collection_name,
-                query_vector=query_vector,
-                limit=top_k,
-                score_threshold=score_threshold
-            )
+            with QDRANT_SEARCH_SECONDS.time(collection=collection_name):
+                search_results = self.qdrant_client.search(
+                    collection_name=collection_name,
+                    query_vector=query_vector,
+                    limit=top_k,
+                    score_threshold=score_threshold
+                )
             
             results = []
             for result in search_results:
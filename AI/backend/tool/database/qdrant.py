@@ -1,6 +1,8 @@
 from qdrant_client import QdrantClient
 from qdrant_client.models import Distance, VectorParams
 
+from metrics import QDRANT_SEARCH_SECONDS
+
 
 class QDrant():
     def __init__(self, url: str, api_key: str):
@@ -95,11 +97,12 @@ class QDrant():
             print(f"ℹ️  No new vectors to insert - all IDs already exist in collection")
         
     def search_vectors(self, collection_name: str, query_vector: list, top_k: int):
-        results = self.client.search(
-            collection_name=collection_name,
-            query_vector=query_vector,
-            limit=top_k
-        )
+        with QDRANT_SEARCH_SECONDS.time(collection=collection_name):
+            results = self.client.search(
+                collection_name=collection_name,
+                query_vector=query_vector,
+                limit=top_k
+            )
         return results
     
     def delete_collection(self, collection_name: str):
@@ -1,4 +1,6 @@
 from .sentenceTransformer import SentenceTransformerEmbedding
 from .base import BaseEmbedding, EmbeddingConfig
+from .micro_batcher import MicroBatchingEmbedding
+from .cache import CachedEmbedding, EmbeddingVectorStore
 
-__all__ = ["SentenceTransformerEmbedding", "BaseEmbedding", "EmbeddingConfig"]
\ No newline at end of file
+__all__ = ["SentenceTransformerEmbedding", "BaseEmbedding", "EmbeddingConfig", "MicroBatchingEmbedding", "CachedEmbedding", "EmbeddingVectorStore"]
\ No newline at end of file
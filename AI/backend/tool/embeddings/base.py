@@ -1,5 +1,7 @@
 from pydantic.v1 import BaseModel, Field, validator
-from typing import Any, Optional
+from typing import Any, List, Optional
+
+import numpy as np
 
 class EmbeddingConfig(BaseModel):
     name: str = Field(..., description="The name of the SentenceTransformer model")
@@ -20,6 +22,45 @@ class BaseEmbedding():
     def encode(self, text: str):
         raise NotImplementedError("The encode method must be implemented by subclasses")
 
+    def encode_batch(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        normalize: bool = False,
+        sort_by_length: bool = True
+    ) -> np.ndarray:
+        """
+        Encode nhiều text theo batch
+
+        Args:
+            texts: danh sách text
+            batch_size: số text mỗi lần gọi encode
+            normalize: chuẩn hóa L2 từng vector
+            sort_by_length: gom các text có độ dài gần nhau vào cùng batch để giảm padding
+
+        Returns:
+            np.ndarray: shape (len(texts), dim), đúng thứ tự texts
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i])) if sort_by_length else list(range(len(texts)))
+
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            encoded = np.asarray(self.encode([texts[i] for i in chunk]), dtype=np.float32)
+            for i, vector in zip(chunk, encoded):
+                vectors[i] = vector
+
+        matrix = np.vstack(vectors)
+        if normalize:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+        return matrix
+
 
 class APIBaseEmbedding(BaseEmbedding):
     baseUrl: str
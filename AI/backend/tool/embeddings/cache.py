@@ -0,0 +1,270 @@
+"""
+Embedding cache theo nội dung text: LRU trong process + vector store memory-mapped trên đĩa
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from metrics import EMBEDDING_ENCODE_SECONDS
+from .base import BaseEmbedding
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows
+    FCNTL_AVAILABLE = False
+    fcntl = None
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hóa text trước khi tạo key: Unicode NFC + gộp khoảng trắng"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def text_key(model_name: str, text: str) -> str:
+    """Key của cache: hash(model, normalized text)"""
+    return hashlib.sha1(f"{model_name}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingVectorStore:
+    """
+    Vector store append-only trên đĩa cho một model:
+    - vectors.f32: các vector float32 nối tiếp nhau, đọc qua np.memmap (read-only, dùng chung page cache)
+    - index.sqlite (WAL): key -> số thứ tự dòng
+
+    Vector được ghi xong trước khi key xuất hiện trong index nên reader ở process khác
+    (gunicorn worker) không bao giờ đọc phải dòng chưa ghi. Việc ghi được khóa bằng fcntl.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.index_path = os.path.join(directory, "index.sqlite")
+        self.lock_path = os.path.join(directory, ".lock")
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+        self._dim = None
+        self._mmap = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Kết nối lại sau fork (gunicorn preload) vì connection sqlite không dùng chung được giữa process
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+            self._mmap = None
+        return self._conn
+
+    def _get_dim(self, conn) -> Optional[int]:
+        if self._dim is None:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+            self._dim = int(row[0]) if row else None
+        return self._dim
+
+    def _vectors(self, min_rows: int) -> np.ndarray:
+        """memmap của file vector, map lại khi file đã lớn hơn"""
+        if self._mmap is None or self._mmap.shape[0] < min_rows:
+            rows = os.path.getsize(self.vectors_path) // (self._dim * 4)
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+        return self._mmap
+
+    @contextmanager
+    def _write_lock(self):
+        with open(self.lock_path, "w") as lock_file:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _find_rows(conn, keys: List[str]) -> Dict[str, int]:
+        """key -> row cho các key đã có trong index (chia nhỏ để không vượt giới hạn tham số của SQLite)"""
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(conn.execute(
+                f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        return found
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+
+        with self._lock:
+            conn = self._connection()
+            if self._get_dim(conn) is None:
+                return {}
+
+            found = self._find_rows(conn, keys)
+            if not found:
+                return {}
+            vectors = self._vectors(max(found.values()) + 1)
+            return {key: np.array(vectors[row]) for key, row in found.items()}
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+
+        with self._lock, self._write_lock():
+            conn = self._connection()
+            dim = self._get_dim(conn)
+            if dim is None:
+                first = np.asarray(next(iter(items.values())), dtype=np.float32)
+                dim = first.shape[-1]
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (str(dim),))
+                conn.commit()
+                self._dim = dim
+
+            keys = list(items.keys())
+            existing = self._find_rows(conn, keys)
+            new_items = [(key, np.asarray(items[key], dtype=np.float32)) for key in keys if key not in existing]
+            new_items = [(key, vector) for key, vector in new_items if vector.shape[-1] == dim]
+            if not new_items:
+                return
+
+            # 1. Ghi vector trước
+            with open(self.vectors_path, "ab") as f:
+                start_row = f.tell() // (dim * 4)
+                f.write(np.vstack([vector for _, vector in new_items]).astype(np.float32).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            # 2. Sau đó mới công bố key trong index
+            conn.executemany(
+                "INSERT OR IGNORE INTO vectors (key, row) VALUES (?, ?)",
+                [(key, start_row + offset) for offset, (key, _) in enumerate(new_items)]
+            )
+            conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Bọc một embedding model với cache theo (model, normalized text):
+    LRU trong process phía trước, EmbeddingVectorStore trên đĩa phía sau.
+    Chỉ các text chưa có trong cả hai tầng mới được encode (gộp thành một batch).
+    """
+
+    def __init__(self, embedding, name: str = None, cache_dir: Optional[str] = None, max_entries: int = 10000):
+        super().__init__(name or getattr(embedding, "name", None))
+        self.embedding = embedding
+        self.max_entries = max_entries
+        self.store = None
+        if cache_dir:
+            model_slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.name)
+            self.store = EmbeddingVectorStore(os.path.join(cache_dir, model_slug))
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def _encode_misses(self, texts: List[str]) -> np.ndarray:
+        if hasattr(self.embedding, "encode_batch"):
+            return np.asarray(self.embedding.encode_batch(texts), dtype=np.float32)
+        return np.asarray(self.embedding.encode(texts), dtype=np.float32)
+
+    def _lookup(self, texts: List[str]) -> np.ndarray:
+        keys = [text_key(self.name, text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+
+        # 1. LRU trong process
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    vectors[key] = self._lru[key]
+            lru_hits = len(vectors)
+
+        # 2. Store trên đĩa
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        disk_vectors = {}
+        if missing and self.store is not None:
+            try:
+                disk_vectors = self.store.get_many(missing)
+            except Exception as e:
+                print(f"⚠️ Embedding store read failed: {e}")
+        vectors.update(disk_vectors)
+
+        # 3. Encode phần còn thiếu (mỗi text một lần)
+        to_encode = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        encoded = {}
+        if to_encode:
+            matrix = self._encode_misses(list(to_encode.values()))
+            encoded = dict(zip(to_encode.keys(), matrix))
+            vectors.update(encoded)
+            if self.store is not None:
+                try:
+                    self.store.put_many(encoded)
+                except Exception as e:
+                    print(f"⚠️ Embedding store write failed: {e}")
+
+        with self._lock:
+            for key, vector in {**disk_vectors, **encoded}.items():
+                self._lru[key] = vector
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+            self._stats["requests"] += len(keys)
+            self._stats["lru_hits"] += lru_hits
+            self._stats["disk_hits"] += len(disk_vectors)
+            self._stats["misses"] += len(to_encode)
+
+        return np.vstack([vectors[key] for key in keys])
+
+    def encode(self, text):
+        single = isinstance(text, str)
+        texts = [text] if single else list(text)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        with EMBEDDING_ENCODE_SECONDS.time(model=self.name):
+            matrix = self._lookup(texts)
+        return matrix[0] if single else matrix
+
+    def encode_batch(self, texts: List[str], batch_size: int = 32, normalize: bool = False, sort_by_length: bool = True) -> np.ndarray:
+        matrix = self.encode(list(texts))
+        if normalize and matrix.size:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+        return matrix
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"requests": 0, "lru_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate của LRU, store trên đĩa và tổng"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["lru_entries"] = len(self._lru)
+
+        requests = stats["requests"]
+        stats["lru_hit_rate"] = round(stats["lru_hits"] / requests, 4) if requests else 0.0
+        stats["hit_rate"] = round((stats["lru_hits"] + stats["disk_hits"]) / requests, 4) if requests else 0.0
+        stats["disk_enabled"] = self.store is not None
+        return stats
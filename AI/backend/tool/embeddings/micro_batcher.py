@@ -0,0 +1,157 @@
+"""
+Dynamic micro-batching cho embedding: gom các lời gọi encode đồng thời thành một forward pass
+"""
+import queue
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from .base import BaseEmbedding
+
+
+class _EncodeRequest:
+    __slots__ = ("texts", "enqueued_at", "done", "result", "error")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatchingEmbedding(BaseEmbedding):
+    """
+    Bọc một embedding model: các lời gọi encode() từ nhiều thread (router, search, indexing)
+    được gom trong cửa sổ max_wait_ms rồi encode chung một lần qua encode_batch().
+
+    Lời gọi có từ max_batch_size text trở lên đã đủ lớn nên được encode trực tiếp.
+    """
+
+    def __init__(self, embedding: BaseEmbedding, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        super().__init__(embedding.name)
+        self.embedding = embedding
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def encode(self, text):
+        single = isinstance(text, str)
+        texts = [text] if single else list(text)
+
+        if len(texts) >= self.max_batch_size:
+            vectors = self.embedding.encode_batch(texts, batch_size=self.max_batch_size)
+        else:
+            vectors = self._submit(texts)
+
+        return vectors[0] if single else vectors
+
+    def encode_batch(self, texts: List[str], batch_size: int = 32, normalize: bool = False, sort_by_length: bool = True) -> np.ndarray:
+        return self.embedding.encode_batch(texts, batch_size=batch_size, normalize=normalize, sort_by_length=sort_by_length)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="embedding-micro-batcher", daemon=True)
+                    self._worker.start()
+
+    def _submit(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        self._ensure_worker()
+        request = _EncodeRequest(texts)
+        self._queue.put(request)
+        request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect_batch(self) -> List[_EncodeRequest]:
+        """Chờ request đầu tiên, sau đó gom thêm tới khi đủ batch hoặc hết cửa sổ thời gian"""
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.perf_counter() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started_at = time.perf_counter()
+            texts = [text for request in batch for text in request.texts]
+
+            try:
+                vectors = self.embedding.encode_batch(texts, batch_size=self.max_batch_size)
+                offset = 0
+                for request in batch:
+                    request.result = vectors[offset:offset + len(request.texts)]
+                    offset += len(request.texts)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+
+            self._record(batch, len(texts), started_at)
+            for request in batch:
+                request.done.set()
+
+    def _record(self, batch: List[_EncodeRequest], size: int, started_at: float):
+        waits = [started_at - request.enqueued_at for request in batch]
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["requests"] += len(batch)
+            self._stats["texts"] += size
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], size)
+            self._stats["total_queue_wait_seconds"] += sum(waits)
+            self._stats["max_queue_wait_seconds"] = max(self._stats["max_queue_wait_seconds"], max(waits))
+            self._stats["encode_seconds"] += time.perf_counter() - started_at
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {
+                "batches": 0,
+                "requests": 0,
+                "texts": 0,
+                "max_batch_size": 0,
+                "total_queue_wait_seconds": 0.0,
+                "max_queue_wait_seconds": 0.0,
+                "encode_seconds": 0.0,
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Thống kê micro-batching: kích thước batch, thời gian chờ trong hàng đợi"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+
+        batches = stats["batches"]
+        return {
+            "batches": batches,
+            "requests": stats["requests"],
+            "texts": stats["texts"],
+            "avg_batch_size": round(stats["texts"] / batches, 2) if batches else 0.0,
+            "max_batch_size": stats["max_batch_size"],
+            "avg_queue_wait_ms": round(stats["total_queue_wait_seconds"] / stats["requests"] * 1000, 3) if stats["requests"] else 0.0,
+            "max_queue_wait_ms": round(stats["max_queue_wait_seconds"] * 1000, 3),
+            "avg_encode_ms": round(stats["encode_seconds"] / batches * 1000, 3) if batches else 0.0,
+            "queue_depth": self._queue.qsize(),
+        }
@@ -1,12 +1,45 @@
+from typing import List
+
+import numpy as np
 from pydantic.v1 import BaseModel, Field, validator
 from .base import BaseEmbedding, EmbeddingConfig
-from sentence_transformers import SentenceTransformer
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+    SentenceTransformer = None
 
 class SentenceTransformerEmbedding(BaseEmbedding):
     def __init__(self, config: EmbeddingConfig):
         super().__init__(config.name)
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            raise ImportError("sentence-transformers not available. Please install: pip install sentence-transformers")
         self.config = config
         self.embedding_model = SentenceTransformer(self.config.name, trust_remote_code=True)
 
     def encode(self, text: str):
         return self.embedding_model.encode(text)
+
+    def encode_batch(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        normalize: bool = False,
+        sort_by_length: bool = True
+    ) -> np.ndarray:
+        """
+        Encode nhiều text trong một lần gọi SentenceTransformer
+        (SentenceTransformer tự sắp xếp theo độ dài bên trong nên sort_by_length luôn được áp dụng)
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self.embedding_model.encode(
+            texts,
+            batch_size=batch_size,
+            normalize_embeddings=normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
@@ -1,43 +1,59 @@
 
-import os
 import json
 import re
+from typing import Optional
 
 
-from llms.ollama_llms import OllamaLLMs
+from llms.async_ollama_llms import get_async_client
+from llms.llm_manager import llm_manager
+from metrics import llm_prompt
 from prompt.promt_config import PromptConfig
 
 
 class ExtractFeatureQuestion:
-    def __init__(self, model_name: str, validate_response: list = ["title", "skills", "company", "location", "experience", "description"]):
+    def __init__(self, model_name: Optional[str] = None, validate_response: list = ["title", "skills", "company", "location", "experience", "description"]):
+        """
+        model_name: model dùng để trích xuất, None = model của bước "extraction" (LLM_TASK_MODELS, mặc định OLLAMA_MODEL)
+        """
         self.valid_fields = validate_response
-        default_url = "http://host.docker.internal:11434" if os.getenv("DOCKER_ENV") == "true" else "http://localhost:11434"
-        ollama_url = os.getenv("OLLAMA_URL", default_url)
-        model_name = os.getenv("OLLAMA_MODEL", "hf.co/Cactus-Compute/Qwen3-1.7B-Instruct-GGUF:Q4_K_M")
-        self.llm = OllamaLLMs(base_url=ollama_url, model_name=model_name)
+        self.model_name = model_name or llm_manager.get_task_model("extraction")
+        # Client dùng chung của LLMManager (connection pool, admission control, backend pool)
+        self.llm = llm_manager.get_ollama_client(model_name=self.model_name)
 
 
     def extract(self, query: str, prompt_type: str) -> str:
         try:
             response = self._call_llm(query, prompt_type)
-            cleaned_response = self._clear_llm_response(response)
-            response_dict = json.loads(cleaned_response)
-            validated_dict = self._validate_query_fields(response_dict)
-            print(f"📝 User input: {query}")
-            print(f"🔍 Extracted query: {validated_dict}")
-            return validated_dict
+            return self._parse_response(query, response)
+        except Exception as e:
+            print(f"Error extracting features: {e}")
+            return {}
+
+    async def aextract(self, query: str, prompt_type: str) -> str:
+        """Bản async của extract: chờ Ollama trên event loop qua AsyncOllamaLLMs (không giữ thread)"""
+        try:
+            messages = PromptConfig().get_messages(prompt_type, user_input=query)
+            with llm_prompt(prompt_type):
+                response = await get_async_client(self.llm).chat(messages, profile="extraction")
+            return self._parse_response(query, response)
         except Exception as e:
             print(f"Error extracting features: {e}")
             return {}
 
     def _call_llm(self, query: str, prompt_type: str) -> str:
         promptConfig = PromptConfig()
-        prompt = promptConfig.get_prompt(prompt_name=prompt_type, user_input=query)
-        messages = [
-            {"role": "user", "content": prompt}
-        ]
-        response = self.llm.chat(messages)
+        messages = promptConfig.get_messages(prompt_type, user_input=query)
+        with llm_prompt(prompt_type):
+            response = self.llm.chat(messages, profile="extraction")
         return response
+
+    def _parse_response(self, query: str, response: str) -> dict:
+        cleaned_response = self._clear_llm_response(response)
+        response_dict = json.loads(cleaned_response)
+        validated_dict = self._validate_query_fields(response_dict)
+        print(f"📝 User input: {query}")
+        print(f"🔍 Extracted query: {validated_dict}")
+        return validated_dict
     
     def _clear_llm_response(self, response: str) -> str:
         """
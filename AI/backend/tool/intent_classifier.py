@@ -0,0 +1,214 @@
+"""
+Cascading intent classifier: SemanticRouter (nhanh, vài ms) trước, LLM chỉ khi router không đủ tự tin
+"""
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from setting import get_settings
+
+
+class CascadingIntentClassifier:
+    """
+    Phân loại intent theo 2 tầng:
+    1. router: SemanticRouter với routes cho mọi intent_*; chấp nhận khi score >= threshold
+    2. llm: gọi LLM cho các câu mơ hồ (score thấp hoặc router lỗi)
+
+    Thống kê số lần mỗi tầng trả lời và latency để tune threshold theo traffic thật.
+    """
+
+    TIERS = ("router", "llm")
+
+    def __init__(
+        self,
+        router_provider: Callable[[], object],
+        threshold: float = 0.75,
+        intent_thresholds: Optional[Dict[str, float]] = None,
+        enabled: bool = True
+    ):
+        """
+        Args:
+            router_provider: hàm trả về SemanticRouter (lazy, để không load embedding khi chưa cần)
+            threshold: ngưỡng score mặc định để tin router
+            intent_thresholds: ngưỡng riêng cho từng intent (ghi đè threshold)
+            enabled: False = luôn dùng LLM
+        """
+        self._router_provider = router_provider
+        self.threshold = threshold
+        self.intent_thresholds = dict(intent_thresholds or {})
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def threshold_for(self, intent: str) -> float:
+        return self.intent_thresholds.get(intent, self.threshold)
+
+    def route(self, query: str) -> Optional[Tuple[str, float]]:
+        """
+        Chỉ chạy tầng router.
+
+        Returns:
+            (intent, score) nếu router đủ tự tin, None nếu cần hỏi LLM
+        """
+        if not self.enabled or not query:
+            return None
+
+        start_time = time.perf_counter()
+        try:
+            score, intent = self._router_provider().guide(query)
+        except Exception as e:
+            print(f"⚠️ Intent router failed, falling back to LLM: {e}")
+            self._record("router_errors")
+            return None
+        elapsed = time.perf_counter() - start_time
+
+        score = float(score)
+        if score >= self.threshold_for(intent):
+            self._record("router", elapsed)
+            return intent, score
+
+        self._record("router_misses", elapsed)
+        return None
+
+    def classify(self, query: str, llm_classifier: Callable[[str], str]) -> Tuple[str, str]:
+        """
+        Phân loại intent theo cascade.
+
+        Args:
+            query: câu hỏi (đã viết lại thành câu độc lập)
+            llm_classifier: hàm gọi LLM để phân loại khi router không đủ tự tin
+
+        Returns:
+            (intent, tier) với tier là "router" hoặc "llm"
+        """
+        routed = self.route(query)
+        if routed is not None:
+            return routed[0], "router"
+
+        return self.classify_with_llm(query, llm_classifier), "llm"
+
+    def classify_with_llm(self, query: str, llm_classifier: Callable[[str], str]) -> str:
+        """Tầng LLM (có đo latency)"""
+        start_time = time.perf_counter()
+        intent = llm_classifier(query)
+        self._record("llm", time.perf_counter() - start_time)
+        return intent
+
+    async def aclassify(self, query: str, llm_classifier: Callable[[str], Awaitable[str]]) -> Tuple[str, str]:
+        """
+        Bản async của classify: router (embedding, vài ms) chạy trong thread pool,
+        tầng LLM được chờ trên event loop
+        """
+        routed = await asyncio.to_thread(self.route, query)
+        if routed is not None:
+            return routed[0], "router"
+
+        return await self.aclassify_with_llm(query, llm_classifier), "llm"
+
+    async def aclassify_with_llm(self, query: str, llm_classifier: Callable[[str], Awaitable[str]]) -> str:
+        """Bản async của classify_with_llm"""
+        start_time = time.perf_counter()
+        intent = await llm_classifier(query)
+        self._record("llm", time.perf_counter() - start_time)
+        return intent
+
+    def record_llm(self, elapsed: float):
+        """Ghi nhận một lần LLM phân loại diễn ra bên ngoài classifier (vd: bước gộp reflection + intent)"""
+        self._record("llm", elapsed)
+
+    def calibrate(
+        self,
+        labelled_queries: Iterable[Tuple[str, str]],
+        target_precision: float = 0.95
+    ) -> float:
+        """
+        Chọn threshold thấp nhất mà router vẫn đạt target_precision trên tập câu hỏi có nhãn.
+
+        Args:
+            labelled_queries: [(query, intent đúng), ...]
+            target_precision: độ chính xác tối thiểu của các câu router tự trả lời
+
+        Returns:
+            float: threshold mới (đã gán vào self.threshold)
+        """
+        router = self._router_provider()
+        scored = []
+        for query, expected in labelled_queries:
+            score, intent = router.guide(query)
+            scored.append((float(score), intent == expected))
+
+        # Quét threshold từ cao xuống thấp, giữ threshold thấp nhất còn đạt precision
+        scored.sort(key=lambda item: item[0], reverse=True)
+        best = self.threshold
+        correct = 0
+        for index, (score, is_correct) in enumerate(scored, start=1):
+            correct += int(is_correct)
+            if correct / index >= target_precision:
+                best = score
+
+        self.threshold = best
+        return best
+
+    def _record(self, tier: str, elapsed: float = 0.0):
+        with self._lock:
+            stats = self._stats[tier]
+            stats["count"] += 1
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                name: {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+                for name in ("router", "router_misses", "router_errors", "llm")
+            }
+
+    def get_stats(self) -> Dict[str, object]:
+        """Số lần trả lời và latency của từng tầng"""
+        with self._lock:
+            stats = {
+                name: {
+                    "count": data["count"],
+                    "avg_ms": round(data["total_seconds"] / data["count"] * 1000, 2) if data["count"] else 0.0,
+                    "max_ms": round(data["max_seconds"] * 1000, 2),
+                }
+                for name, data in self._stats.items()
+            }
+
+        total = stats["router"]["count"] + stats["llm"]["count"]
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "intent_thresholds": self.intent_thresholds,
+            "total": total,
+            "router_hit_rate": round(stats["router"]["count"] / total, 4) if total else 0.0,
+            "tiers": stats,
+        }
+
+
+_intent_classifier = None
+_intent_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier() -> CascadingIntentClassifier:
+    """
+    Intent classifier dùng chung trong process (router được build lazy ở lần dùng đầu)
+    """
+    global _intent_classifier
+    if _intent_classifier is None:
+        with _intent_classifier_lock:
+            if _intent_classifier is None:
+                settings = get_settings()
+
+                def router_provider():
+                    from tool.model_manager import model_manager
+                    return model_manager.get_intent_router()
+
+                _intent_classifier = CascadingIntentClassifier(
+                    router_provider=router_provider,
+                    threshold=settings.INTENT_ROUTER_THRESHOLD,
+                    intent_thresholds=settings.INTENT_ROUTER_THRESHOLDS,
+                    enabled=settings.INTENT_ROUTER_ENABLED
+                )
+    return _intent_classifier
@@ -4,10 +4,11 @@ Model Manager để cache và quản lý các models tránh load lại nhiều l
 import os
 import threading
 from typing import Dict, Any, Optional
-from tool.embeddings import SentenceTransformerEmbedding, EmbeddingConfig
-from tool.semantic_router import SemanticRouter, Route
+from tool.embeddings import SentenceTransformerEmbedding, EmbeddingConfig, MicroBatchingEmbedding, CachedEmbedding, BaseEmbedding
+from tool.semantic_router import SemanticRouter, Route, RouteEmbeddingCache
 from tool.semantic_router.sample import Sample
-from setting import Settings
+from tool.model_registry import get_model_registry
+from setting import get_settings
 
 class ModelManager:
     """Singleton class để quản lý và cache các models"""
@@ -27,32 +28,54 @@ class ModelManager:
         if self._initialized:
             return
             
-        self.settings = Settings.load_settings()
+        self.settings = get_settings()
         self.models_cache: Dict[str, Any] = {}
         self._initialized = True
         
         print("🔧 ModelManager initialized")
     
-    def get_embedding_model(self, model_name: str = None) -> SentenceTransformerEmbedding:
+    def get_embedding_model(self, model_name: str = None, pinned: bool = False) -> BaseEmbedding:
         """
-        Lấy embedding model từ cache hoặc load mới nếu chưa có
+        Lấy embedding model từ model registry hoặc load mới nếu chưa có
+        (bọc bởi MicroBatchingEmbedding nếu EMBEDDING_MICRO_BATCHING bật, ngoài cùng là CachedEmbedding).
+        LLMManager cũng lấy embedding qua hàm này nên mỗi model chỉ có một bản trong process.
+
+        Args:
+            model_name: tên model
+            pinned: True nếu nơi gọi giữ model lâu dài (vd: router) → registry không evict model này
         """
         if model_name is None:
             model_name = "dangvantuan/vietnamese-document-embedding"
-            
-        cache_key = f"embedding_{model_name}"
-        
-        if cache_key not in self.models_cache:
-            print(f"🚀 Loading embedding model: {model_name}")
-            config = EmbeddingConfig(name=model_name)
-            embedding_model = SentenceTransformerEmbedding(config)
-            self.models_cache[cache_key] = embedding_model
-            print(f"✅ Embedding model cached: {model_name}")
-        else:
-            print(f"📦 Using cached embedding model: {model_name}")
-            
-        return self.models_cache[cache_key]
+
+        return get_model_registry().get_or_load(
+            f"embedding:{model_name}",
+            lambda: self._load_embedding_model(model_name),
+            pinned=pinned
+        )
+
+    def _load_embedding_model(self, model_name: str) -> BaseEmbedding:
+        print(f"🚀 Loading embedding model: {model_name}")
+        config = EmbeddingConfig(name=model_name)
+        embedding_model = SentenceTransformerEmbedding(config)
+        if self.settings.EMBEDDING_MICRO_BATCHING:
+            embedding_model = MicroBatchingEmbedding(
+                embedding_model,
+                max_batch_size=self.settings.BATCH_SIZE,
+                max_wait_ms=self.settings.EMBEDDING_BATCH_WINDOW_MS
+            )
+        return CachedEmbedding(
+            embedding_model,
+            name=model_name,
+            cache_dir=self.settings.EMBEDDING_CACHE_DIR,
+            max_entries=self.settings.EMBEDDING_CACHE_MAX_ENTRIES
+        )
     
+    def _route_cache(self, embedding_tool, namespace: str) -> Optional[RouteEmbeddingCache]:
+        """Cache embedding route samples trên đĩa, mỗi router một namespace (None nếu bị tắt)"""
+        if not self.settings.ROUTE_EMBEDDING_CACHE_DIR:
+            return None
+        return RouteEmbeddingCache(self.settings.ROUTE_EMBEDDING_CACHE_DIR, embedding_tool.name, namespace=namespace)
+
     def get_semantic_router(self) -> SemanticRouter:
         """
         Lấy semantic router từ cache hoặc tạo mới nếu chưa có
@@ -63,7 +86,7 @@ class ModelManager:
             print("🚀 Creating semantic router...")
             
             # Lấy embedding model
-            embedding_tool = self.get_embedding_model()
+            embedding_tool = self.get_embedding_model(pinned=True)
             
             # Tạo các routes
             routes = [
@@ -73,7 +96,11 @@ class ModelManager:
             ]
             
             # Tạo semantic router
-            semantic_router = SemanticRouter(embedding=embedding_tool, routes=routes)
+            semantic_router = SemanticRouter(
+                embedding=embedding_tool,
+                routes=routes,
+                sample_cache=self._route_cache(embedding_tool, cache_key)
+            )
             self.models_cache[cache_key] = semantic_router
             print("✅ Semantic router cached")
         else:
@@ -81,6 +108,32 @@ class ModelManager:
             
         return self.models_cache[cache_key]
     
+    def get_intent_router(self) -> SemanticRouter:
+        """
+        Lấy semantic router cho các intent_* của chatbot (fast path của intent classifier)
+        """
+        cache_key = "intent_router"
+
+        if cache_key not in self.models_cache:
+            print("🚀 Creating intent router...")
+
+            embedding_tool = self.get_embedding_model(pinned=True)
+            routes = [
+                Route(name=intent, samples=samples)
+                for intent, samples in Sample.intent_routes().items()
+            ]
+
+            self.models_cache[cache_key] = SemanticRouter(
+                embedding=embedding_tool,
+                routes=routes,
+                aggregation=self.settings.INTENT_ROUTER_AGGREGATION,
+                top_k=self.settings.INTENT_ROUTER_TOP_K,
+                sample_cache=self._route_cache(embedding_tool, cache_key)
+            )
+            print("✅ Intent router cached")
+
+        return self.models_cache[cache_key]
+
     def get_llm_model(self, model_name: str = None):
         """
         Lấy LLM model từ cache (có thể extend cho Ollama, etc.)
@@ -114,6 +167,9 @@ class ModelManager:
         
         # Preload semantic router
         self.get_semantic_router()
+
+        # Preload intent router
+        self.get_intent_router()
         
         # Preload LLM model (optional)
         # self.get_llm_model()
@@ -125,15 +181,29 @@ class ModelManager:
         Xóa cache models (để free memory nếu cần)
         """
         self.models_cache.clear()
+        get_model_registry().clear(prefix="embedding:")
         print("🗑️ Model cache cleared")
     
     def get_cache_info(self) -> Dict[str, Any]:
         """
         Lấy thông tin về các models đã cache
         """
+        registry = get_model_registry()
+        embeddings = {key: registry.get(key) for key in registry.keys(prefix="embedding:")}
         return {
-            "cached_models": list(self.models_cache.keys()),
-            "cache_size": len(self.models_cache)
+            "cached_models": list(self.models_cache.keys()) + list(embeddings.keys()),
+            "cache_size": len(self.models_cache) + len(embeddings),
+            "registry": registry.get_stats(),
+            "embedding_cache": {
+                key: model.get_stats()
+                for key, model in embeddings.items()
+                if isinstance(model, CachedEmbedding)
+            },
+            "embedding_batching": {
+                key: model.embedding.get_stats()
+                for key, model in embeddings.items()
+                if isinstance(model, CachedEmbedding) and isinstance(model.embedding, MicroBatchingEmbedding)
+            }
         }
 
 # Global instance
@@ -0,0 +1,202 @@
+"""
+Model Registry dùng chung trong process: mỗi model chỉ được load một lần
+(dùng bởi cả ModelManager và LLMManager)
+"""
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from setting import get_settings
+
+
+def _process_rss_bytes() -> Optional[int]:
+    """RSS hiện tại của process (chỉ Linux, None nếu không đọc được)"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """
+    Ước lượng bộ nhớ của model: tổng kích thước parameters + buffers của torch module.
+    Đi xuyên qua các lớp bọc (CachedEmbedding, MicroBatchingEmbedding, SentenceTransformerEmbedding).
+    """
+    seen = set()
+    current = model
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if hasattr(current, "parameters") and hasattr(current, "buffers"):
+            try:
+                tensors = list(current.parameters()) + list(current.buffers())
+                return int(sum(t.numel() * t.element_size() for t in tensors))
+            except Exception:
+                return 0
+        current = getattr(current, "embedding", None) or getattr(current, "embedding_model", None)
+    return 0
+
+
+class _RegistryEntry:
+    __slots__ = ("model", "nbytes", "loaded_at", "load_seconds", "last_used", "hits", "pinned")
+
+    def __init__(self, model: Any, nbytes: int, load_seconds: float, pinned: bool):
+        self.model = model
+        self.nbytes = nbytes
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+        self.last_used = self.loaded_at
+        self.hits = 0
+        self.pinned = pinned
+
+
+class ModelRegistry:
+    """
+    Registry thread-safe cho các model nặng:
+    - load mỗi key đúng một lần, có lock riêng cho từng key nên các request đầu tiên
+      chạy đồng thời không load trùng (request sau chờ request trước load xong)
+    - ghi nhận bộ nhớ chiếm dụng của từng model
+    - LRU eviction khi tổng bộ nhớ vượt max_memory_mb (0 = không giới hạn); model pinned không bị evict
+
+    Lưu ý: model bị evict chỉ được giải phóng thật khi không còn nơi nào giữ tham chiếu tới nó.
+    """
+
+    def __init__(self, max_memory_mb: int = 0):
+        self.max_memory_bytes = max(0, int(max_memory_mb)) * 1024 * 1024
+        self._entries: "OrderedDict[str, _RegistryEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._evictions = 0
+
+    def _load_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def _get_entry(self, key: str, pinned: bool = False) -> Optional[_RegistryEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.last_used = time.time()
+                entry.hits += 1
+                entry.pinned = entry.pinned or pinned
+            return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        """Xem model đã load (không tính là một lần dùng, không đổi thứ tự LRU)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.model if entry is not None else None
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], pinned: bool = False) -> Any:
+        """
+        Lấy model theo key, gọi loader() đúng một lần nếu chưa có
+
+        Args:
+            key: định danh model, vd: "embedding:dangvantuan/vietnamese-document-embedding"
+            loader: hàm load model
+            pinned: True = không bao giờ evict (áp dụng cả khi model đã được load trước đó)
+        """
+        entry = self._get_entry(key, pinned)
+        if entry is not None:
+            return entry.model
+
+        with self._load_lock(key):
+            # Thread khác có thể đã load xong trong lúc chờ lock
+            entry = self._get_entry(key, pinned)
+            if entry is not None:
+                return entry.model
+
+            rss_before = _process_rss_bytes()
+            start_time = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start_time
+
+            nbytes = estimate_model_bytes(model)
+            if nbytes == 0 and rss_before is not None:
+                rss_after = _process_rss_bytes()
+                nbytes = max(0, (rss_after or rss_before) - rss_before)
+
+            with self._lock:
+                self._entries[key] = _RegistryEntry(model, nbytes, load_seconds, pinned)
+                self._entries.move_to_end(key)
+            print(f"✅ Model registered: {key} ({nbytes / 1024 / 1024:.1f} MB, {load_seconds:.2f}s)")
+
+        self._evict_if_needed(keep=key)
+        return model
+
+    def _evict_if_needed(self, keep: str = None):
+        if not self.max_memory_bytes:
+            return
+
+        evicted = []
+        with self._lock:
+            total = sum(entry.nbytes for entry in self._entries.values())
+            for key in list(self._entries.keys()):
+                if total <= self.max_memory_bytes:
+                    break
+                entry = self._entries[key]
+                if key == keep or entry.pinned:
+                    continue
+                del self._entries[key]
+                total -= entry.nbytes
+                evicted.append(key)
+            self._evictions += len(evicted)
+
+        if evicted:
+            gc.collect()
+            print(f"🗑️ Evicted models (memory cap {self.max_memory_bytes // 1024 // 1024} MB): {evicted}")
+
+    def evict(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self, prefix: str = ""):
+        """Xóa các model có key bắt đầu bằng prefix (mặc định: tất cả)"""
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+        gc.collect()
+
+    def keys(self, prefix: str = ""):
+        with self._lock:
+            return [key for key in self._entries if key.startswith(prefix)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Bộ nhớ chiếm dụng, số lần dùng lại và thời gian load của từng model"""
+        with self._lock:
+            models = {
+                key: {
+                    "resident_mb": round(entry.nbytes / 1024 / 1024, 2),
+                    "load_seconds": round(entry.load_seconds, 3),
+                    "hits": entry.hits,
+                    "pinned": entry.pinned,
+                    "idle_seconds": round(time.time() - entry.last_used, 1),
+                }
+                for key, entry in self._entries.items()
+            }
+            total = sum(entry.nbytes for entry in self._entries.values())
+
+        return {
+            "models": models,
+            "total_resident_mb": round(total / 1024 / 1024, 2),
+            "max_memory_mb": self.max_memory_bytes // 1024 // 1024,
+            "evictions": self._evictions,
+        }
+
+
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Registry dùng chung trong process"""
+    global _model_registry
+    if _model_registry is None:
+        with _model_registry_lock:
+            if _model_registry is None:
+                _model_registry = ModelRegistry(max_memory_mb=get_settings().MODEL_REGISTRY_MAX_MEMORY_MB)
+    return _model_registry
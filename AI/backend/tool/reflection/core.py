@@ -1,3 +1,22 @@
+import json
+
+from llms.profiles import get_generation_profiles
+from llms.token_budget import estimate_message_tokens, fit_messages
+from metrics import llm_prompt, CHAT_PROMPT_TOKENS
+from prompt.promt_config import PromptConfig, CHAT_INTENTS
+from setting import get_settings
+
+# JSON schema cho bước "viết lại + phân loại" (Ollama structured outputs)
+REFLECTION_INTENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query": {"type": "string"},
+        "intent": {"type": "string", "enum": CHAT_INTENTS},
+    },
+    "required": ["query", "intent"],
+}
+
+
 class Reflection():
     def __init__(self, llm):
         self.llm = llm
@@ -12,56 +31,116 @@ class Reflection():
                 all_texts = entry['content'] 
             concatenatedTexts.append(f"{role}: {all_texts} \n")
         return ''.join(concatenatedTexts)
+
+    def _budget_messages(self, chatHistory, prompt_name, history_key, profile="reflection", **kwargs):
+        """
+        Lắp prompt với lịch sử vừa ngân sách token của profile (num_ctx - num_predict - reserve):
+        giữ các system message đầu (tóm tắt hội thoại) và các tin nhắn gần nhất, bỏ tin nhắn cũ ở giữa
+        """
+        settings = get_settings()
+        chars_per_token = settings.HISTORY_CHARS_PER_TOKEN
+        prompt_config = PromptConfig()
+
+        budget = get_generation_profiles().prompt_budget(profile, settings.HISTORY_PROMPT_RESERVE_TOKENS)
+        if budget is not None:
+            fixed = estimate_message_tokens(prompt_config.get_messages(prompt_name, **{history_key: ""}, **kwargs), chars_per_token)
+            budget -= fixed
+        pinned = next((i for i, m in enumerate(chatHistory) if m.get("role") != "system"), len(chatHistory))
+        chatHistory = fit_messages(chatHistory, budget, pinned=pinned, chars_per_token=chars_per_token)
+
+        historyString = self._concat_and_format_texts(chatHistory)
+        messages = prompt_config.get_messages(prompt_name, **{history_key: historyString}, **kwargs)
+        CHAT_PROMPT_TOKENS.observe(estimate_message_tokens(messages, chars_per_token), part="reflection")
+        return messages
     
     
-    def __call__(self, chatHistory, lastItemsConsidereds=100):
-        
+    @staticmethod
+    def _last_user_message(chatHistory):
+        for msg in reversed(chatHistory):
+            if msg.get("role") == "user":
+                return msg.get("content") or ""
+        return ""
+
+    def _reflection_messages(self, chatHistory, lastItemsConsidereds):
         if len(chatHistory) >= lastItemsConsidereds:
             chatHistory = chatHistory[len(chatHistory) - lastItemsConsidereds:]
 
-        historyString = self._concat_and_format_texts(chatHistory)
+        # Hướng dẫn cố định nằm trong system message, chỉ lịch sử hội thoại thay đổi giữa các lần gọi
+        messages = self._budget_messages(
+            chatHistory, "reflection", "historyString", last_user_msg=self._last_user_message(chatHistory)
+        )
+        print({"reflection_prompt": messages[-1]["content"]})
+        return messages
 
-        # Lấy câu hỏi cuối cùng của user
-        last_user_msg = ""
-        for msg in reversed(chatHistory):
-            if msg.get("role") == "user":
-                last_user_msg = msg.get("content") or ""
-                break
-
-        prompt_template = """
-Bạn nhận được toàn bộ lịch sử hội thoại giữa người dùng (user) và trợ lý (assistant).  
+    @staticmethod
+    def _clean_reflection(completion):
+        # Clean possible thinking tags or quotes
+        if "</think>" in completion:
+            completion = completion.split("</think>")[-1].strip()
+        return completion.strip().strip('"')
 
-🎯 Nhiệm vụ:
-- Viết lại YÊU CẦU hoặc CÂU HỎI cuối cùng của NGƯỜI DÙNG thành MỘT CÂU HOÀN CHỈNH và ĐỘC LẬP bằng tiếng Việt.  
-- Phải KẾT HỢP các thông tin từ lịch sử để câu hỏi/đề nghị có thể hiểu được mà KHÔNG cần xem lại lịch sử.  
-- Câu viết phải NGẮN GỌN, TỰ NHIÊN và GIỮ NGUYÊN Ý ĐỊNH của người dùng.
+    def __call__(self, chatHistory, lastItemsConsidereds=100):
+        messages = self._reflection_messages(chatHistory, lastItemsConsidereds)
+        with llm_prompt("reflection"):
+            completion = self.llm.generate_chat(messages, profile="reflection")
+        return self._clean_reflection(completion)
 
-💡 Ví dụ:
-Lịch sử hội thoại:
-- User: "Tìm việc ở đây"
-- Assistant: "Bạn muốn tìm việc gì?"
-- User: "Hà Nội"
+    async def areflect(self, chatHistory, lastItemsConsidereds=100):
+        """Bản async của __call__ (self.llm là AsyncOllamaLLMs / AsyncOllamaBackendPool)"""
+        messages = self._reflection_messages(chatHistory, lastItemsConsidereds)
+        with llm_prompt("reflection"):
+            completion = await self.llm.generate_chat(messages, profile="reflection")
+        return self._clean_reflection(completion)
 
-➡️ Kết quả mong đợi: "Tôi muốn tìm công việc ở Hà Nội"
-*** Lưu ý: Ví dụ chỉ mang tính minh họa
-{historyString}
-""".strip()
+    def _reflect_and_classify_messages(self, chatHistory, lastItemsConsidereds):
+        if len(chatHistory) >= lastItemsConsidereds:
+            chatHistory = chatHistory[len(chatHistory) - lastItemsConsidereds:]
+        messages = self._budget_messages(
+            chatHistory, "reflection_and_classification_chat_intent", "history", profile="reflection_intent"
+        )
+        return messages, self._last_user_message(chatHistory)
 
+    @staticmethod
+    def _parse_reflect_and_classify(completion, last_user_msg):
+        if "</think>" in completion:
+            completion = completion.split("</think>")[-1].strip()
 
-        filled_prompt = prompt_template.format(historyString=historyString, last_user_msg=last_user_msg)
+        try:
+            data = json.loads(completion)
+        except (json.JSONDecodeError, TypeError):
+            data = {}
 
-        higherLevelSummariesPrompt = {
-            "role": "user",
-            "content": filled_prompt
-        }
+        query = str(data.get("query") or "").strip().strip('"') or last_user_msg
+        intent = data.get("intent")
+        if intent not in CHAT_INTENTS:
+            intent = None
 
-        print({"reflection_prompt": filled_prompt})
+        return {"query": query, "intent": intent}
 
-        completion = self.llm.generate_content([higherLevelSummariesPrompt])
+    def reflect_and_classify(self, chatHistory, lastItemsConsidereds=100):
+        """
+        Viết lại câu hỏi cuối của user thành câu độc lập VÀ phân loại intent
+        trong cùng một lần gọi LLM (structured output theo REFLECTION_INTENT_SCHEMA).
 
-        # Clean possible thinking tags or quotes
-        if "</think>" in completion:
-            completion = completion.split("</think>")[-1].strip()
-        completion = completion.strip().strip('"')
-        return completion
+        Returns:
+            dict: {"query": câu hỏi đã viết lại, "intent": intent hoặc None nếu không hợp lệ}
+        """
+        messages, last_user_msg = self._reflect_and_classify_messages(chatHistory, lastItemsConsidereds)
+        with llm_prompt("reflection_and_classification_chat_intent"):
+            completion = self.llm.generate_chat(
+                messages,
+                format=REFLECTION_INTENT_SCHEMA,
+                profile="reflection_intent"
+            )
+        return self._parse_reflect_and_classify(completion, last_user_msg)
 
+    async def areflect_and_classify(self, chatHistory, lastItemsConsidereds=100):
+        """Bản async của reflect_and_classify"""
+        messages, last_user_msg = self._reflect_and_classify_messages(chatHistory, lastItemsConsidereds)
+        with llm_prompt("reflection_and_classification_chat_intent"):
+            completion = await self.llm.generate_chat(
+                messages,
+                format=REFLECTION_INTENT_SCHEMA,
+                profile="reflection_intent"
+            )
+        return self._parse_reflect_and_classify(completion, last_user_msg)
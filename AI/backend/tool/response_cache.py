@@ -0,0 +1,259 @@
+"""
+Cache câu trả lời theo câu hỏi độc lập (sau reflection): khớp chính xác trước, sau đó khớp theo độ tương đồng embedding
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from metrics import metrics
+from setting import get_settings
+from tool.embeddings.cache import normalize_text
+
+RESPONSE_CACHE_LOOKUPS = metrics.counter(
+    "response_cache_lookups_total",
+    "Số lần tra response cache theo intent và kết quả (exact_hit, semantic_hit, miss, skipped)"
+)
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:…]+$")
+# Số vector của các lượt miss đang chờ put() (giữa get() và put() là một lần sinh câu trả lời)
+_PENDING_VECTORS = 256
+# Kết quả tra cache -> key trong stats
+_RESULT_STATS = {"exact_hit": "exact_hits", "semantic_hit": "semantic_hits", "miss": "misses", "skipped": "skipped"}
+
+
+def normalize_query(query: str) -> str:
+    """Key cho tầng khớp chính xác: NFC + gộp khoảng trắng + không phân biệt hoa thường + bỏ dấu câu cuối"""
+    return _TRAILING_PUNCTUATION.sub("", normalize_text(query).casefold())
+
+
+class _CachedResponse:
+    __slots__ = ("intent", "query", "response", "vector", "expires_at", "hits")
+
+    def __init__(self, intent: str, query: str, response: str, vector: Optional[np.ndarray], expires_at: float):
+        self.intent = intent
+        self.query = query
+        self.response = response
+        self.vector = vector
+        self.expires_at = expires_at
+        self.hits = 0
+
+
+class SemanticResponseCache:
+    """
+    Cache câu trả lời của LLM cho các intent không phụ thuộc người dùng (chitchat, câu hỏi tuyển dụng chưa đủ ý)
+
+    - Chỉ các intent có trong intent_ttls (TTL > 0) được cache; intent cá nhân hóa (CV, gợi ý việc, ...) luôn bị bỏ qua
+    - Tầng 1: khớp chính xác theo normalize_query(query)
+    - Tầng 2: cosine giữa embedding của query và các query đã cache cùng intent >= similarity_threshold
+    - LRU: vượt max_entries thì bỏ câu trả lời ít dùng nhất; câu trả lời hết TTL bị bỏ khi gặp lại
+    """
+
+    def __init__(
+        self,
+        embedding_provider: Optional[Callable[[], object]] = None,
+        intent_ttls: Optional[Dict[str, float]] = None,
+        similarity_threshold: float = 0.92,
+        max_entries: int = 2000,
+        enabled: bool = True
+    ):
+        """
+        Args:
+            embedding_provider: hàm trả về embedding model (lazy); None = chỉ dùng tầng khớp chính xác
+            intent_ttls: TTL (giây) theo intent, cũng là danh sách các intent được phép cache
+        """
+        self._embedding_provider = embedding_provider
+        self.intent_ttls = {intent: ttl for intent, ttl in (intent_ttls or {}).items() if ttl and ttl > 0}
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _CachedResponse]" = OrderedDict()
+        # Ma trận embedding (đã chuẩn hóa) của từng intent, build lại khi entries của intent thay đổi
+        self._matrices: Dict[str, tuple] = {}
+        # Embedding của query vừa miss ở get(), put() dùng lại thay vì encode lần nữa
+        self._pending: "OrderedDict[str, Optional[np.ndarray]]" = OrderedDict()
+        self.reset_stats()
+
+    def is_cacheable(self, intent: Optional[str]) -> bool:
+        return self.enabled and intent in self.intent_ttls
+
+    @staticmethod
+    def _key(intent: str, query: str) -> str:
+        return f"{intent}\x00{normalize_query(query)}"
+
+    def _encode(self, query: str) -> Optional[np.ndarray]:
+        if self._embedding_provider is None:
+            return None
+        try:
+            vector = np.asarray(self._embedding_provider().encode(query), dtype=np.float32).ravel()
+        except Exception as e:
+            print(f"⚠️ Response cache embedding failed, exact match only: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    # ------------------------------------------------------------------ lookup
+
+    def get(self, query: str, intent: Optional[str]) -> Optional[str]:
+        """Câu trả lời đã cache cho (query, intent), None nếu không có"""
+        if not self.is_cacheable(intent) or not query:
+            self._record(intent, "skipped")
+            return None
+
+        key = self._key(intent, query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live_entry(key, now)
+            if entry is not None:
+                return self._hit(key, entry, "exact_hit")
+
+        vector = self._encode(query)
+        with self._lock:
+            if vector is not None:
+                nearest = self._nearest(intent, vector)
+                entry = self._live_entry(nearest, now) if nearest is not None else None
+                if entry is not None:
+                    return self._hit(nearest, entry, "semantic_hit")
+            self._remember_vector(key, vector)
+
+        self._record(intent, "miss")
+        return None
+
+    def _remember_vector(self, key: str, vector: Optional[np.ndarray]):
+        self._pending[key] = vector
+        self._pending.move_to_end(key)
+        while len(self._pending) > _PENDING_VECTORS:
+            self._pending.popitem(last=False)
+
+    def _live_entry(self, key: str, now: float) -> Optional[_CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._remove(key)
+            self._stats["expirations"] += 1
+            return None
+        return entry
+
+    def _hit(self, key: str, entry: _CachedResponse, result: str) -> str:
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self._stats[_RESULT_STATS[result]] += 1
+        self._stats["requests"] += 1
+        RESPONSE_CACHE_LOOKUPS.inc(intent=entry.intent, result=result)
+        return entry.response
+
+    def _nearest(self, intent: str, vector: np.ndarray) -> Optional[str]:
+        keys, matrix = self._matrix(intent)
+        if matrix is None or matrix.shape[1] != vector.shape[0]:
+            return None
+        similarities = matrix @ vector
+        best = int(similarities.argmax())
+        return keys[best] if similarities[best] >= self.similarity_threshold else None
+
+    def _matrix(self, intent: str):
+        cached = self._matrices.get(intent)
+        if cached is None:
+            keys = [key for key, entry in self._entries.items() if entry.intent == intent and entry.vector is not None]
+            matrix = np.vstack([self._entries[key].vector for key in keys]) if keys else None
+            cached = self._matrices[intent] = (keys, matrix)
+        return cached
+
+    # ------------------------------------------------------------------- store
+
+    def put(self, query: str, intent: Optional[str], response: str):
+        if not self.is_cacheable(intent) or not query or not response:
+            return
+
+        key = self._key(intent, query)
+        with self._lock:
+            pending = key in self._pending
+            vector = self._pending.pop(key, None)
+        if not pending:
+            vector = self._encode(query)
+        entry = _CachedResponse(intent, query, response, vector, time.monotonic() + self.intent_ttls[intent])
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._matrices.pop(intent, None)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._matrices.pop(entry.intent, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+            self._pending.clear()
+
+    # ------------------------------------------------------------------- stats
+
+    def _record(self, intent: Optional[str], result: str):
+        with self._lock:
+            self._stats[_RESULT_STATS[result]] += 1
+            if result != "skipped":
+                self._stats["requests"] += 1
+        RESPONSE_CACHE_LOOKUPS.inc(intent=intent or "unknown", result=result)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                "requests": 0, "exact_hits": 0, "semantic_hits": 0, "misses": 0,
+                "skipped": 0, "evictions": 0, "expirations": 0
+            }
+
+    def get_stats(self) -> Dict[str, object]:
+        """Hit rate theo từng tầng (requests không tính các lượt bị bỏ qua vì intent không được cache)"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+
+        requests = stats["requests"]
+        stats["exact_hit_rate"] = round(stats["exact_hits"] / requests, 4) if requests else 0.0
+        stats["semantic_hit_rate"] = round(stats["semantic_hits"] / requests, 4) if requests else 0.0
+        stats["hit_rate"] = round((stats["exact_hits"] + stats["semantic_hits"]) / requests, 4) if requests else 0.0
+        stats.update({
+            "enabled": self.enabled,
+            "similarity_threshold": self.similarity_threshold,
+            "max_entries": self.max_entries,
+            "intent_ttls": dict(self.intent_ttls),
+        })
+        return stats
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> SemanticResponseCache:
+    """
+    Response cache dùng chung trong process (dùng chung embedding model với các router)
+    """
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                settings = get_settings()
+
+                def embedding_provider():
+                    from tool.model_manager import model_manager
+                    return model_manager.get_embedding_model(pinned=True)
+
+                _response_cache = SemanticResponseCache(
+                    embedding_provider=embedding_provider,
+                    intent_ttls=settings.RESPONSE_CACHE_INTENT_TTLS,
+                    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+                    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+                    enabled=settings.RESPONSE_CACHE_ENABLED
+                )
+    return _response_cache
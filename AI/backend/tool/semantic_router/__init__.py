@@ -1,5 +1,6 @@
 from .router import SemanticRouter
 from .route import Route
 from .sample import Sample
+from .embedding_cache import RouteEmbeddingCache
 
-__all__ = ["SemanticRouter", "Route", "Sample"]
\ No newline at end of file
+__all__ = ["SemanticRouter", "Route", "Sample", "RouteEmbeddingCache"]
\ No newline at end of file
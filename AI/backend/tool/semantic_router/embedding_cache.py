@@ -0,0 +1,172 @@
+"""
+Cache embedding của route samples trên đĩa (.npy memory-mapped) để router khởi động nhanh
+"""
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows
+    FCNTL_AVAILABLE = False
+    fcntl = None
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class RouteEmbeddingCache:
+    """
+    Lưu embedding (đã chuẩn hóa theo dòng, float32) của mọi route sample vào một file .npy.
+
+    - Mỗi (model, namespace) có thư mục riêng với index.json riêng (namespace = tên router),
+      nên các router dùng chung model không xóa cache của nhau; tên file là hash của layout (tên route + hash từng sample),
+      nên file đã tồn tại luôn khớp với routes hiện tại và được mmap read-only trực tiếp,
+      dùng chung page cache giữa các gunicorn worker / MCP server.
+    - Khi sample thay đổi, chỉ encode các sample mới hoặc đã sửa; vector cũ được lấy lại
+      từ file gần nhất (ghi trong index.json).
+    - Đọc/ghi file được khóa bằng fcntl và thay thế atomic (os.replace); file cũ chỉ bị xóa
+      trong cùng namespace.
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = ".lock"
+
+    def __init__(self, cache_dir: str, model_name: str, namespace: str = "default"):
+        self.model_name = model_name
+        self.namespace = namespace
+        model_slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        namespace_slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", namespace)
+        self.directory = os.path.join(cache_dir, model_slug, namespace_slug)
+
+    @staticmethod
+    def _layout(routes) -> Tuple[List[str], List[List[str]], str]:
+        names, sample_hashes = [], []
+        for route in routes:
+            if not route.samples:
+                continue
+            names.append(route.name)
+            sample_hashes.append([_hash_text(sample) for sample in route.samples])
+
+        layout_hash = hashlib.sha1(
+            json.dumps([names, sample_hashes], separators=(",", ":")).encode("utf-8")
+        ).hexdigest()
+        return names, sample_hashes, layout_hash
+
+    def _matrix_path(self, layout_hash: str) -> str:
+        return os.path.join(self.directory, f"routes-{layout_hash[:20]}.npy")
+
+    @contextmanager
+    def _write_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, self.LOCK_FILE), "w") as lock_file:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_previous_vectors(self) -> dict:
+        """Map sample hash -> vector từ file cache gần nhất (để chỉ encode phần thay đổi)"""
+        index_path = os.path.join(self.directory, self.INDEX_FILE)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            matrix = np.load(os.path.join(self.directory, index["file"]), mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return {}
+
+        if index.get("model") != self.model_name or len(index.get("sample_hashes", [])) != matrix.shape[0]:
+            return {}
+        return {sample_hash: matrix[row] for row, sample_hash in enumerate(index["sample_hashes"])}
+
+    @staticmethod
+    def _atomic_save(path: str, matrix: np.ndarray):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp_path, path)
+
+    def _rebuild(self, routes, names, sample_hashes, layout_hash, encode: Callable) -> str:
+        previous = self._load_previous_vectors()
+
+        # Chỉ encode các sample mới/đã thay đổi (mỗi text một lần)
+        missing = {}
+        for route in routes:
+            for sample in route.samples:
+                sample_hash = _hash_text(sample)
+                if sample_hash not in previous:
+                    missing.setdefault(sample_hash, sample)
+
+        vectors = dict(previous)
+        if missing:
+            print(f"🚀 Encoding {len(missing)} new/changed route samples...")
+            encoded = np.asarray(encode(list(missing.values())), dtype=np.float32)
+            if encoded.ndim == 1:
+                encoded = encoded.reshape(1, -1)
+            norms = np.linalg.norm(encoded, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors.update(zip(missing.keys(), encoded / norms))
+
+        ordered_hashes = [sample_hash for hashes in sample_hashes for sample_hash in hashes]
+        matrix = np.vstack([vectors[sample_hash] for sample_hash in ordered_hashes]).astype(np.float32)
+
+        matrix_path = self._matrix_path(layout_hash)
+        self._atomic_save(matrix_path, matrix)
+
+        index_path = os.path.join(self.directory, self.INDEX_FILE)
+        tmp_index = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model_name,
+                "file": os.path.basename(matrix_path),
+                "routes": names,
+                "sample_hashes": ordered_hashes,
+            }, f)
+        os.replace(tmp_index, index_path)
+
+        # Xóa các file cũ của namespace này (worker đang mmap vẫn đọc được vì file chỉ bị unlink)
+        for filename in os.listdir(self.directory):
+            if filename.startswith("routes-") and filename.endswith(".npy") and filename != os.path.basename(matrix_path):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+        print(f"✅ Route embeddings cached: {matrix_path} ({len(missing)} encoded, {matrix.shape[0] - len(missing)} reused)")
+        return matrix_path
+
+    def load(self, routes, encode: Callable) -> Tuple[List[str], np.ndarray, List[int]]:
+        """
+        Lấy ma trận embedding của routes, encode và ghi cache nếu cần.
+
+        Args:
+            routes: danh sách Route
+            encode: hàm encode list text -> ma trận embedding
+
+        Returns:
+            (tên các route có sample, ma trận float32 đã chuẩn hóa (read-only mmap), số sample mỗi route)
+        """
+        names, sample_hashes, layout_hash = self._layout(routes)
+        counts = [len(hashes) for hashes in sample_hashes]
+        matrix_path = self._matrix_path(layout_hash)
+
+        # mmap dưới lock: worker khác chỉ xóa file cũ khi giữ lock, và file đã mmap vẫn đọc được sau khi bị unlink
+        with self._write_lock():
+            # Worker khác có thể đã build xong trong lúc chờ lock
+            if not os.path.exists(matrix_path):
+                self._rebuild(routes, names, sample_hashes, layout_hash, encode)
+            else:
+                print(f"📦 Using cached route embeddings: {matrix_path}")
+            matrix = np.load(matrix_path, mmap_mode="r")
+
+        return names, matrix, counts
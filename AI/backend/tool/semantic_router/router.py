@@ -1,30 +1,146 @@
 import numpy as np
 
+from metrics import ROUTER_GUIDE_SECONDS
+
 class SemanticRouter():
-    def __init__(self, embedding, routes):
+    """
+    Router dựa trên embedding: so sánh query với các sample của từng route.
+
+    Toàn bộ sample được lưu trong MỘT ma trận float32 đã chuẩn hóa theo từng dòng
+    (kèm mảng route index), nên chấm điểm một query chỉ cần một phép nhân ma trận.
+
+    Các kiểu tổng hợp điểm (aggregation):
+    - mean: trung bình cosine với mọi sample của route
+    - max: cosine lớn nhất với một sample của route
+    - topk: vote có trọng số của top_k sample gần nhất (tổng cosine của các sample thuộc route / top_k)
+    - centroid: cosine với vector trung tâm (đã chuẩn hóa) của route
+    """
+
+    AGGREGATIONS = ("mean", "max", "topk", "centroid")
+
+    def __init__(self, embedding, routes, aggregation: str = "mean", top_k: int = 5, sample_cache=None):
+        """
+        Args:
+            embedding: model có encode(list text) -> ma trận embedding
+            routes: danh sách Route
+            aggregation: mean | max | topk | centroid
+            top_k: số sample gần nhất dùng cho aggregation "topk"
+            sample_cache: RouteEmbeddingCache (tùy chọn) để dùng lại embedding đã lưu trên đĩa
+        """
+        if aggregation not in self.AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {self.AGGREGATIONS}")
+
         self.routes = routes
         self.embedding = embedding
-        self.routesEmbedding = {}
+        self.aggregation = aggregation
+        self.top_k = top_k
 
+        if sample_cache is not None:
+            # Ma trận đã chuẩn hóa, mmap read-only (dùng chung giữa các process)
+            names, matrix, counts = sample_cache.load(self.routes, self.embedding.encode)
+        else:
+            names, matrix, counts = self._encode_routes()
+
+        self._build_index(names, matrix, counts)
+
+    @staticmethod
+    def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _encode_routes(self):
+        """Encode sample của các route (bỏ qua route rỗng) thành ma trận đã chuẩn hóa"""
+        names, blocks, counts = [], [], []
         for route in self.routes:
-            self.routesEmbedding[
-                route.name
-            ] = self.embedding.encode(route.samples)
+            if len(route.samples) == 0:
+                continue
+            block = self._normalize_rows(self.embedding.encode(route.samples))
+            names.append(route.name)
+            blocks.append(block)
+            counts.append(block.shape[0])
+
+        if not blocks:
+            raise ValueError("SemanticRouter needs at least one route with samples")
+        return names, np.vstack(blocks), counts
+
+    def _build_index(self, names, sample_matrix, counts):
+        """
+        Lưu ma trận sample (đã chuẩn hóa theo dòng) + route index + centroid
+        """
+        if not names:
+            raise ValueError("SemanticRouter needs at least one route with samples")
+
+        self.route_names = list(names)
+        self.sample_matrix = sample_matrix
+        self.route_index = np.repeat(np.arange(len(names), dtype=np.int32), counts)
+        self._route_counts = np.asarray(counts, dtype=np.float32)
+        # Các sample của cùng route nằm liền nhau → vị trí bắt đầu mỗi route
+        self._route_offsets = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+
+        centroids = np.add.reduceat(np.asarray(sample_matrix), self._route_offsets, axis=0) / self._route_counts[:, None]
+        self.centroid_matrix = self._normalize_rows(centroids)
 
     def get_routes(self):
         return self.routes
 
-    def guide(self, query):
-        queryEmbedding = self.embedding.encode([query]) 
-        queryEmbedding = queryEmbedding / np.linalg.norm(queryEmbedding)
-        scores = []
+    def _encode_queries(self, queries) -> np.ndarray:
+        return self._normalize_rows(self.embedding.encode(list(queries)))
 
-        # Calculate the cosine similarity of the query embedding with the sample embeddings of the router.
+    def score_matrix(self, queries) -> np.ndarray:
+        """
+        Điểm của mọi query với mọi route
 
-        for route in self.routes:
-            routesEmbedding = self.routesEmbedding[route.name] / np.linalg.norm(self.routesEmbedding[route.name])
-            score = np.mean(np.dot(routesEmbedding, queryEmbedding.T).flatten())
-            scores.append((score, route.name))
+        Returns:
+            np.ndarray: shape (len(queries), len(route_names))
+        """
+        query_matrix = self._encode_queries(queries)
+
+        if self.aggregation == "centroid":
+            return query_matrix @ self.centroid_matrix.T
+
+        similarities = query_matrix @ self.sample_matrix.T
+
+        if self.aggregation == "mean":
+            return np.add.reduceat(similarities, self._route_offsets, axis=1) / self._route_counts
+        if self.aggregation == "max":
+            return np.maximum.reduceat(similarities, self._route_offsets, axis=1)
 
-        scores.sort(reverse=True)
-        return scores[0]
\ No newline at end of file
+        # topk: mỗi sample trong top_k gần nhất vote cho route của nó với trọng số = cosine
+        k = min(self.top_k, similarities.shape[1])
+        top_indices = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(similarities, top_indices, axis=1)
+        scores = np.zeros((similarities.shape[0], len(self.route_names)), dtype=np.float32)
+        rows = np.repeat(np.arange(similarities.shape[0]), k)
+        np.add.at(scores, (rows, self.route_index[top_indices].ravel()), top_scores.ravel())
+        return scores / k
+
+    def scores(self, query) -> dict:
+        """Điểm của một query với từng route"""
+        row = self.score_matrix([query])[0]
+        return {name: float(score) for name, score in zip(self.route_names, row)}
+
+    def guide_many(self, queries):
+        """
+        Phân loại nhiều query trong một lần encode + một phép nhân ma trận
+
+        Returns:
+            list: [(score, route_name), ...] theo thứ tự queries
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+
+        with ROUTER_GUIDE_SECONDS.time(aggregation=self.aggregation):
+            scores = self.score_matrix(queries)
+        best = scores.argmax(axis=1)
+        return [
+            (float(scores[row, column]), self.route_names[column])
+            for row, column in enumerate(best)
+        ]
+
+    def guide(self, query):
+        return self.guide_many([query])[0]
@@ -144,6 +144,131 @@ class Sample():
                   "Ai đã viết 'Giết con chim nhại'?",
                   "Bạn có thể cho tôi một câu nói của Albert Einstein không?" ]
     
+    candidateSample = [
+    "Tôi muốn tìm lập trình viên biết Java.",
+    "Ứng viên Python 3 năm kinh nghiệm.",
+    "Cần tuyển designer UI có kinh nghiệm Figma.",
+    "Tìm giúp tôi ứng viên kế toán ở Hà Nội.",
+    "Công ty mình cần tuyển tester manual 2 năm kinh nghiệm.",
+    "Có ứng viên nào biết ReactJS không?",
+    "Tôi cần tìm nhân viên kinh doanh có kinh nghiệm bất động sản.",
+    "Tìm ứng viên Data Analyst thành thạo SQL.",
+    "Có hồ sơ ứng viên marketing nào phù hợp không?",
+    "Tôi là nhà tuyển dụng, cần tìm kỹ sư DevOps.",
+    "Giới thiệu cho tôi vài ứng viên tiếng Nhật N2.",
+    "Cần gấp ứng viên chăm sóc khách hàng ca đêm.",
+    "Lọc giúp tôi các ứng viên có bằng thạc sĩ.",
+    "Tìm ứng viên fresher NodeJS ở Đà Nẵng.",
+    "Có ai biết lập trình Golang đang tìm việc không?",
+]
+
+    reviewCvSample = [
+    "Bạn review giúp CV này.",
+    "Nhận xét giúp mình CV với.",
+    "CV của tôi có ổn không?",
+    "Đánh giá CV của mình giúp nhé.",
+    "CV này còn thiếu gì không?",
+    "Làm sao để CV của tôi ấn tượng hơn?",
+    "Bạn sửa giúp mình phần kinh nghiệm trong CV được không?",
+    "Chấm điểm CV này giúp tôi.",
+    "CV của mình có lỗi gì cần sửa không?",
+    "Góp ý giúp mình cách viết CV xin việc lập trình.",
+    "Xem giúp mình hồ sơ xin việc này đã chuẩn chưa.",
+    "CV của tôi có phù hợp để ứng tuyển Data Analyst không?",
+    "Bạn kiểm tra giúp CV tiếng Anh của mình.",
+    "Phần kỹ năng trong CV mình viết vậy được chưa?",
+    "Mình nên bỏ gì khỏi CV này?",
+]
+
+    suggestJobSample = [
+    "Dựa vào CV này gợi ý công việc giúp mình.",
+    "Với CV của tôi thì nên ứng tuyển vị trí nào?",
+    "Mình có 2 năm kinh nghiệm Python, nên làm công việc gì?",
+    "Hồ sơ của tôi phù hợp với những việc nào?",
+    "Gợi ý công việc phù hợp với kỹ năng của mình.",
+    "Tôi học kế toán, bạn gợi ý việc nào hợp với tôi?",
+    "Từ kinh nghiệm của mình thì nên chuyển sang vị trí nào?",
+    "Với bằng cử nhân marketing, mình nên tìm việc gì?",
+    "Xem CV và đề xuất giúp tôi vài công việc.",
+    "Kỹ năng của mình hợp với ngành nào nhất?",
+    "Tôi biết React và NodeJS, có việc nào hợp không?",
+    "Dựa trên hồ sơ, bạn thấy mình hợp làm gì?",
+    "Gợi ý giúp mình lộ trình nghề nghiệp theo CV này.",
+    "CV này nên ứng tuyển công ty nào?",
+    "Mình vừa tốt nghiệp CNTT, nên chọn việc gì?",
+]
+
+    companyInfoSample = [
+    "Thông tin về công ty FPT.",
+    "Công ty Viettel có tốt không?",
+    "Cho tôi biết về công ty VNG.",
+    "Công ty ABC ở đâu?",
+    "Môi trường làm việc ở Tiki thế nào?",
+    "Công ty này có bao nhiêu nhân viên?",
+    "Chế độ đãi ngộ của công ty Momo ra sao?",
+    "Công ty XYZ hoạt động trong lĩnh vực gì?",
+    "Văn hóa công ty Shopee như thế nào?",
+    "Cho mình xin địa chỉ công ty FPT Software.",
+    "Công ty này có uy tín không?",
+    "Giới thiệu về công ty Vingroup.",
+    "Công ty KMS Technology làm về gì?",
+    "Lương thưởng ở công ty Techcombank thế nào?",
+    "Công ty này thành lập năm nào?",
+]
+
+    guideSample = [
+    "Hướng dẫn tạo tài khoản.",
+    "Làm sao để đăng ký tài khoản trên website?",
+    "Cách đăng tin tuyển dụng như thế nào?",
+    "Mình quên mật khẩu thì làm sao?",
+    "Làm thế nào để ứng tuyển một công việc trên web?",
+    "Cách tải CV lên hệ thống?",
+    "Hướng dẫn cập nhật hồ sơ cá nhân.",
+    "Làm sao để lưu tin tuyển dụng yêu thích?",
+    "Cách tìm kiếm việc làm trên website này?",
+    "Làm sao để xóa tài khoản?",
+    "Hướng dẫn đổi email đăng nhập.",
+    "Tôi muốn xem lại các việc đã ứng tuyển thì vào đâu?",
+    "Cách bật thông báo việc làm mới?",
+    "Nhà tuyển dụng đăng tin có mất phí không, làm thế nào?",
+    "Làm sao để liên hệ nhà tuyển dụng qua website?",
+]
+
+    feedbackSample = [
+    "Mình muốn phản hồi về tính năng đăng bài.",
+    "Website tải chậm quá.",
+    "Tôi muốn góp ý về giao diện trang web.",
+    "Chức năng tìm kiếm hoạt động không chính xác.",
+    "Tôi gặp lỗi khi tải CV lên.",
+    "Dịch vụ của các bạn rất tốt, cảm ơn nhé.",
+    "Tôi muốn khiếu nại về một tin tuyển dụng lừa đảo.",
+    "Trang web hay bị lỗi đăng nhập.",
+    "Mình có ý kiến về chatbot này.",
+    "Giao diện trên điện thoại khó dùng quá.",
+    "Tôi không hài lòng với cách xử lý hồ sơ.",
+    "Đề xuất thêm bộ lọc theo mức lương.",
+    "Thông báo email gửi quá nhiều.",
+    "Tôi muốn báo cáo một lỗi trên website.",
+    "Trải nghiệm ứng tuyển của mình chưa tốt.",
+]
+
+    @classmethod
+    def intent_routes(cls):
+        """
+        Samples cho từng intent của classification_chat_intent (dùng cho intent router)
+        """
+        return {
+            "intent_jd": cls.recruitment_complete,
+            "intent_incomplete_recruitment_question": cls.recruitment_incomplete,
+            "intent_candidate": cls.candidateSample,
+            "intent_review_cv": cls.reviewCvSample,
+            "intent_suggest_job": cls.suggestJobSample,
+            "intent_company_info": cls.companyInfoSample,
+            "intent_guide": cls.guideSample,
+            "intent_feedback": cls.feedbackSample,
+            "intent_chitchat": cls.chitchatSample,
+        }
+
     @classmethod
     def  as_dict(cls):
         return {